@@ -3,5 +3,6 @@
 TAG=currency-exchange
 docker build -f Dockerfile -t $TAG .
 docker run --volume="./src/database/":/src/database \
+ --volume="./src/cache/":/src/cache \
  --volume="./src/reports/":/src/reports $TAG 
  
\ No newline at end of file
@@ -0,0 +1,7 @@
+# Standard library
+import sys
+
+# First party
+from src import cli
+
+sys.exit(cli.main())
@@ -15,13 +15,26 @@ from datetime import datetime, timedelta
 
 # First party
 from airflow import DAG
+from airflow.decorators import task
 from airflow.operators.bash_operator import BashOperator
-from airflow.operators.python import PythonOperator
 
 # Local
-from ..modules import create_report, update_currency_exchange
+from .. import settings
+from ..modules import dag_tasks
 
-default_args = {"owner": "Felipe", "start_date": datetime(2023, 1, 1)}
+default_args = {
+    "owner": "Felipe",
+    "start_date": datetime(2023, 1, 1),
+    "execution_timeout": timedelta(minutes=20),
+}
+
+# Pools must exist before the first run:
+# airflow pools set currency_api 4 "Concurrent fetch tasks (each one runs FETCH_MAX_WORKERS requests)"
+# airflow pools set sqlite_writer 1 "Single SQLite writer"
+HTTP_POOL = "currency_api"
+SQLITE_POOL = "sqlite_writer"
+# Intermediate files exchanged by the tasks (XCom only carries their paths), one directory per run
+STAGING_DIR = "src/cache/staging"
 
 with DAG(
     "currency_exchange_etl",
@@ -29,25 +42,51 @@ with DAG(
     start_date=datetime(2022, 1, 30),
     schedule_interval="0 12 * * 1",  # At 12:00 every Monday
     catchup=False,
+    # Backfills: trigger with {"since": "2023-01-01", "until": "2023-06-30", "chunk_days": 30}
+    params={"since": None, "until": None, "chunk_days": None},
+    render_template_as_native_obj=True,
 ) as dag:
     # Run Unit Tests and save log file
     quality_connection_tests = BashOperator(
         task_id="quality_connection_tests",
         bash_command=r"python3 test_api_input.py",
-        execution_timeout=timedelta(minutes=20),
     )
 
-    # run ETL pipeline
-    run_etl_pipeline = PythonOperator(
-        task_id="run_etl_pipeline",
-        python_callable=update_currency_exchange.etl_pipeline,
-        execution_timeout=timedelta(minutes=20),
+    # One fetch task per based currency (and date chunk) with missing days
+    fetch_plan = task(dag_tasks.plan_fetches, task_id="plan_fetches")(
+        db_path=settings.DB_PATH,
+        based_currency_mapping=settings.BASED_CURRENCY_MAPPING,
+        since="{{ params.since }}",
+        until="{{ params.until }}",
+        chunk_days="{{ params.chunk_days }}",
+    )
+    staged = (
+        task(dag_tasks.fetch_rates, task_id="fetch_rates", pool=HTTP_POOL)
+        .partial(
+            db_path=settings.DB_PATH,
+            staging_dir=STAGING_DIR,
+            run_id="{{ run_id }}",
+            map_index="{{ ti.map_index }}",
+        )
+        .expand_kwargs(fetch_plan)
+    )
+    # Every write goes through a single task (no lock contention between fetch tasks)
+    written = task(
+        dag_tasks.write_staged, task_id="write_staged", pool=SQLITE_POOL, trigger_rule="none_failed"
+    )(db_path=settings.DB_PATH, staged=staged)
+
+    # One render task per report tab, then the Excel file
+    charts = (
+        task(dag_tasks.render_charts, task_id="render_charts")
+        .partial(db_path=settings.DB_PATH, staging_dir=STAGING_DIR, run_id="{{ run_id }}")
+        .expand(currency_code=settings.REPORT_CURRENCY_LIST)
     )
-    # Generate Excel report
-    excel_report = PythonOperator(
-        task_id="excel_report",
-        python_callable=create_report.report_pipeline,
-        execution_timeout=timedelta(minutes=20),
+    excel_report = task(dag_tasks.assemble_report, task_id="excel_report")(
+        db_path=settings.DB_PATH,
+        report_currency_list=settings.REPORT_CURRENCY_LIST,
+        charts=charts,
+        output_dir="src/reports/",
     )
 
-    quality_connection_tests >> run_etl_pipeline >> excel_report
+    quality_connection_tests >> fetch_plan
+    written >> charts
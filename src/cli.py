@@ -0,0 +1,142 @@
+"""Command line interface (python3 -m src <command> [options]).
+* sync -- fetch the days missing in the base tables
+* backfill -- sync an explicit date range
+* report -- generate the Excel report only
+* bench -- run the benchmarks (JSON output)
+"""
+
+# Standard library
+import argparse
+import json
+from datetime import datetime
+from typing import Optional
+
+# First party
+from src import settings
+from src.modules import benchmark, create_report, metrics, update_currency_exchange
+
+
+def parse_date(value: str) -> datetime:
+    """Parse a YYYY-MM-DD argument."""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid date {value}, expected YYYY-MM-DD")
+
+
+def base_mapping(bases: Optional[list]) -> dict:
+    """Return {based_currency: table_prefix} of the --base arguments (code or code:prefix).
+    * Codes of settings.BASED_CURRENCY_MAPPING keep their prefix, other codes are their own prefix
+    * Default(settings.BASED_CURRENCY_MAPPING)
+    """
+
+    if not bases:
+        return dict(settings.BASED_CURRENCY_MAPPING)
+    mapping = {}
+    for base in bases:
+        code, _, prefix = base.lower().partition(":")
+        mapping[code] = prefix or settings.BASED_CURRENCY_MAPPING.get(code, code)
+    return mapping
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Return the parser of all commands."""
+
+    # Options shared by every command
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db-path", default=settings.DB_PATH, help="SQLite db. Default(%(default)s)")
+    common.add_argument("--metrics-json", help="run summary JSON file. Default(settings.METRICS_JSON_PATH)")
+    common.add_argument(
+        "--metrics-textfile", help="Prometheus textfile. Default(settings.METRICS_TEXTFILE_PATH)"
+    )
+
+    fetch = argparse.ArgumentParser(add_help=False)
+    fetch.add_argument(
+        "--base",
+        action="append",
+        metavar="CODE[:PREFIX]",
+        help="based currency to sync, repeatable. Default(settings.BASED_CURRENCY_MAPPING)",
+    )
+    fetch.add_argument("--workers", type=int, help="days requested concurrently. Default(settings)")
+    fetch.add_argument(
+        "--batch-days", type=int, help="days fetched and committed together. Default(settings)"
+    )
+    fetch.add_argument("--cache-dir", help="response cache directory, 'none' disables it. Default(settings)")
+    fetch.add_argument("--anchor", help="fetch only this base and derive the others (cross-rate mode)")
+
+    parser = argparse.ArgumentParser(prog="python3 -m src", description="Currency exchange ETL and report.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    sync = commands.add_parser("sync", parents=[common, fetch], help="fetch the days missing in the tables")
+    sync.add_argument("--since", type=parse_date, help="first date (YYYY-MM-DD). Default(first stored date)")
+    sync.add_argument("--until", type=parse_date, help="last date (YYYY-MM-DD). Default(today)")
+
+    backfill = commands.add_parser("backfill", parents=[common, fetch], help="sync an explicit date range")
+    backfill.add_argument("--since", type=parse_date, required=True, help="first date (YYYY-MM-DD)")
+    backfill.add_argument("--until", type=parse_date, help="last date (YYYY-MM-DD). Default(today)")
+
+    report = commands.add_parser("report", parents=[common], help="generate the Excel report")
+    report.add_argument(
+        "--currency",
+        action="append",
+        metavar="CODE",
+        help="currency tab, repeatable. Default(settings.REPORT_CURRENCY_LIST)",
+    )
+    report.add_argument("--output", default="src/reports/", help="report directory. Default(%(default)s)")
+    report.add_argument("--render-workers", type=int, help="render charts in a process pool of N workers")
+
+    bench = commands.add_parser("bench", help="run the benchmarks")
+    bench.add_argument(
+        "--scenario",
+        action="append",
+        choices=list(benchmark.BENCHMARKS),
+        help="benchmark to run, repeatable. Default(every benchmark)",
+    )
+    bench.add_argument("--output", help="JSON file. Default(stdout)")
+
+    return parser
+
+
+def apply_fetch_settings(args: argparse.Namespace) -> None:
+    """Override settings with the fetch options given in the command line."""
+    if args.workers:
+        # One keep-alive connection per worker
+        settings.FETCH_MAX_WORKERS = settings.HTTP_POOL_MAXSIZE = args.workers
+    if args.batch_days:
+        settings.ETL_BATCH_DAYS = args.batch_days
+    if args.cache_dir:
+        # An empty dir disables the cache
+        settings.RESPONSE_CACHE_DIR = "" if args.cache_dir.lower() == "none" else args.cache_dir
+
+
+def main(argv: Optional[list] = None) -> int:
+    """Run the command in argv (Default(sys.argv)), return the exit code."""
+
+    args = build_parser().parse_args(argv)
+
+    if args.command in ("sync", "backfill"):
+        apply_fetch_settings(args)
+        update_currency_exchange.etl_pipeline(
+            base_mapping(args.base), args.db_path, args.anchor, since=args.since, until=args.until
+        )
+    elif args.command == "report":
+        if args.render_workers:
+            settings.REPORT_PARALLEL_RENDER = True
+            settings.REPORT_RENDER_WORKERS = args.render_workers
+        create_report.report_pipeline(
+            [code.lower() for code in args.currency or settings.REPORT_CURRENCY_LIST],
+            args.db_path,
+            output_dir=args.output,
+        )
+    else:
+        results = json.dumps(benchmark.run_all(args.scenario), indent=2)
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(results)
+        else:
+            print(results)
+
+    if args.command != "bench":
+        metrics.export(args.metrics_json, args.metrics_textfile)
+
+    return 0
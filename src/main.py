@@ -1,6 +1,144 @@
+# Standard library
+import os
+from datetime import datetime
+from typing import Optional
+
+# Third party
+import pandas as pd
+
 # First party
 from src import settings
-from src.modules import create_report, update_currency_exchange
+from src.modules import (
+    create_report,
+    db,
+    long_store,
+    metrics,
+    render_cache,
+    sync_planner,
+    update_currency_exchange,
+)
+from src.modules.rate_cube import RateCube
+
+
+def stored_window(
+    db_path: str, based_currency: str, table_name: str, report_currency_list: list
+) -> Optional[pd.DataFrame]:
+    """Return the report window of a based currency, None if its table does not exist yet."""
+
+    with db.connection(db_path) as conn_lite:
+        stored = sync_planner.table_exists(
+            conn_lite, long_store.TABLE_NAME if settings.STORAGE_BACKEND == "long" else table_name
+        )
+    if not stored:
+        return None
+    return create_report.load_base_rates(based_currency, table_name, report_currency_list, db_path)
+
+
+def run_pipelined(
+    based_currency_mapping: dict,
+    db_path: str,
+    report_currency_list: list,
+    output_dir: str = "src/reports/",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> bool:
+    """Update the db and generate the report with overlapping stages.
+    * The report window of each base is read once, before its ETL, then extended in memory by each batch
+    * Charts of a base are rendered in a process pool as soon as its table is up to date,
+      while the next bases are fetched (report bases are synced first)
+    * The Excel file is written once every chart is rendered, the db is not read again
+    * Charts read the monthly aggregates of each base once it is synced, like create_report.report_pipeline
+    * Charts and tables of unchanged rates are read from the render cache (settings.REPORT_CACHE_DIR)
+    * since/until -- sync range, see update_currency_exchange.etl_pipeline
+    """
+
+    report_bases = {
+        based_currency: (base_name, table_name)
+        for base_name, (based_currency, table_name) in create_report.REPORT_BASES.items()
+    }
+    # Bases synced together: all of them in cross-rate mode (one anchor payload per day), one by one otherwise
+    ordered_bases = sorted(
+        based_currency_mapping, key=lambda based_currency: based_currency not in report_bases
+    )
+    if settings.CROSS_RATE_ANCHOR:
+        sync_groups = [ordered_bases]
+    else:
+        sync_groups = [[based_currency] for based_currency in ordered_bases]
+
+    windows: dict = {}
+
+    def on_commit(based_currency: str, currency_df: pd.DataFrame) -> None:
+        if windows.get(based_currency) is not None:
+            windows[based_currency] = create_report.extend_window(windows[based_currency], currency_df)
+
+    cache = render_cache.from_settings()
+    cached_charts: dict = {}
+    chart_keys: dict = {}
+    monthly_dfs: dict = {}
+    pending_charts = {}
+    with create_report.render_pool(settings.REPORT_RENDER_WORKERS) as executor:
+
+        def submit_charts(based_currency: str) -> None:
+            base_name, table_name = report_bases[based_currency]
+            if windows.get(based_currency) is None:  # Table created by this run
+                windows[based_currency] = create_report.load_base_rates(
+                    based_currency, table_name, report_currency_list, db_path
+                )
+            monthly_dfs[base_name] = create_report.window_monthly(
+                db_path, based_currency, windows[based_currency]
+            )
+            jobs = create_report.chart_jobs(
+                windows[based_currency], base_name, report_currency_list, monthly_dfs[base_name]
+            )
+            if cache:
+                keys = {chart: create_report.chart_key(args) for chart, args in jobs.items()}
+                chart_keys.update(keys)
+                cached_charts.update(create_report.cached_charts(cache, keys))
+            for chart, args in jobs.items():
+                if chart not in cached_charts:
+                    pending_charts[chart] = executor.submit(create_report.render_chart_png, *args)
+
+        for sync_group in sync_groups:
+            for based_currency in report_bases.keys() & set(sync_group):
+                windows[based_currency] = stored_window(
+                    db_path, based_currency, report_bases[based_currency][1], report_currency_list
+                )
+            update_currency_exchange.etl_pipeline(
+                {based_currency: based_currency_mapping[based_currency] for based_currency in sync_group},
+                db_path,
+                since=since,
+                until=until,
+                on_commit=on_commit,
+            )
+            for based_currency in report_bases.keys() & set(sync_group):
+                submit_charts(based_currency)
+        # Report bases not synced by this run
+        for based_currency in report_bases.keys() - windows.keys():
+            submit_charts(based_currency)
+        db.get_pool().close_all()
+
+        # Time the report waits for charts still rendering once every base is synced
+        with metrics.timer("render_wait"):
+            rendered_charts = {chart: future.result() for chart, future in pending_charts.items()}
+    if cache:
+        for chart, png in rendered_charts.items():
+            cache.put(chart_keys[chart], "png", png)
+
+    dollar_df, euro_df = windows["usd"], windows["eur"]
+    if settings.REPORT_RATE_CUBE:
+        cube = RateCube.from_frames({"usd": dollar_df, "eur": euro_df})
+        dollar_df, euro_df = cube["usd"], cube["eur"]
+    create_report.generate_excel_report(
+        dollar_df,
+        euro_df,
+        currency_list=report_currency_list,
+        file_path=os.path.join(output_dir, ""),
+        monthly_dfs=monthly_dfs,
+        charts={**cached_charts, **rendered_charts},
+        cache=cache,
+    )
+
+    return True
 
 
 def run():
@@ -14,11 +152,18 @@ def run():
     * Generate an excel report comparing the chosen currency with dollar and euro
     New currency can be added in REPORT_CURRENCY_LIST (settings.py)
     Each currency will add a tab in the report
+
+    * With settings.PIPELINED_RUN both steps overlap, see run_pipelined
     """
-    # updates the db regardless of the last update date
-    update_currency_exchange.etl_pipeline(settings.BASED_CURRENCY_MAPPING, settings.DB_PATH)
-    # Generates Excel report
-    create_report.report_pipeline(settings.REPORT_CURRENCY_LIST, settings.DB_PATH)
+    if settings.PIPELINED_RUN:
+        run_pipelined(settings.BASED_CURRENCY_MAPPING, settings.DB_PATH, settings.REPORT_CURRENCY_LIST)
+    else:
+        # updates the db regardless of the last update date
+        update_currency_exchange.etl_pipeline(settings.BASED_CURRENCY_MAPPING, settings.DB_PATH)
+        # Generates Excel report
+        create_report.report_pipeline(settings.REPORT_CURRENCY_LIST, settings.DB_PATH)
+    # Time spent in each stage, HTTP and db counters (settings.METRICS_JSON_PATH)
+    metrics.export()
 
     return True
 
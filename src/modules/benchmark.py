@@ -0,0 +1,395 @@
+"""Benchmarks for the ETL and report stages, results are JSON so runs can be compared across releases.
+* Micro-benchmarks compare each optimized stage with the code it replaced
+* End-to-end scenarios run the ETL against a local stub of the API (stub_api.py), no network needed
+Run with: python3 -m src.modules.benchmark [scenario ...] (or python3 -m src bench)
+"""
+
+# Standard library
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import Callable, Iterator, Optional
+
+# Third party
+import numpy as np
+import pandas as pd
+
+# Local
+from . import bulk_write, create_report, http_client, rate_stats, update_currency_exchange
+from .rate_frame_builder import RateFrameBuilder
+from .stub_api import StubCurrencyAPI
+from .. import main, settings
+
+
+def best_of(func: Callable, repeat: int = 3) -> float:
+    """Return the best wall time (seconds) of repeat calls to func."""
+    timings = []
+    for _ in range(repeat):
+        t_start = perf_counter()
+        func()
+        timings.append(perf_counter() - t_start)
+    return min(timings)
+
+
+def synthetic_payloads(n_days: int, n_currencies: int, seed: int = 0) -> tuple[list, list, list]:
+    """Return (columns, days, rates) imitating n_days of API payloads with n_currencies each."""
+    rng = np.random.default_rng(seed)
+    codes = [f"c{i:03d}" for i in range(n_currencies)]
+    first_day = datetime(2023, 1, 1)
+    days = [first_day + timedelta(days=i) for i in range(n_days)]
+    values = rng.uniform(0.01, 5000, size=(n_days, n_currencies))
+    rates = [dict(zip(codes, row.tolist())) for row in values]
+    return ["exchange_date"] + codes, days, rates
+
+
+def loc_append_frame(columns: list, days: list, rates: list) -> pd.DataFrame:
+    """Transform used before RateFrameBuilder: one DataFrame.loc append per day (baseline)."""
+    currency_df = pd.DataFrame(columns=columns)
+    for row_counter, (day, day_rates) in enumerate(zip(days, rates)):
+        currency_values_list: list = [day.strftime("%Y-%m-%d")]
+        for col in columns[1:]:
+            currency_value = day_rates.get(col)
+            currency_values_list.append(currency_value if currency_value else np.nan)
+        currency_df.loc[row_counter] = currency_values_list
+    return currency_df
+
+
+def builder_frame(columns: list, days: list, rates: list) -> pd.DataFrame:
+    """Transform with RateFrameBuilder."""
+    builder = RateFrameBuilder(columns, n_rows=len(days))
+    for day, day_rates in zip(days, rates):
+        builder.add(day, day_rates)
+    return builder.to_frame()
+
+
+def bench_transform(n_days: int = 365, n_currencies: int = 273, repeat: int = 3) -> dict:
+    """Compare the transform stage (payloads -> DataFrame), loc appends vs RateFrameBuilder."""
+    columns, days, rates = synthetic_payloads(n_days, n_currencies)
+    loc_append = best_of(lambda: loc_append_frame(columns, days, rates), repeat)
+    builder = best_of(lambda: builder_frame(columns, days, rates), repeat)
+    return {
+        "scenario": "transform",
+        "days": n_days,
+        "currencies": n_currencies,
+        "loc_append_s": round(loc_append, 4),
+        "builder_s": round(builder, 4),
+        "speedup": round(loc_append / builder, 1),
+    }
+
+
+def synthetic_report_tables(n_currencies: int, n_days: int = 400, seed: int = 0) -> tuple:
+    """Return (dollar_df, euro_df) shaped like the tables loaded by the report."""
+    columns, days, rates = synthetic_payloads(n_days, n_currencies, seed)
+    dollar_df = builder_frame(columns, days, rates)
+    euro_df = dollar_df.assign(**{col: dollar_df[col] * 1.08 for col in columns[1:]})
+    return dollar_df, euro_df
+
+
+def slice_window_ranges(currency_df: pd.DataFrame, currency_list: list) -> list:
+    """Window ranges as computed before rate_stats: max()/min() of reversed slices (baseline)."""
+    ranges = []
+    for currency_code in currency_list:
+        correct_col = rate_stats.currency_column(currency_df.columns, currency_code)
+        specific_df_reverse = currency_df.loc[:, ["exchange_date", correct_col]].iloc[::-1]
+        for days in rate_stats.REPORT_WINDOWS.values():
+            window = specific_df_reverse[:days][correct_col]
+            ranges.append((min(window), max(window)))
+    return ranges
+
+
+def bench_window_stats(n_currencies: int = 273, n_days: int = 400, repeat: int = 3) -> dict:
+    """Compare window range stats for all currencies, reversed slices vs one vectorized pass."""
+    currency_df, _ = synthetic_report_tables(n_currencies, n_days)
+    currency_list = [col for col in currency_df.columns if col != "exchange_date"]
+    slices = best_of(lambda: slice_window_ranges(currency_df, currency_list), repeat)
+    vectorized = best_of(lambda: rate_stats.window_stats(currency_df, currency_list), repeat)
+    return {
+        "scenario": "window_stats",
+        "days": n_days,
+        "currencies": n_currencies,
+        "slices_s": round(slices, 4),
+        "vectorized_s": round(vectorized, 4),
+        "speedup": round(slices / vectorized, 1),
+    }
+
+
+def bench_report_render(
+    tab_counts: tuple = (5, 50, 200, 273), render_workers: Optional[int] = None, repeat: int = 1
+) -> list:
+    """Compare report generation (one tab per currency), serial vs parallel chart rendering."""
+
+    results = []
+    for n_tabs in tab_counts:
+        dollar_df, euro_df = synthetic_report_tables(n_tabs)
+        currency_list = [col for col in dollar_df.columns if col != "exchange_date"]
+        timings = {}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for mode, parallel_render in [("serial", False), ("parallel", True)]:
+                timings[mode] = best_of(
+                    lambda: create_report.generate_excel_report(
+                        dollar_df,
+                        euro_df,
+                        currency_list,
+                        file_path=tmp_dir + "/",
+                        parallel_render=parallel_render,
+                        render_workers=render_workers,
+                    ),
+                    repeat,
+                )
+        results.append(
+            {
+                "scenario": "report_render",
+                "tabs": n_tabs,
+                "workers": render_workers or os.cpu_count(),
+                "serial_s": round(timings["serial"], 3),
+                "parallel_s": round(timings["parallel"], 3),
+                "speedup": round(timings["serial"] / timings["parallel"], 2),
+            }
+        )
+
+    return results
+
+
+def to_sql_insert(df: pd.DataFrame, db_path: str, table_name: str) -> None:
+    """Insert used before bulk_write: DataFrame.to_sql(method="multi") (baseline).
+    * Chunked to SQLite's 32766 bound variables per statement, unchunked it fails above ~119 wide rows
+    """
+    conn_lite = sqlite3.connect(db_path)
+    df.to_sql(
+        name=table_name,
+        con=conn_lite,
+        if_exists="append",
+        index=False,
+        method="multi",
+        chunksize=32766 // len(df.columns),
+    )
+    conn_lite.close()
+
+
+def bench_bulk_insert(years: tuple = (1, 10), n_currencies: int = 273, repeat: int = 3) -> list:
+    """Compare loading years of synthetic daily rows into a wide table, to_sql vs bulk_write."""
+
+    results = []
+    for n_years in years:
+        columns, days, rates = synthetic_payloads(365 * n_years, n_currencies)
+        currency_df = builder_frame(columns, days, rates)
+        timings = {}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            inserts: list[tuple[str, Callable]] = [("to_sql", to_sql_insert), ("bulk", bulk_write.insert_df)]
+            for mode, insert in inserts:
+                db_path = os.path.join(tmp_dir, f"{mode}.db")
+                conn_lite = sqlite3.connect(db_path)
+                currency_df[:0].to_sql(name="rates", con=conn_lite, index=False)
+                conn_lite.close()
+                timings[mode] = best_of(lambda: insert(currency_df, db_path, "rates"), repeat)
+        results.append(
+            {
+                "scenario": "bulk_insert",
+                "rows": len(currency_df),
+                "currencies": n_currencies,
+                "to_sql_s": round(timings["to_sql"], 4),
+                "bulk_s": round(timings["bulk"], 4),
+                "speedup": round(timings["to_sql"] / timings["bulk"], 1),
+            }
+        )
+
+    return results
+
+
+@contextmanager
+def override_settings(**values) -> Iterator[None]:
+    """Set settings attributes for the duration of the block."""
+    previous = {name: getattr(settings, name) for name in values}
+    for name, value in values.items():
+        setattr(settings, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(settings, name, value)
+
+
+def timed_sync(db_path: str, stub: StubCurrencyAPI, since: datetime, until: datetime, **overrides) -> dict:
+    """Run the ETL of the usd table against stub (response cache disabled), return time and HTTP counters.
+    * overrides -- settings set during the run
+    """
+
+    requests_before = http_client.get_client().stats()
+    with override_settings(API_BASE_URL=stub.base_url, RESPONSE_CACHE_DIR="", **overrides):
+        t_start = perf_counter()
+        update_currency_exchange.etl_pipeline({"usd": "dollar"}, db_path, since=since, until=until)
+        elapsed = perf_counter() - t_start
+    requests_after = http_client.get_client().stats()
+
+    return {
+        "wall_s": round(elapsed, 3),
+        "requests": requests_after["requests"] - requests_before["requests"],
+        "retries": requests_after["retries"] - requests_before["retries"],
+    }
+
+
+def bench_sync(
+    n_days: int = 365,
+    n_currencies: int = 273,
+    latency: float = 0.02,
+    error_rate: float = 0.01,
+    workers: Optional[int] = None,
+) -> list:
+    """Cold backfill of n_days into an empty db, then the daily incremental sync of the next day.
+    * latency/error_rate -- of the stub API (failed requests are retried by http_client)
+    """
+
+    today = datetime.today()
+    workers = workers or settings.FETCH_MAX_WORKERS
+    scenario = {
+        "currencies": n_currencies,
+        "latency_s": latency,
+        "error_rate": error_rate,
+        "workers": workers,
+    }
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "bench.db")
+        with StubCurrencyAPI(latency=latency, error_rate=error_rate, n_currencies=n_currencies) as stub:
+            for name, since, until in [
+                ("cold_backfill", today - timedelta(days=n_days), today - timedelta(days=1)),
+                # Same range plus today: only today is missing
+                ("incremental_sync", today - timedelta(days=n_days), today),
+            ]:
+                timing = timed_sync(db_path, stub, since, until, FETCH_MAX_WORKERS=workers)
+                days = n_days if name == "cold_backfill" else 1
+                results.append(
+                    {
+                        "scenario": name,
+                        "days": days,
+                        **scenario,
+                        **timing,
+                        "days_per_s": round(days / timing["wall_s"], 1),
+                    }
+                )
+
+    return results
+
+
+def bench_memory_peak(n_days: int = 365, n_currencies: int = 273, batch_days: int = 30) -> dict:
+    """Peak Python memory of a cold backfill, committed by batches vs in a single batch (tracemalloc)."""
+
+    today = datetime.today()
+    peaks = {}
+    for mode, mode_batch_days in [("batched", batch_days), ("single_batch", n_days)]:
+        with tempfile.TemporaryDirectory() as tmp_dir, StubCurrencyAPI(n_currencies=n_currencies) as stub:
+            tracemalloc.start()
+            timed_sync(
+                os.path.join(tmp_dir, "bench.db"),
+                stub,
+                today - timedelta(days=n_days),
+                today - timedelta(days=1),
+                ETL_BATCH_DAYS=mode_batch_days,
+            )
+            peaks[mode] = tracemalloc.get_traced_memory()[1] / 1024**2
+            tracemalloc.stop()
+
+    return {
+        "scenario": "memory_peak",
+        "days": n_days,
+        "currencies": n_currencies,
+        "batch_days": batch_days,
+        "batched_peak_mb": round(peaks["batched"], 1),
+        "single_batch_peak_mb": round(peaks["single_batch"], 1),
+    }
+
+
+def bench_pipelined_run(
+    n_days: int = 120,
+    n_currencies: int = 273,
+    report_currencies: int = 10,
+    latency: float = 0.1,
+    workers: int = 4,
+) -> dict:
+    """Full run (usd and eur tables created, synced, then the report), sequential vs main.run_pipelined.
+    * Pipelined: charts of usd are rendered while eur is fetched, the report does not reread the db
+    """
+
+    today = datetime.today()
+    since, until = today - timedelta(days=n_days), today - timedelta(days=1)
+    mapping = {"usd": "dollar", "eur": "euro"}
+    timings = {}
+    for mode in ["sequential", "pipelined"]:
+        with (
+            tempfile.TemporaryDirectory() as tmp_dir,
+            StubCurrencyAPI(latency=latency, n_currencies=n_currencies) as stub,
+            override_settings(
+                API_BASE_URL=stub.base_url,
+                RESPONSE_CACHE_DIR="",
+                REPORT_CACHE_DIR="",
+                FETCH_MAX_WORKERS=workers,
+            ),
+        ):
+            db_path = os.path.join(tmp_dir, "bench.db")
+            currency_list = stub.codes[:report_currencies]
+            t_start = perf_counter()
+            if mode == "sequential":
+                update_currency_exchange.etl_pipeline(mapping, db_path, since=since, until=until)
+                create_report.report_pipeline(currency_list, db_path, output_dir=tmp_dir)
+            else:
+                main.run_pipelined(mapping, db_path, currency_list, tmp_dir, since=since, until=until)
+            timings[mode] = perf_counter() - t_start
+
+    return {
+        "scenario": "pipelined_run",
+        "days": n_days,
+        "currencies": n_currencies,
+        "report_currencies": report_currencies,
+        "latency_s": latency,
+        "workers": workers,
+        "sequential_s": round(timings["sequential"], 3),
+        "pipelined_s": round(timings["pipelined"], 3),
+        "speedup": round(timings["sequential"] / timings["pipelined"], 2),
+    }
+
+
+# Scenario name -> benchmark (returning a result or a list of results)
+BENCHMARKS: dict[str, Callable] = {
+    "transform": bench_transform,
+    "window_stats": bench_window_stats,
+    "bulk_insert": bench_bulk_insert,
+    "report_render": bench_report_render,
+    "sync": bench_sync,
+    "memory_peak": bench_memory_peak,
+    "pipelined_run": bench_pipelined_run,
+}
+
+
+def environment() -> dict:
+    """Return where the benchmarks ran, to compare results across releases and machines."""
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "sqlite": sqlite3.sqlite_version,
+    }
+
+
+def run_all(names: Optional[list] = None) -> dict:
+    """Return the environment and the results of the benchmarks in names. Default(every benchmark)."""
+
+    results = []
+    for name in names or BENCHMARKS:
+        result = BENCHMARKS[name]()
+        results += result if isinstance(result, list) else [result]
+
+    return {"environment": environment(), "results": results}
+
+
+if __name__ == "__main__":
+    print(json.dumps(run_all(sys.argv[1:]), indent=2))
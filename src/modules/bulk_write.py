@@ -0,0 +1,72 @@
+# Standard library
+import logging
+import sqlite3
+from itertools import islice
+from typing import Iterable, Optional
+
+# Third party
+import pandas as pd
+
+# Local
+from . import db
+from .. import settings
+
+bulk_write_log = logging.getLogger("bulk_write.py")
+
+
+def write_rows(conn: sqlite3.Connection, sql: str, rows: Iterable, batch_size: Optional[int] = None) -> int:
+    """Execute a prepared statement for every row, in batches of one transaction. Return the number of rows.
+    * batch_size -- rows per executemany call. Default(settings.SQLITE_BATCH_SIZE)
+    """
+
+    batch_size = batch_size or settings.SQLITE_BATCH_SIZE
+    rows = iter(rows)
+    n_rows = 0
+    with db.transaction(conn):
+        while batch := list(islice(rows, batch_size)):
+            conn.executemany(sql, batch)
+            n_rows += len(batch)
+    return n_rows
+
+
+def insert_sql(table_name: str, columns: list) -> str:
+    """Return the prepared INSERT statement of columns."""
+    cols_sql = ", ".join(f'"{col}"' for col in columns)
+    return f"INSERT INTO {table_name} ({cols_sql}) VALUES ({', '.join('?' * len(columns))})"
+
+
+def upsert_sql(table_name: str, columns: list, key: str) -> str:
+    """Return the prepared INSERT statement of columns, rows with an existing key are updated instead.
+    * key must have a UNIQUE index
+    """
+    updates_sql = ", ".join(f'"{col}" = excluded."{col}"' for col in columns if col != key)
+    return f'{insert_sql(table_name, columns)} ON CONFLICT ("{key}") DO UPDATE SET {updates_sql}'
+
+
+def insert_df(
+    df: pd.DataFrame,
+    db_path: str,
+    table_name: str,
+    batch_size: Optional[int] = None,
+    conflict_key: Optional[str] = None,
+) -> int:
+    """Write the rows of df to an existing table, return the number of rows written.
+    * conflict_key -- upsert on this UNIQUE column. Default(append)
+    * NaN rates are stored as NULL (SQLite binds NaN as NULL)
+    """
+
+    columns = df.columns.tolist()
+    with db.connection(db_path) as conn_lite:
+        n_rows = write_rows(
+            conn_lite,
+            (
+                upsert_sql(table_name, columns, conflict_key)
+                if conflict_key
+                else insert_sql(table_name, columns)
+            ),
+            df.to_numpy(object).tolist(),  # Python scalars, faster than itertuples
+            batch_size,
+        )
+    bulk_write_log.debug(f"{n_rows} rows written to {table_name}")
+
+    return n_rows
@@ -0,0 +1,259 @@
+"""Columnar copy of the rate history: one file per based currency and month (Parquet or Arrow IPC).
+* Layout: {export_dir}/base={based_currency}/year=YYYY/month=MM/part.{parquet|arrow}
+* Written by the ETL with each committed batch (only the months it touched), readers load only the
+  columns they need
+* Arrow IPC files are uncompressed and memory-mapped, columns are read without parsing
+Export existing tables with: python3 -m src.modules.columnar_store
+"""
+
+# Standard library
+import glob
+import logging
+import os
+import sqlite3
+from typing import Optional
+
+# Third party
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+# Local
+from . import db, long_store, metrics, monthly_agg
+from .. import settings
+
+columnar_store_log = logging.getLogger("columnar_store.py")
+
+# File extension of each format
+FORMATS = {"parquet": "parquet", "arrow": "arrow"}
+
+
+def base_dir(export_dir: str, based_currency: str) -> str:
+    """Return the directory holding the partitions of based_currency."""
+    return os.path.join(export_dir, f"base={based_currency}")
+
+
+def partition_path(export_dir: str, based_currency: str, month: str, fmt: str) -> str:
+    """Return the file of a month (YYYY-MM)."""
+    year, month_number = month.split("-")
+    return os.path.join(
+        base_dir(export_dir, based_currency), f"year={year}", f"month={month_number}", f"part.{FORMATS[fmt]}"
+    )
+
+
+def stored_months(conn: sqlite3.Connection, based_currency: str, table_name: Optional[str]) -> list:
+    """Return the months (YYYY-MM) stored in the db.
+    * table_name -- wide table holding the rates. Default(long_store rate table)
+    """
+    if table_name is None:
+        query = f"SELECT DISTINCT substr(exchange_date, 1, 7) FROM {long_store.TABLE_NAME} WHERE base = ?"
+        params: tuple = (based_currency,)
+    else:
+        query, params = f"SELECT DISTINCT substr(exchange_date, 1, 7) FROM {table_name}", ()
+    return sorted(month for (month,) in conn.execute(query, params))
+
+
+def month_frame(
+    conn: sqlite3.Connection, based_currency: str, month: str, table_name: Optional[str]
+) -> pd.DataFrame:
+    """Return the wide rows (exchange_date + one float column per quote) of a month.
+    * table_name -- wide table holding the rates. Default(long_store rate table, pivoted)
+    """
+
+    start, end = monthly_agg.month_range([month])
+    if table_name is None:
+        long_df = pd.read_sql_query(
+            f"""SELECT exchange_date, quote, rate FROM {long_store.TABLE_NAME}
+            WHERE base = ? AND exchange_date >= ? AND exchange_date < ?""",
+            conn,
+            params=(based_currency, start, end),
+        )
+        wide_df = long_df.pivot(index="exchange_date", columns="quote", values="rate")
+        wide_df.columns.name = None
+        wide_df = wide_df.reset_index()
+    else:
+        wide_df = pd.read_sql_query(
+            f"SELECT * FROM {table_name} WHERE exchange_date >= ? AND exchange_date < ?",
+            conn,
+            params=(start, end),
+        )
+    # Columns without any rate in the month are read as object, same schema in every partition
+    rate_cols = wide_df.columns[1:]
+    wide_df[rate_cols] = wide_df[rate_cols].astype("float64")
+
+    return wide_df.drop_duplicates("exchange_date", keep="last").sort_values("exchange_date")
+
+
+def write_partition(df: pd.DataFrame, path: str, fmt: str) -> None:
+    """Write df to path through a temporary file, readers never see a partial file."""
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if fmt == "parquet":
+        pq.write_table(table, tmp_path)
+    else:
+        with pa.OSFile(tmp_path, "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def export_table(
+    db_path: str,
+    based_currency: str,
+    table_name: Optional[str],
+    export_dir: str,
+    fmt: str,
+    months: Optional[list] = None,
+) -> int:
+    """Write the partitions of based_currency, return the number of files written.
+    * months -- months (YYYY-MM) rewritten. Default(every stored month)
+    * Every stored month is written on the first export of a based currency
+    """
+
+    if fmt not in FORMATS:
+        raise ValueError(f"Columnar format {fmt} not supported, use one of {list(FORMATS)}")
+
+    with db.connection(db_path) as conn_lite:
+        if table_name is None:
+            long_store.create_long_table(conn_lite)
+        if months is None or not os.path.isdir(base_dir(export_dir, based_currency)):
+            months = stored_months(conn_lite, based_currency, table_name)
+        for month in months:
+            path = partition_path(export_dir, based_currency, month, fmt)
+            write_partition(month_frame(conn_lite, based_currency, month, table_name), path, fmt)
+            # A single file per month when the format changes
+            for other_fmt in FORMATS.keys() - {fmt}:
+                other_path = partition_path(export_dir, based_currency, month, other_fmt)
+                if os.path.exists(other_path):
+                    os.remove(other_path)
+
+    return len(months)
+
+
+def export(
+    db_path: str,
+    based_currency_mapping: dict,
+    months: Optional[dict] = None,
+    export_dir: Optional[str] = None,
+    fmt: Optional[str] = None,
+) -> dict:
+    """Export every based currency, return the number of files written per based currency.
+    * months -- {based_currency: months rewritten}. Default(every stored month)
+    * export_dir -- Default(settings.COLUMNAR_EXPORT_DIR)
+    * fmt -- "parquet" or "arrow". Default(settings.COLUMNAR_EXPORT_FORMAT, parquet if disabled)
+    """
+
+    export_dir = export_dir or settings.COLUMNAR_EXPORT_DIR
+    fmt = fmt or settings.COLUMNAR_EXPORT_FORMAT or "parquet"
+    written = {}
+    with metrics.timer("columnar_export"):
+        for based_currency, table_prefix in based_currency_mapping.items():
+            table_name = None if settings.STORAGE_BACKEND == "long" else table_prefix + "_based_currency"
+            written[based_currency] = export_table(
+                db_path,
+                based_currency,
+                table_name,
+                export_dir,
+                fmt,
+                None if months is None else months.get(based_currency, []),
+            )
+    columnar_store_log.info(f"Columnar {fmt} files written in {export_dir}: {written}")
+
+    return written
+
+
+def partitions(export_dir: str, based_currency: str) -> list:
+    """Return the (month, path) of every partition of based_currency, sorted by month."""
+
+    found = []
+    for path in glob.glob(os.path.join(base_dir(export_dir, based_currency), "year=*", "month=*", "part.*")):
+        if os.path.splitext(path)[1][1:] not in FORMATS.values():  # Temporary files of a running export
+            continue
+        year_dir, month_dir = os.path.split(os.path.dirname(path))
+        year = os.path.basename(year_dir).removeprefix("year=")
+        found.append((f"{year}-{month_dir.removeprefix('month=')}", path))
+
+    return sorted(found)
+
+
+def partition_schema(path: str) -> pa.Schema:
+    """Return the schema of a partition (only the file footer is read)."""
+    if path.endswith(".parquet"):
+        return pq.read_schema(path, memory_map=True)
+    with pa.memory_map(path, "r") as source:
+        return ipc.open_file(source).schema
+
+
+def read_partition(path: str, columns: Optional[list] = None) -> pa.Table:
+    """Return the columns of a partition (missing columns are skipped), Arrow IPC files are memory-mapped.
+    * columns -- Default(all columns)
+    """
+
+    if path.endswith(".parquet"):
+        schema_names = partition_schema(path).names
+        selected = schema_names if columns is None else [col for col in columns if col in schema_names]
+        return pq.read_table(path, columns=selected, memory_map=True)
+    # Buffers point to the mapped file: only the selected columns are paged in
+    with pa.memory_map(path, "r") as source:
+        table = ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select([col for col in columns if col in table.column_names])
+
+    return table
+
+
+def stored_columns(based_currency: str, export_dir: Optional[str] = None) -> list:
+    """Return the columns of the last partition of based_currency (empty if nothing was exported).
+    * export_dir -- Default(settings.COLUMNAR_EXPORT_DIR)
+    """
+    found = partitions(export_dir or settings.COLUMNAR_EXPORT_DIR, based_currency)
+    return partition_schema(found[-1][1]).names if found else []
+
+
+def last_exchange_date(based_currency: str, export_dir: Optional[str] = None) -> Optional[str]:
+    """Return the last date (YYYY-MM-DD) exported for based_currency (None if there is none).
+    * export_dir -- Default(settings.COLUMNAR_EXPORT_DIR)
+    """
+    found = partitions(export_dir or settings.COLUMNAR_EXPORT_DIR, based_currency)
+    if not found:
+        return None
+    return max(read_partition(found[-1][1], ["exchange_date"]).column("exchange_date").to_pylist())
+
+
+def read_columns(
+    based_currency: str,
+    columns: Optional[list] = None,
+    since: Optional[str] = None,
+    export_dir: Optional[str] = None,
+) -> pd.DataFrame:
+    """Return exchange_date and columns of based_currency from the columnar files.
+    * columns -- Default(all columns)
+    * since -- first date (YYYY-MM-DD) included, older partitions are not opened. Default(all dates)
+    * export_dir -- Default(settings.COLUMNAR_EXPORT_DIR)
+    """
+
+    export_dir = export_dir or settings.COLUMNAR_EXPORT_DIR
+    selected = (
+        None if columns is None else ["exchange_date"] + [col for col in columns if col != "exchange_date"]
+    )
+    tables = [
+        read_partition(path, selected)
+        for month, path in partitions(export_dir, based_currency)
+        if since is None or month >= since[:7]
+    ]
+    if not tables:
+        return pd.DataFrame(columns=selected or ["exchange_date"])
+    # Partitions written before a new currency was added lack its column (filled with nulls)
+    df = pa.concat_tables(tables, promote_options="default").to_pandas(split_blocks=True)
+    if selected is not None:
+        df = df.reindex(columns=selected)
+    if since is not None:
+        df = df[df.exchange_date >= since]
+
+    return df.reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    export(settings.DB_PATH, settings.BASED_CURRENCY_MAPPING)
@@ -1,52 +1,134 @@
 # Standard library
+import io
+import json
+import logging
 import os
 import re
-import sqlite3
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional, Union
 
 # Third party
+import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import seaborn as sns
+from matplotlib.figure import Figure
 
+# Local
+from . import columnar_store, db, long_store, metrics, monthly_agg, rate_stats, render_cache
+from .rate_cube import RateCube
+from .render_cache import RenderCache
+from .. import settings
 
-def complete_table_df(db_path: str, table_name: str) -> pd.DataFrame:  # pragma: no cover
-    """Return a df with the complete specified table."""
+# Rates of one based currency: wide frame (exchange_date + one column per currency) or single base RateCube
+Rates = Union[pd.DataFrame, RateCube]
+# Report bases: name used in titles and charts -> (based currency, wide table)
+REPORT_BASES = {"Dollar": ("usd", "dollar_based_currency"), "Euro": ("eur", "euro_based_currency")}
+# Part of every render cache key: bump it when the charts or tables layout changes (cached parts are rebuilt)
+REPORT_STYLE_VERSION = 1
 
-    conn_lite = sqlite3.connect(db_path)
-    query = f"SELECT   * FROM    {table_name}"
-    df = pd.read_sql_query(query, conn_lite)
-    conn_lite.close()
+# Month labels (e.g. "Nov, 2023") would log an INFO line for every chart
+logging.getLogger("matplotlib.category").setLevel(logging.WARNING)
+
+
+def window_start(last_date: Optional[str], lookback_days: Optional[int] = None) -> str:
+    """Return the first date (YYYY-MM-DD) needed by the report given the last date in a table.
+    * lookback_days -- Default(settings.REPORT_LOOKBACK_DAYS)
+    """
+    if not last_date:
+        return ""
+    lookback_days = lookback_days or settings.REPORT_LOOKBACK_DAYS
+    return (datetime.strptime(last_date, "%Y-%m-%d") - timedelta(days=lookback_days)).strftime("%Y-%m-%d")
+
+
+def report_table_df(
+    db_path: str, table_name: str, currency_list: list, since: Optional[str] = None
+) -> pd.DataFrame:
+    """Return exchange_date and the columns of currency_list, only for the dates used by the report.
+    * since -- first date (YYYY-MM-DD) loaded. Default(settings.REPORT_LOOKBACK_DAYS before the last date)
+    """
+
+    with db.connection(db_path) as conn_lite:
+        table_cols = [row[1] for row in conn_lite.execute(f"PRAGMA table_info({table_name})")]
+        selected_cols = list(
+            dict.fromkeys(rate_stats.currency_column(table_cols, code) for code in currency_list)
+        )
+        if since is None:
+            (last_date,) = conn_lite.execute(f"SELECT max(exchange_date) FROM {table_name}").fetchone()
+            since = window_start(last_date)
+
+        cols_sql = ", ".join(f'"{col}"' for col in ["exchange_date"] + selected_cols)
+        query = f"SELECT {cols_sql} FROM {table_name} WHERE exchange_date >= ? ORDER BY exchange_date"
+        df = pd.read_sql_query(query, conn_lite, params=(since,))
 
     return df
 
 
-def historical_line_plot(
-    currency_df: pd.DataFrame, currency_code: str, save_path: str = "my_fig.png"
-) -> None:
-    """Saves an image with a line plot of the last 12 months average, max and min currency rates.
-    * Base Currency will be defined by the df currency_df
-    * currency_code may be any of the 273 currencies available
+def report_columnar_df(based_currency: str, currency_list: list, since: Optional[str] = None) -> pd.DataFrame:
+    """Return exchange_date and the columns of currency_list from the columnar files (columnar_store).
+    * Only the selected columns of the months in the report window are read (Arrow IPC files memory-mapped)
+    * since -- first date (YYYY-MM-DD) loaded. Default(settings.REPORT_LOOKBACK_DAYS before the last date)
     """
 
-    # Identifies base currency (dollar or euro)
-    if currency_df.usd.mean() == 1:
-        base_currency = "Dollar"
-    else:
-        base_currency = "Euro"
+    stored_cols = columnar_store.stored_columns(based_currency)
+    selected_cols = list(
+        dict.fromkeys(rate_stats.currency_column(stored_cols, code) for code in currency_list)
+    )
+    if since is None:
+        since = window_start(columnar_store.last_exchange_date(based_currency))
+
+    return columnar_store.read_columns(based_currency, selected_cols, since)
+
+
+def rates_column(currency_df: Rates, currency_code: str) -> str:
+    """Return the column of currency_code (dict lookup for a RateCube, see rate_stats.currency_column)."""
+    if isinstance(currency_df, RateCube):
+        return currency_df.column(currency_code)
+    return rate_stats.currency_column(currency_df.columns, currency_code)
+
+
+def extend_window(currency_df: pd.DataFrame, new_df: pd.DataFrame) -> pd.DataFrame:
+    """Return currency_df with the rows of new_df (new rows replace stored dates), cut to the report window.
+    * new_df -- rows just committed by the ETL, columns missing from currency_df are dropped
+    """
+
+    df = pd.concat([currency_df, new_df.reindex(columns=currency_df.columns)], ignore_index=True)
+    df = df.drop_duplicates("exchange_date", keep="last").sort_values("exchange_date")
+    return df[df.exchange_date >= window_start(df.exchange_date.max())].reset_index(drop=True)
+
+
+def monthly_summary(
+    currency_df: Rates, currency_code: str, monthly_df: Optional[pd.DataFrame] = None
+) -> pd.DataFrame:
+    """Return mean, max and min rates of the last 13 months (str_date column as plot label).
+    * monthly_df -- stored aggregates (monthly_agg.read_monthly), used if they hold every month of
+      currency_df with a rate. Default(group the daily rates)
+    """
 
     # Identifies correct column from code
-    for col in currency_df.columns:
-        if re.search(f"^{currency_code}", col):
-            correct_col = col
-            break
-
-    # Group data
-    currency_df.exchange_date = pd.to_datetime(currency_df.exchange_date)
-    grouped_currency_df = currency_df.groupby(pd.Grouper(key="exchange_date", freq="1M"))[correct_col].agg(
-        [np.mean, max, min]
-    )
+    correct_col = rates_column(currency_df, currency_code)
+    if isinstance(currency_df, RateCube):
+        currency_df = currency_df.to_frame(currency_df.bases[0], [correct_col])
+
+    stored_df = monthly_df[monthly_df.quote == correct_col] if monthly_df is not None else pd.DataFrame()
+    # The ETL only refreshes the months it writes: aggregates of a db written before monthly_agg existed
+    # miss the older months until monthly_agg.rebuild is run
+    rated_months = monthly_agg.months_of(currency_df.exchange_date[currency_df[correct_col].notna()])
+    if not stored_df.empty and set(rated_months) <= set(stored_df.month):
+        # Precomputed by the ETL, months without rates are kept as NaN like the Grouper below
+        month_ends = pd.to_datetime(stored_df.month) + pd.offsets.MonthEnd(0)
+        grouped_currency_df = (
+            stored_df[["mean", "max", "min"]].set_axis(month_ends).asfreq("M").rename_axis("exchange_date")
+        )
+    else:
+        # Group data
+        # Dates are converted on a copy, the caller's df is left untouched
+        currency_df = currency_df.assign(exchange_date=pd.to_datetime(currency_df.exchange_date))
+        grouped_currency_df = currency_df.groupby(pd.Grouper(key="exchange_date", freq="1M"))[
+            correct_col
+        ].agg([np.mean, max, min])
     grouped_currency_df["str_date"] = [
         date.strftime("%b, %Y") for date in grouped_currency_df.index
     ]  # prettify name
@@ -54,6 +136,14 @@ def historical_line_plot(
     grouped_currency_df = grouped_currency_df.iloc[::-1][:13]  # Reverse df to get right order
     grouped_currency_df = grouped_currency_df.iloc[::-1]  # Reverse back
 
+    return grouped_currency_df
+
+
+def plot_monthly_summary(
+    grouped_currency_df: pd.DataFrame, currency_code: str, ylabel: str, base_currency: str
+) -> Figure:
+    """Return a figure with a line plot of monthly average and a max/min band (see monthly_summary)."""
+
     # Plot historical data (last 12 months)
     sns.set_style("whitegrid")
     fig, ax1 = plt.subplots(figsize=(18, 5))
@@ -62,10 +152,10 @@ def historical_line_plot(
 
     ax1.set_title(f"{base_currency} x {currency_code.upper()} Variation", fontsize=24, loc="left")
     ax1.set_xlabel("", fontsize=16, loc="left")
-    ax1.set_ylabel(f"{correct_col.replace('_',' ').title()}", fontsize=16, loc="top")
+    ax1.set_ylabel(ylabel, fontsize=16, loc="top")
     ax1.tick_params(labelsize=16)
     ax1.xaxis.grid(False)
-    sns.despine()
+    sns.despine(fig=fig)
     ax1.fill_between(
         grouped_currency_df.str_date,
         grouped_currency_df["max"],
@@ -74,80 +164,284 @@ def historical_line_plot(
         alpha=0.12,
         label=r"Máx & Mín Values",
     )
-    plt.legend(fontsize=16, loc="best")
-    plt.xlim(0, 12)
-    # Save to disk
-    plt.savefig(save_path, facecolor="#ffffff", edgecolor="#ffffff", bbox_inches="tight")
+    ax1.legend(fontsize=16, loc="best")
+    ax1.set_xlim(0, 12)
+
+    return fig
+
+
+def chart_ylabel(currency_df: Rates, currency_code: str) -> str:
+    """Return the y axis label of a currency chart."""
+    return rates_column(currency_df, currency_code).replace("_", " ").title()
+
+
+def render_chart_png(
+    grouped_currency_df: pd.DataFrame, currency_code: str, ylabel: str, base_currency: str
+) -> bytes:
+    """Return the chart of a monthly summary as PNG bytes.
+    * Runs in the render process pool, only the small monthly summary is sent to the worker
+    """
+
+    fig = plot_monthly_summary(grouped_currency_df, currency_code, ylabel, base_currency)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", facecolor="#ffffff", edgecolor="#ffffff", bbox_inches="tight")
+    plt.close(fig)
+
+    return buffer.getvalue()
+
+
+def chart_args(
+    currency_df: Rates, currency_code: str, base_currency: str, monthly_df: Optional[pd.DataFrame] = None
+) -> tuple:
+    """Return the render_chart_png arguments of a chart (workers only get the small monthly summary)."""
+    return (
+        monthly_summary(currency_df, currency_code, monthly_df),
+        currency_code,
+        chart_ylabel(currency_df, currency_code),
+        base_currency,
+    )
+
+
+def chart_jobs(
+    currency_df: Rates, base_currency: str, currency_list: list, monthly_df: Optional[pd.DataFrame] = None
+) -> dict:
+    """Return the chart_args of each chart of currency_list, {(base_currency, currency_code): args}.
+    * Computed once per chart (monthly summary of the window), then used for its cache key and its render
+    """
+    return {
+        (base_currency, currency_code): chart_args(currency_df, currency_code, base_currency, monthly_df)
+        for currency_code in currency_list
+    }
+
+
+def window_fingerprint(currency_df: Rates, currency_code: str) -> str:
+    """Return the fingerprint of the dates and rates of a currency in the report window (tables input)."""
+
+    column = rates_column(currency_df, currency_code)
+    if isinstance(currency_df, RateCube):
+        currency_df = currency_df.to_frame(currency_df.bases[0], [column])
+    return render_cache.fingerprint(currency_df.exchange_date.to_numpy(), currency_df[column].to_numpy())
+
+
+def chart_key(args: tuple) -> str:
+    """Return the render cache key of a chart from its chart_args.
+    * (currency, base, fingerprint of the drawn window: monthly mean/max/min and labels, style version)
+    """
+
+    grouped_currency_df, currency_code, ylabel, base_currency = args
+    return render_cache.cache_key(
+        REPORT_STYLE_VERSION,
+        "chart",
+        currency_code,
+        base_currency,
+        ylabel,
+        render_cache.fingerprint(
+            grouped_currency_df.str_date.to_numpy(), grouped_currency_df[["mean", "max", "min"]].to_numpy()
+        ),
+    )
+
+
+def table_key(dollar_df: Rates, euro_df: Rates, currency_code: str) -> str:
+    """Return the render cache key of the table of a tab (rates of both bases)."""
+    return render_cache.cache_key(
+        REPORT_STYLE_VERSION,
+        "table",
+        currency_code,
+        *[
+            part
+            for currency_df in [dollar_df, euro_df]
+            for part in [
+                rates_column(currency_df, currency_code),
+                window_fingerprint(currency_df, currency_code),
+            ]
+        ],
+    )
+
+
+def cached_charts(cache: RenderCache, keys: dict) -> dict:
+    """Return the charts found in the cache, {chart: PNG bytes}.
+    * keys -- {chart: chart_key}, e.g. chart = (base_currency, currency_code)
+    """
+
+    charts = {}
+    for chart, key in keys.items():
+        png = cache.get(key, "png")
+        if png is not None:
+            charts[chart] = png
+    metrics.count("report_cache_hits", len(charts), {"part": "chart"})
+
+    return charts
+
+
+def cached_chart_png(
+    cache: Optional[RenderCache],
+    args: tuple,
+    key: Optional[str] = None,
+    png: Optional[bytes] = None,
+) -> bytes:
+    """Return the chart drawn from args (chart_args), read from the cache or rendered (and stored).
+    * key -- chart_key(args), when already computed. Default(computed here)
+    * png -- chart already rendered, stored if not cached yet
+    """
+
+    if cache is None:
+        if png is None:
+            with metrics.timer("render"):
+                png = render_chart_png(*args)
+        return png
+    key = key or chart_key(args)
+    if png is None:
+        png = cache.get(key, "png")
+        if png is not None:
+            metrics.count("report_cache_hits", labels={"part": "chart"})
+            return png
+        with metrics.timer("render"):
+            png = render_chart_png(*args)
+    if not cache.contains(key, "png"):
+        cache.put(key, "png", png)
+
+    return png
+
+
+def table_to_json(infos_df: pd.DataFrame, currency_name: str) -> bytes:
+    """Return a tab table (see specific_info_df) as json."""
+    return json.dumps(
+        {
+            "currency_name": currency_name,
+            "index_name": infos_df.index.name,
+            "index": infos_df.index.tolist(),
+            "columns": infos_df.columns.tolist(),
+            "data": infos_df.values.tolist(),
+        }
+    ).encode()
+
+
+def table_from_json(content: bytes) -> tuple[pd.DataFrame, str]:
+    """Return the table and currency name stored by table_to_json."""
+    table = json.loads(content)
+    infos_df = pd.DataFrame(
+        table["data"], index=pd.Index(table["index"], name=table["index_name"]), columns=table["columns"]
+    )
+    return infos_df, table["currency_name"]
+
+
+def render_pool(render_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Return a process pool rendering charts with the Agg backend (no display needed).
+    * render_workers -- Default(one worker per core)
+    """
+    return ProcessPoolExecutor(
+        max_workers=render_workers or os.cpu_count(), initializer=matplotlib.use, initargs=("Agg",)
+    )
+
+
+def render_charts_parallel(jobs: dict, render_workers: Optional[int] = None) -> dict:
+    """Render charts in a process pool.
+    * jobs -- {chart: chart_args}, see chart_jobs
+    * render_workers -- Default(one worker per core)
+    * Return {chart: PNG bytes}
+    """
+
+    with render_pool(render_workers) as executor:
+        images = executor.map(render_chart_png, *zip(*jobs.values()))
+        return dict(zip(jobs, images))
+
+
+def report_stats(dollar_df: Rates, euro_df: Rates, currency_list: list) -> pd.DataFrame:
+    """Return the window stats (rate_stats.window_stats) of every currency for both bases (base col)."""
+
+    currency_codes = list(dict.fromkeys(currency_list))
+    base_stats = []
+    for currency_df, base_currency in [(dollar_df, "Dollar"), (euro_df, "Euro")]:
+        if isinstance(currency_df, RateCube):
+            stats_df = currency_df.window_stats(currency_df.bases[0], currency_codes)
+        else:
+            stats_df = rate_stats.window_stats(currency_df, currency_codes)
+        base_stats.append(stats_df.assign(base=base_currency))
+
+    return pd.concat(base_stats, ignore_index=True)
 
 
 def specific_info_df(
-    dollar_df: pd.DataFrame, euro_df: pd.DataFrame, currency_code: str
+    dollar_df: Rates,
+    euro_df: Rates,
+    currency_code: str,
+    currency_stats: Optional[pd.DataFrame] = None,
 ) -> tuple[pd.DataFrame, str]:
     """Return a simple df with information regarding maximum and minimum values and currency name.
     * currency_code may be any of the 273 currencies available
+    * currency_stats -- report_stats rows of currency_code. Default(computed for currency_code only)
     """
 
-    # Identifies correct column from code
-    for col in dollar_df.columns:
-        if re.search(f"^{currency_code}", col):
-            correct_col = col
-            break
+    if currency_stats is None:
+        currency_stats = report_stats(dollar_df, euro_df, [currency_code])
 
     # Create Features for each base currency
-    infos_df = pd.DataFrame(
-        {
-            "info": [
-                "Current Rate",
-                "Last Week Range",
-                "Last Month Range",
-                "Last 3 Months Range",
-                "Last 6 Months Range",
-                "Last Year Range",
-            ]
-        }
-    )
-    for currency_df, base_currency in zip([dollar_df, euro_df], ["Dollar", "Euro"]):
-        specific_df = currency_df.loc[:, ["exchange_date", correct_col]]
-        specific_df_reverse = specific_df.iloc[::-1]
-
-        current_date = pd.Timestamp(specific_df_reverse.exchange_date.values[0]).strftime("%Y-%d-%m")
-        current_rate = specific_df_reverse[correct_col].values[0]
-        # Last week
-        max_week = max((specific_df_reverse[:7][correct_col]))
-        min_week = min((specific_df_reverse[:7][correct_col]))
-        # Last month
-        max_month = max((specific_df_reverse[:30][correct_col]))
-        min_month = min((specific_df_reverse[:30][correct_col]))
-        # Last 3 month
-        max_tri = max((specific_df_reverse[:90][correct_col]))
-        min_tri = min((specific_df_reverse[:90][correct_col]))
-        # Last 6 month
-        max_seme = max((specific_df_reverse[:180][correct_col]))
-        min_seme = min((specific_df_reverse[:180][correct_col]))
-        # Last 12 month
-        max_year = max((specific_df_reverse[:360][correct_col]))
-        min_year = min((specific_df_reverse[:360][correct_col]))
-        # Add Features
-        infos_df[f"{base_currency} Based Rate"] = [
-            f"{current_rate:.2f}",
-            f"{min_week:.2f} - {max_week:.2f}",
-            f"{min_month:.2f} - {max_month:.2f}",
-            f"{min_tri:.2f} - {max_tri:.2f}",
-            f"{min_seme:.2f} - {max_seme:.2f}",
-            f"{min_year:.2f} - {max_year:.2f}",
+    infos_df = pd.DataFrame({"info": ["Current Rate"] + list(rate_stats.REPORT_WINDOWS)})
+    for base_currency, base_stats in currency_stats.groupby("base", sort=False):
+        infos_df[f"{base_currency} Based Rate"] = [f"{base_stats.current.iloc[0]:.2f}"] + [
+            f"{min_rate:.2f} - {max_rate:.2f}"
+            for min_rate, max_rate in zip(base_stats["min"], base_stats["max"])
         ]
 
     infos_df.set_index("info", inplace=True)
-    infos_df.index.name = current_date
+    last_date = euro_df.last_date() if isinstance(euro_df, RateCube) else euro_df.exchange_date.values[-1]
+    infos_df.index.name = pd.Timestamp(last_date).strftime("%Y-%d-%m")
     # Currency name will be used to generate Excel
-    currency_name = re.sub("^[^_]+_", "", correct_col).replace("_", " ").title()
+    currency_name = re.sub("^[^_]+_", "", currency_stats.column.iloc[0]).replace("_", " ").title()
     return infos_df, currency_name
 
 
 def generate_excel_report(
-    dollar_df: pd.DataFrame, euro_df: pd.DataFrame, currency_list: list, file_path: str = ""
+    dollar_df: Rates,
+    euro_df: Rates,
+    currency_list: list,
+    file_path: str = "",
+    parallel_render: bool = False,
+    render_workers: Optional[int] = None,
+    monthly_dfs: Optional[dict] = None,
+    charts: Optional[dict] = None,
+    cache: Optional[RenderCache] = None,
 ) -> None:
-    """Generates Excel with a tab for each currency listed in currency_list."""
+    """Generates Excel with a tab for each currency listed in currency_list.
+    * dollar_df/euro_df -- wide frames or single base RateCubes
+    * parallel_render -- render all charts in a process pool (render_workers, Default(one per core))
+    * monthly_dfs -- {"Dollar"/"Euro": stored aggregates} used by the charts, see monthly_summary
+    * charts -- charts already rendered, {(base_currency, currency_code): PNG bytes}, the caller stores them
+      in the cache. Default(rendered here)
+    * cache -- charts and tables of the tabs whose rates did not change are read from it, the others are
+      computed and stored (see render_cache.py). Default(everything is computed)
+    """
+
+    monthly_dfs = monthly_dfs or {}
+    charts = dict(charts or {})
+    bases = [(dollar_df, "Dollar"), (euro_df, "Euro")]
+    # Charts not given, their args and cache keys are computed once
+    jobs: dict = {}
+    for currency_df, base_currency in bases:
+        missing_charts = [code for code in currency_list if (base_currency, code) not in charts]
+        jobs.update(chart_jobs(currency_df, base_currency, missing_charts, monthly_dfs.get(base_currency)))
+    keys = {chart: chart_key(args) for chart, args in jobs.items()} if cache else {}
+
+    tables = {}
+    if cache:
+        for currency_code in currency_list:
+            content = cache.get(table_key(dollar_df, euro_df, currency_code), "json")
+            if content is not None:
+                tables[currency_code] = table_from_json(content)
+        metrics.count("report_cache_hits", len(tables), {"part": "table"})
+        charts.update(cached_charts(cache, keys))
+
+    # All windows of the currencies not cached in one vectorized pass per base
+    missing_tables = [code for code in currency_list if code not in tables]
+    if missing_tables:
+        with metrics.timer("stats"):
+            stats_by_currency = report_stats(dollar_df, euro_df, missing_tables).groupby(
+                "currency", sort=False
+            )
+    render_jobs = {chart: args for chart, args in jobs.items() if chart not in charts}
+    if parallel_render and render_jobs:
+        with metrics.timer("render"):
+            charts.update(render_charts_parallel(render_jobs, render_workers))
 
     # Create file
     file_name = file_path + "Exchange Rate Report " + datetime.today().strftime("%Y-%d-%m") + ".xlsx"
@@ -155,58 +449,118 @@ def generate_excel_report(
     workbook = writer.book
 
     for currency_code in currency_list:
-        infos_df, currency_name = specific_info_df(dollar_df, euro_df, currency_code)
-        infos_df.to_excel(writer, currency_code.upper() + " (" + currency_name + ") - Report", startrow=1)
-        my_sheet = writer.sheets[currency_code.upper() + " (" + currency_name + ") - Report"]
-        # Formatting
-        my_sheet.set_column(0, infos_df.shape[1], 18)  # Cols width
-        my_sheet.hide_gridlines(2)  # Hide gridline
-        # Add Boarders, round and centralize
-        cell_format = workbook.add_format({"border": 1, "align": "center", "valign": "vcenter"})
-        # Information needs to be rewritten
-        for row in range(0, len(infos_df)):
-            my_sheet.write(row + 2, 1, infos_df.iloc[row, 0], cell_format)
-            my_sheet.write(row + 2, 2, infos_df.iloc[row, 1], cell_format)
-        # Currency name in first row
-        merge_format = workbook.add_format(
-            {"bold": 1, "border": 1, "align": "center", "valign": "vcenter", "fg_color": "#b2b2d9"}
-        )
-        my_sheet.merge_range("A1:C1", currency_name, merge_format)
-
-        # Create and Insert image
-        # Dollar
-        historical_line_plot(dollar_df, currency_code, save_path="dollar" + currency_code + ".png")
-        my_sheet.insert_image(
-            "E2",
-            r"dollar" + currency_code + ".png",
-            {"x_scale": 0.55, "y_scale": 0.55, "x_offset": 1},
-        )
-        # Euro
-        historical_line_plot(euro_df, currency_code, save_path="euro" + currency_code + ".png")
-        my_sheet.insert_image(
-            "E15",
-            r"euro" + currency_code + ".png",
-            {"x_scale": 0.55, "y_scale": 0.55, "x_offset": 1},
+        with metrics.timer("xlsx_write"):
+            if currency_code in tables:
+                infos_df, currency_name = tables[currency_code]
+            else:
+                infos_df, currency_name = specific_info_df(
+                    dollar_df, euro_df, currency_code, stats_by_currency.get_group(currency_code)
+                )
+                if cache:
+                    cache.put(
+                        table_key(dollar_df, euro_df, currency_code),
+                        "json",
+                        table_to_json(infos_df, currency_name),
+                    )
+            infos_df.to_excel(writer, currency_code.upper() + " (" + currency_name + ") - Report", startrow=1)
+            my_sheet = writer.sheets[currency_code.upper() + " (" + currency_name + ") - Report"]
+            # Formatting
+            my_sheet.set_column(0, infos_df.shape[1], 18)  # Cols width
+            my_sheet.hide_gridlines(2)  # Hide gridline
+            # Add Boarders, round and centralize
+            cell_format = workbook.add_format({"border": 1, "align": "center", "valign": "vcenter"})
+            # Information needs to be rewritten
+            for row in range(0, len(infos_df)):
+                my_sheet.write(row + 2, 1, infos_df.iloc[row, 0], cell_format)
+                my_sheet.write(row + 2, 2, infos_df.iloc[row, 1], cell_format)
+            # Currency name in first row
+            merge_format = workbook.add_format(
+                {"bold": 1, "border": 1, "align": "center", "valign": "vcenter", "fg_color": "#b2b2d9"}
+            )
+            my_sheet.merge_range("A1:C1", currency_name, merge_format)
+
+        # Create and Insert image (from memory, nothing is written to the working directory)
+        for cell, (_, base_currency) in zip(["E2", "E15"], bases):
+            chart = (base_currency, currency_code)
+            if chart in jobs:
+                png = cached_chart_png(cache, jobs[chart], keys.get(chart), charts.pop(chart, None))
+            else:  # Given by the caller
+                png = charts.pop(chart)
+            my_sheet.insert_image(
+                cell,
+                base_currency.lower() + currency_code + ".png",
+                {"x_scale": 0.55, "y_scale": 0.55, "x_offset": 1, "image_data": io.BytesIO(png)},
+            )
+    # Sheets and images are written to the file here
+    with metrics.timer("xlsx_write"):
+        workbook.close()
+
+
+def load_base_rates(
+    based_currency: str, table_name: str, report_currency_list: list, db_path: str
+) -> pd.DataFrame:
+    """Return the report window of one based currency (see load_report_data).
+    * table_name -- wide table of based_currency (wide storage backend)
+    """
+
+    if settings.REPORT_READ_COLUMNAR:
+        return report_columnar_df(based_currency, report_currency_list)
+    if settings.STORAGE_BACKEND == "long":
+        return long_store.read_wide(
+            db_path,
+            based_currency,
+            report_currency_list,
+            since=window_start(long_store.last_exchange_date(db_path, based_currency)),
         )
-    workbook.close()
+    return report_table_df(db_path, table_name, report_currency_list)
 
-    # Delete images
-    for currency_code in currency_list:
-        os.remove("dollar" + currency_code + ".png")
-        os.remove("euro" + currency_code + ".png")
+
+def window_monthly(db_path: str, based_currency: str, currency_df: pd.DataFrame) -> pd.DataFrame:
+    """Return the stored monthly aggregates of the currencies and months of a report window."""
+    return monthly_agg.read_monthly(
+        db_path, based_currency, currency_df.columns[1:].tolist(), currency_df.exchange_date.min()[:7]
+    )
+
+
+def load_report_data(report_currency_list: list, db_path: str) -> tuple[Rates, Rates, dict]:
+    """Return the dollar and euro based rates of report_currency_list and their monthly aggregates.
+    * Only the currencies and dates used in the report are loaded
+    * Read from the columnar files with settings.REPORT_READ_COLUMNAR, from the db otherwise
+    * Rates are held in a RateCube with settings.REPORT_RATE_CUBE (views of one cube per base)
+    * Monthly aggregates -- {"Dollar"/"Euro": stored aggregates}, see monthly_summary
+    """
+
+    dollar_df, euro_df = [
+        load_base_rates(based_currency, table_name, report_currency_list, db_path)
+        for based_currency, table_name in REPORT_BASES.values()
+    ]
+    # Charts read the monthly aggregates maintained by the ETL
+    monthly_dfs = {
+        base_name: window_monthly(db_path, based_currency, currency_df)
+        for base_name, based_currency, currency_df in [("Dollar", "usd", dollar_df), ("Euro", "eur", euro_df)]
+    }
+    if settings.REPORT_RATE_CUBE:
+        cube = RateCube.from_frames({"usd": dollar_df, "eur": euro_df})
+        return cube["usd"], cube["eur"], monthly_dfs
+
+    return dollar_df, euro_df, monthly_dfs
 
 
-def report_pipeline(report_currency_list: list, db_path: str) -> bool:
-    """Run necessary steps to generate a report in Excel."""
-    # Load Tables
-    dollar_df = complete_table_df(db_path, "dollar_based_currency")
-    euro_df = complete_table_df(db_path, "euro_based_currency")
+def report_pipeline(report_currency_list: list, db_path: str, output_dir: str = "src/reports/") -> bool:
+    """Run necessary steps to generate a report in Excel (saved in output_dir)."""
+    with metrics.timer("db_read"):
+        dollar_df, euro_df, monthly_dfs = load_report_data(report_currency_list, db_path)
     # Generate Excel
     generate_excel_report(
         dollar_df,
         euro_df,
         currency_list=report_currency_list,
-        file_path=r"src/reports/",
+        file_path=os.path.join(output_dir, ""),
+        parallel_render=settings.REPORT_PARALLEL_RENDER,
+        render_workers=settings.REPORT_RENDER_WORKERS,
+        monthly_dfs=monthly_dfs,
+        cache=render_cache.from_settings(),
     )
+    db.get_pool().close_all()
 
     return True
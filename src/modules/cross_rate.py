@@ -0,0 +1,57 @@
+# Standard library
+from typing import Optional
+
+# Third party
+import numpy as np
+import pandas as pd
+
+
+def derive_base_frame(
+    anchor_df: pd.DataFrame, based_currency: str, columns: Optional[list] = None
+) -> pd.DataFrame:
+    """Return the anchor based rates converted to based_currency.
+    * rate_X/base = rate_X/anchor ÷ rate_base/anchor (one vectorized division for all days and currencies)
+    * columns -- columns of the destination table, missing ones are filled with NaN
+    """
+
+    rates = anchor_df.drop(columns="exchange_date").astype(np.float64)
+    derived_df = rates.div(rates[based_currency], axis=0)
+    derived_df.insert(0, "exchange_date", anchor_df.exchange_date.values)
+    if columns is not None:
+        derived_df = derived_df.reindex(columns=columns)
+
+    return derived_df
+
+
+def sample_days(dates: list, sample_size: int) -> list:
+    """Return up to sample_size dates evenly spread over dates (always including the last one)."""
+    if sample_size <= 0 or not dates:
+        return []
+    positions = np.linspace(len(dates) - 1, 0, num=min(sample_size, len(dates)), dtype=int)
+    return [dates[i] for i in sorted(set(positions))]
+
+
+def measure_drift(derived_df: pd.DataFrame, fetched_df: pd.DataFrame) -> dict:
+    """Compare derived rates against rates fetched for the same days.
+    * Only days and currencies available in both frames are compared
+    * Drift is relative: |derived - fetched| / fetched
+    """
+
+    derived = derived_df.drop_duplicates("exchange_date", keep="last").set_index("exchange_date")
+    fetched = fetched_df.drop_duplicates("exchange_date", keep="last").set_index("exchange_date")
+    days = derived.index.intersection(fetched.index)
+    currencies = derived.columns.intersection(fetched.columns)
+    real = fetched.loc[days, currencies].to_numpy(np.float64)
+    drift = np.abs(derived.loc[days, currencies].to_numpy(np.float64) - real) / real
+    drift[~np.isfinite(drift)] = np.nan
+
+    if np.isnan(drift).all():
+        return {"days": len(days), "currencies": 0}
+    worst = np.nanmax(drift, axis=0)
+    return {
+        "days": len(days),
+        "currencies": int(np.sum(~np.isnan(worst))),
+        "median_rel_drift": float(np.nanmedian(drift)),
+        "max_rel_drift": float(np.nanmax(worst)),
+        "worst_currency": str(currencies[np.nanargmax(worst)]),
+    }
@@ -0,0 +1,181 @@
+"""Currencies known to the db (code, name, first/last date with a rate), cached schema of the wide tables.
+* Filled once from the API currencies.json, then by every insert: new codes found in the payloads are
+  added to the catalog and to the wide tables (ALTER TABLE ADD COLUMN), no rate is dropped
+Build it for existing tables with: python3 -m src.modules.currency_catalog
+"""
+
+# Standard library
+import logging
+import sqlite3
+import threading
+from typing import Optional
+
+# Third party
+import pandas as pd
+
+# Local
+from . import db, long_store
+from .. import settings
+
+currency_catalog_log = logging.getLogger("currency_catalog.py")
+
+TABLE_NAME = "currency_catalog"
+
+# (db_path, table_name) -> columns of the table, read once per process (PRAGMA table_info)
+_schemas: dict = {}
+_schemas_lock = threading.Lock()
+
+
+def create_catalog_table(conn: sqlite3.Connection) -> None:
+    """Create the catalog table (if not exists), rowid keeps the order codes were added in."""
+    conn.execute(f"""CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+        code TEXT PRIMARY KEY,
+        name TEXT,
+        first_seen DATE,
+        last_seen DATE
+    )""")
+
+
+def read_schema(conn: sqlite3.Connection, table_name: str) -> list:
+    """Return the columns of a table (empty if it does not exist)."""
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")]
+
+
+def table_schema(db_path: str, table_name: str) -> list:
+    """Return the columns of a table, cached after the first read (missing tables are not cached)."""
+
+    key = (db_path, table_name)
+    with _schemas_lock:
+        if key in _schemas:
+            return list(_schemas[key])
+    with db.connection(db_path) as conn_lite:
+        columns = read_schema(conn_lite, table_name)
+    if columns:
+        with _schemas_lock:
+            _schemas[key] = columns
+    return list(columns)
+
+
+def forget_schema(db_path: Optional[str] = None, table_name: Optional[str] = None) -> None:
+    """Drop cached schemas: of a table, of every table of a db, or all of them (Default)."""
+    with _schemas_lock:
+        for key in list(_schemas):
+            if db_path in (None, key[0]) and table_name in (None, key[1]):
+                del _schemas[key]
+
+
+def add_columns(db_path: str, table_name: str, codes: list) -> list:
+    """Add a FLOAT column to a wide table for each code it does not have yet, return the codes added.
+    * The schema is read again first: another process may have added them already
+    """
+
+    with db.connection(db_path) as conn_lite:
+        with db.transaction(conn_lite):
+            columns = read_schema(conn_lite, table_name)
+            added = [code for code in dict.fromkeys(codes) if code not in columns]
+            for code in added:
+                conn_lite.execute(f'ALTER TABLE {table_name} ADD COLUMN "{code}" FLOAT')
+    with _schemas_lock:
+        _schemas[(db_path, table_name)] = columns + added
+    if added:
+        currency_catalog_log.info(f"{table_name}: columns added for new currencies {added}")
+
+    return added
+
+
+def codes(db_path: str) -> list:
+    """Return the codes of the catalog, in the order they were added."""
+    with db.connection(db_path) as conn_lite:
+        create_catalog_table(conn_lite)
+        return [code for (code,) in conn_lite.execute(f"SELECT code FROM {TABLE_NAME} ORDER BY rowid")]
+
+
+def record_names(db_path: str, names: dict) -> None:
+    """Add (or rename) the currencies of {code: name}, seen dates are kept."""
+
+    with db.connection(db_path) as conn_lite:
+        with db.transaction(conn_lite):
+            create_catalog_table(conn_lite)
+            conn_lite.executemany(
+                f"""INSERT INTO {TABLE_NAME} (code, name) VALUES (?, ?)
+                ON CONFLICT (code) DO UPDATE SET name = excluded.name""",
+                names.items(),
+            )
+
+
+def seen_dates(df: pd.DataFrame) -> pd.DataFrame:
+    """Return the first/last exchange_date with a rate of each currency of a wide df (code, min, max).
+    * Currencies keep the order of the columns, those without any rate are left out
+    """
+
+    rates = df.set_index("exchange_date").rename_axis(columns="code")
+    seen = rates.stack().reset_index()  # NaN rates are dropped
+    bounds = seen.groupby("code").exchange_date.agg(["min", "max"])
+    return bounds.reindex([code for code in rates.columns if code in bounds.index]).reset_index()
+
+
+def write_seen(conn: sqlite3.Connection, seen_df: pd.DataFrame) -> None:
+    """Upsert (code, first, last) rows, the seen range of known codes is only extended."""
+    with db.transaction(conn):
+        create_catalog_table(conn)
+        conn.executemany(
+            f"""INSERT INTO {TABLE_NAME} (code, first_seen, last_seen) VALUES (?, ?, ?)
+            ON CONFLICT (code) DO UPDATE SET
+            first_seen = min(coalesce(first_seen, excluded.first_seen), excluded.first_seen),
+            last_seen = max(coalesce(last_seen, excluded.last_seen), excluded.last_seen)""",
+            seen_df.itertuples(index=False),
+        )
+
+
+def record_seen(db_path: str, df: pd.DataFrame) -> int:
+    """Add the currencies of a wide df to the catalog and extend their first/last seen dates.
+    * Return the number of currencies with a rate in df
+    """
+
+    seen_df = seen_dates(df)
+    with db.connection(db_path) as conn_lite:
+        write_seen(conn_lite, seen_df)
+
+    return len(seen_df)
+
+
+def read_catalog(db_path: str) -> pd.DataFrame:
+    """Return the catalog (code, name, first_seen, last_seen)."""
+    with db.connection(db_path) as conn_lite:
+        create_catalog_table(conn_lite)
+        return pd.read_sql_query(
+            f"SELECT code, name, first_seen, last_seen FROM {TABLE_NAME} ORDER BY rowid", conn_lite
+        )
+
+
+def rebuild(db_path: str, based_currency_mapping: dict) -> int:
+    """Record the seen dates of every rate already stored, return the number of currencies in the catalog."""
+
+    with db.connection(db_path) as conn_lite:
+        for based_currency, table_prefix in based_currency_mapping.items():
+            if settings.STORAGE_BACKEND == "long":
+                query = f"""SELECT quote AS code, min(exchange_date), max(exchange_date)
+                    FROM {long_store.TABLE_NAME} WHERE base = ? GROUP BY quote"""
+                seen_df = pd.read_sql_query(query, conn_lite, params=(based_currency,))
+            else:
+                table_name = table_prefix + "_based_currency"
+                columns = [col for col in read_schema(conn_lite, table_name) if col != "exchange_date"]
+                if not columns:
+                    continue
+                # One scan of the table for every column
+                bounds_sql = ", ".join(
+                    f'min(CASE WHEN "{col}" IS NOT NULL THEN exchange_date END), '
+                    f'max(CASE WHEN "{col}" IS NOT NULL THEN exchange_date END)'
+                    for col in columns
+                )
+                bounds = conn_lite.execute(f"SELECT {bounds_sql} FROM {table_name}").fetchone()
+                seen_df = pd.DataFrame(
+                    [(col, bounds[2 * i], bounds[2 * i + 1]) for i, col in enumerate(columns)]
+                ).dropna()
+            write_seen(conn_lite, seen_df)
+
+    return len(codes(db_path))
+
+
+if __name__ == "__main__":
+    currency_catalog_log.info(f"{rebuild(settings.DB_PATH, settings.BASED_CURRENCY_MAPPING)} currencies")
@@ -0,0 +1,229 @@
+"""Task callables of the Airflow DAG (src/airflow/dag_currency_exchange_etl.py).
+* Arguments and returns are JSON serializable (ISO dates, paths), returns are pushed to XCom
+* Mapped fetch tasks only read the db, rates are written by a single writer task
+* Each task instance runs in its own process: fetch, writer and report tasks export their own run metrics
+  (export_task_metrics), mapped fetch tasks name theirs after their map index
+"""
+
+# Standard library
+import logging
+import os
+import re
+from contextlib import suppress
+from datetime import datetime
+from itertools import islice
+from typing import Optional
+
+# Third party
+import pandas as pd
+
+# Local
+from . import (
+    create_report,
+    db,
+    metrics,
+    render_cache,
+    response_cache,
+    sync_planner,
+    update_currency_exchange,
+)
+from .. import settings
+
+dag_tasks_log = logging.getLogger("dag_tasks.py")
+
+
+def parse_date(value: Optional[str]) -> Optional[datetime]:
+    """Return the datetime of an ISO date (None if empty)."""
+    return datetime.strptime(value, "%Y-%m-%d") if value else None
+
+
+def task_path(path: Optional[str], task_name: str) -> Optional[str]:
+    """Return path with the task name before its extension (run.json -> run.write_staged.json)."""
+    if not path:
+        return None
+    root, extension = os.path.splitext(path)
+    return f"{root}.{task_name}{extension}"
+
+
+def export_task_metrics(task_name: str, map_index: Optional[int] = None) -> dict:
+    """Write the metrics of a task in its own files, named after the run summary files, return the summary.
+    * Paths -- settings.METRICS_JSON_PATH and METRICS_TEXTFILE_PATH with the task name before the extension
+    * Prometheus series get a task label: files of several tasks do not collide in the textfile collector
+    * map_index -- mapped task instance: added to the file names (run.fetch_rates.2.json) and to the labels
+    """
+
+    labels: dict = {"task": task_name}
+    if map_index is not None:
+        task_name = f"{task_name}.{map_index}"
+        labels["map_index"] = map_index
+    return metrics.export(
+        task_path(settings.METRICS_JSON_PATH, task_name),
+        task_path(settings.METRICS_TEXTFILE_PATH, task_name),
+        labels,
+    )
+
+
+def plan_fetches(
+    db_path: str,
+    based_currency_mapping: Optional[dict] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    chunk_days: Optional[int] = None,
+) -> list[dict]:
+    """Return the kwargs of each mapped fetch task: one per based currency with missing days.
+    * chunk_days -- split the missing days of each base in chunks (backfills). Default(a single chunk)
+    * since/until -- ISO dates, see sync_planner.plan
+    * Missing tables are created here, before the fan-out, so fetch tasks never write
+    """
+
+    based_currency_mapping = based_currency_mapping or settings.BASED_CURRENCY_MAPPING
+    if settings.STORAGE_BACKEND != "long":
+        for table_prefix in based_currency_mapping.values():
+            update_currency_exchange.check_table(db_path, table_prefix + "_based_currency")
+    sync_plan = sync_planner.plan(db_path, based_currency_mapping, parse_date(since), parse_date(until))
+    db.get_pool().close_all()
+
+    fetches = []
+    for based_currency, days in sync_plan.items():
+        days_iter = iter(day.strftime("%Y-%m-%d") for day in days)
+        while chunk := list(islice(days_iter, chunk_days or len(days))):
+            fetches.append(
+                {
+                    "based_currency": based_currency,
+                    "table_prefix": based_currency_mapping[based_currency],
+                    "days": chunk,
+                }
+            )
+    dag_tasks_log.info(f"{len(fetches)} fetch tasks planned")
+
+    return fetches
+
+
+def run_staging_dir(staging_dir: str, run_id: Optional[str] = None) -> str:
+    """Return the staging directory of a DAG run (created if missing).
+    * run_id -- Airflow run_id: runs going on together (a backfill and the scheduled run) do not share
+      file names. Default(staging_dir itself)
+    """
+
+    path = os.path.join(staging_dir, re.sub(r"[^\w.+-]", "_", run_id)) if run_id else staging_dir
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def fetch_rates(
+    db_path: str,
+    based_currency: str,
+    table_prefix: str,
+    days: list,
+    staging_dir: str,
+    run_id: Optional[str] = None,
+    map_index: Optional[int] = None,
+) -> dict:
+    """Fetch days (ISO dates) of based_currency into a staging CSV, return the kwargs of the writer.
+    * Batches (settings.ETL_BATCH_DAYS) are appended to the file as they arrive, memory stays bounded
+    * Currencies new in a batch are added to the rows already staged (the header is rewritten)
+    * run_id -- staging files go in a directory of the run, see run_staging_dir
+    * map_index -- Airflow map index of the task, names its run metrics (see export_task_metrics)
+    """
+
+    metrics.get_metrics().reset()
+    columns = update_currency_exchange.table_columns(db_path, table_prefix + "_based_currency")
+    path = os.path.join(run_staging_dir(staging_dir, run_id), f"{based_currency}_{days[0]}_{days[-1]}.csv")
+    batches = update_currency_exchange.fetch_rate_batches(
+        [datetime.strptime(day, "%Y-%m-%d") for day in days],
+        based_currency,
+        columns,
+        cache=response_cache.from_settings(),
+    )
+    staged_columns: list = []
+    for n_batch, currency_df in enumerate(batches):
+        if n_batch and currency_df.columns.tolist() != staged_columns:
+            staged_df = pd.read_csv(path, float_precision="round_trip")
+            staged_df.reindex(columns=currency_df.columns).to_csv(path, index=False)
+        currency_df.to_csv(path, mode="a" if n_batch else "w", header=not n_batch, index=False)
+        staged_columns = currency_df.columns.tolist()
+    export_task_metrics("fetch_rates", map_index)
+
+    return {"based_currency": based_currency, "table_prefix": table_prefix, "path": path}
+
+
+def write_staged(db_path: str, staged: list) -> int:
+    """Upsert the staged fetches in their tables, return the number of rows written.
+    * The only task writing rates: run it in a pool with a single slot
+    * Files are committed by batches (settings.ETL_BATCH_DAYS) and removed once written
+    * Months of each batch are exported to the columnar files (settings.COLUMNAR_EXPORT_FORMAT)
+    * Run metrics of the task are exported, see export_task_metrics
+    """
+
+    metrics.get_metrics().reset()
+    n_rows = 0
+    for fetch in staged:
+        batches = pd.read_csv(fetch["path"], chunksize=settings.ETL_BATCH_DAYS, float_precision="round_trip")
+        for currency_df in batches:
+            update_currency_exchange.insert_df_sqlite(
+                currency_df, db_path, fetch["table_prefix"] + "_based_currency", fetch["based_currency"]
+            )
+            n_rows += len(currency_df)
+        os.remove(fetch["path"])
+    db.get_pool().close_all()
+    dag_tasks_log.info(f"{n_rows} rows written from {len(staged)} fetch tasks")
+    export_task_metrics("write_staged")
+
+    return n_rows
+
+
+def render_charts(db_path: str, currency_code: str, staging_dir: str, run_id: Optional[str] = None) -> dict:
+    """Render the dollar and euro based charts of currency_code to PNG files.
+    * Charts of unchanged rates are copied from the render cache (retries, reruns without new days)
+    * run_id -- files go in a directory of the run, see run_staging_dir
+    * Return {"currency_code": currency_code, "paths": {"Dollar"/"Euro": path}}
+    """
+
+    cache = render_cache.from_settings()
+    dollar_df, euro_df, monthly_dfs = create_report.load_report_data([currency_code], db_path)
+    run_dir = run_staging_dir(staging_dir, run_id)
+    paths = {}
+    for currency_df, base_currency in [(dollar_df, "Dollar"), (euro_df, "Euro")]:
+        paths[base_currency] = os.path.join(run_dir, f"{base_currency.lower()}{currency_code}.png")
+        with open(paths[base_currency], "wb") as f:
+            f.write(
+                create_report.cached_chart_png(
+                    cache,
+                    create_report.chart_args(
+                        currency_df, currency_code, base_currency, monthly_dfs[base_currency]
+                    ),
+                )
+            )
+
+    return {"currency_code": currency_code, "paths": paths}
+
+
+def assemble_report(db_path: str, report_currency_list: list, charts: list, output_dir: str) -> None:
+    """Generate the Excel report with the charts rendered by render_charts (files are removed).
+    * Staging directories left empty are removed (run directories, see run_staging_dir)
+    * Run metrics of the task are exported, see export_task_metrics
+    """
+
+    metrics.get_metrics().reset()
+    chart_pngs = {}
+    for chart in charts:
+        for base_currency, path in chart["paths"].items():
+            with open(path, "rb") as f:
+                chart_pngs[(base_currency, chart["currency_code"])] = f.read()
+            os.remove(path)
+    for chart_dir in {os.path.dirname(path) for chart in charts for path in chart["paths"].values()}:
+        with suppress(OSError):  # Still holds files of another run
+            os.rmdir(chart_dir)
+
+    dollar_df, euro_df, monthly_dfs = create_report.load_report_data(report_currency_list, db_path)
+    create_report.generate_excel_report(
+        dollar_df,
+        euro_df,
+        currency_list=report_currency_list,
+        file_path=os.path.join(output_dir, ""),
+        monthly_dfs=monthly_dfs,
+        charts=chart_pngs,
+        cache=render_cache.from_settings(),
+    )
+    db.get_pool().close_all()
+    export_task_metrics("assemble_report")
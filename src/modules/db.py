@@ -0,0 +1,127 @@
+"""Shared SQLite connections for the ETL and the report.
+* One connection per (thread, db file), reused by every query of that thread
+* Pragmas (WAL journal, synchronous, busy timeout) are applied once, when the connection is opened
+"""
+
+# Standard library
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import ContextManager, Iterator, Optional
+
+# Local
+from .. import settings
+
+db_log = logging.getLogger("db.py")
+
+
+class ConnectionPool:
+    """Per thread SQLite connections, keyed by db path.
+    * Connections run in autocommit mode, writes are grouped with transaction() (BEGIN IMMEDIATE)
+    * WAL lets report readers run while the ETL writes, writers wait up to busy_timeout for the lock
+    """
+
+    def __init__(self, busy_timeout: Optional[float] = None) -> None:
+        self.busy_timeout = settings.SQLITE_BUSY_TIMEOUT if busy_timeout is None else busy_timeout
+        self.counters = {"opens": 0, "reuses": 0, "transactions": 0, "lock_wait_s": 0.0}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._generation = 0  # Bumped by close_all, thread local connections of older generations are stale
+
+    def _count(self, counter: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[counter] += value
+
+    def _open(self, db_path: str) -> sqlite3.Connection:
+        # check_same_thread=False: close_all may run in another thread
+        conn = sqlite3.connect(
+            db_path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False
+        )
+        conn.execute(f"PRAGMA journal_mode = {settings.SQLITE_JOURNAL_MODE}")
+        conn.execute(f"PRAGMA synchronous = {settings.SQLITE_SYNCHRONOUS}")
+        with self._lock:
+            self._connections.append(conn)
+            self.counters["opens"] += 1
+        return conn
+
+    def get(self, db_path: str) -> sqlite3.Connection:
+        """Return the connection of the current thread to db_path (opened on first use)."""
+
+        with self._lock:
+            generation = self._generation
+        if getattr(self._local, "generation", None) != generation:
+            self._local.generation = generation
+            self._local.connections = {}
+        conn = self._local.connections.get(db_path)
+        if conn is None:
+            conn = self._local.connections[db_path] = self._open(db_path)
+        else:
+            self._count("reuses")
+        return conn
+
+    @contextmanager
+    def connection(self, db_path: str) -> Iterator[sqlite3.Connection]:
+        """Yield the connection of the current thread, a transaction left open by an error is rolled back."""
+
+        conn = self.get(db_path)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+
+    @contextmanager
+    def transaction(self, conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+        """Run the block in a single transaction holding the write lock from the start (rolled back on error).
+        * Time spent waiting for other writers is added to lock_wait_s
+        """
+
+        t_start = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        self._count("lock_wait_s", time.perf_counter() - t_start)
+        self._count("transactions")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def stats(self) -> dict:
+        """Return connection counters."""
+        with self._lock:
+            return {**self.counters, "lock_wait_s": round(self.counters["lock_wait_s"], 4)}
+
+    def close_all(self) -> None:
+        """Close every connection of every thread (threads reopen on their next use)."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._generation += 1
+        for conn in connections:
+            conn.close()
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return the ConnectionPool shared by all modules (created on first use)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+def connection(db_path: str) -> ContextManager[sqlite3.Connection]:
+    """Shortcut of get_pool().connection(db_path)."""
+    return get_pool().connection(db_path)
+
+
+def transaction(conn: sqlite3.Connection) -> ContextManager[sqlite3.Connection]:
+    """Shortcut of get_pool().transaction(conn)."""
+    return get_pool().transaction(conn)
@@ -0,0 +1,95 @@
+"""On-disk LRU cache of files, base of the API response cache and of the report render cache.
+* Entries are files named by a key, {cache_dir}/{key[:2]}/{key}{suffix}
+* Writes are atomic (temporary file then rename), concurrent readers never see partial files
+* Size capped by max_bytes, least recently used entries are evicted first (mtime, refreshed on each hit)
+"""
+
+# Standard library
+import os
+import threading
+from contextlib import suppress
+from typing import Any, Callable, Optional
+
+
+class FileCache:
+    """Entries stored as files, subclasses choose the keys and how entries are encoded.
+    * suffixes -- file suffixes of the entries, other files (temporary ones) are ignored
+    """
+
+    suffixes: tuple = ()
+
+    def __init__(self, cache_dir: str, max_bytes: int) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.counters = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.size = sum(os.path.getsize(path) for path in self._entries())
+
+    def _entries(self) -> list[str]:
+        return [
+            os.path.join(root, file_name)
+            for root, _, files in os.walk(self.cache_dir)
+            for file_name in files
+            if file_name.endswith(self.suffixes)
+        ]
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self.counters[counter] += 1
+
+    def entry_path(self, key: str, suffix: str) -> str:
+        """Return the file path of an entry."""
+        return os.path.join(self.cache_dir, key[:2], key + suffix)
+
+    def read_entry(self, path: str, read: Callable[[str], Any]) -> Optional[Any]:
+        """Return read(path), None if the entry is missing or corrupted (OSError, ValueError, EOFError)."""
+
+        try:
+            content = read(path)
+        except (OSError, ValueError, EOFError):  # EOFError: truncated gzip
+            self._count("misses")
+            return None
+        with suppress(FileNotFoundError):  # Evicted by another process since the read
+            os.utime(path)  # mtime tracks the last use (LRU)
+        self._count("hits")
+        return content
+
+    def write_entry(self, path: str, write: Callable[[str], None]) -> None:
+        """Store an entry written by write(temporary path), evict if over max_bytes."""
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        write(tmp_path)
+        previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.size += os.path.getsize(path) - previous_size
+            self.counters["writes"] += 1
+            over_cap = self.size > self.max_bytes
+        if over_cap:
+            self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache fits in max_bytes."""
+
+        with self._lock:
+            entries = []
+            for path in self._entries():
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:  # pragma: no cover
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            self.size = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if self.size <= self.max_bytes:
+                    break
+                os.remove(path)
+                self.size -= size
+                self.counters["evictions"] += 1
+
+    def stats(self) -> dict:
+        """Return counters and current size."""
+        with self._lock:
+            return {**self.counters, "bytes": self.size}
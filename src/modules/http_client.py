@@ -0,0 +1,180 @@
+# Standard library
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+# Third party
+import requests
+from requests.adapters import HTTPAdapter
+
+# Local
+from . import metrics
+from .. import settings
+
+http_log = logging.getLogger("http_client.py")
+
+# Responses worth retrying, anything else is returned to the caller as is
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def _counting_pool(pool_cls: type, on_new_conn: Callable[[], None]) -> type:
+    """Return a subclass of an urllib3 connection pool that reports every new connection."""
+
+    class CountingPool(pool_cls):  # type: ignore[valid-type, misc]
+        def _new_conn(self):
+            on_new_conn()
+            return super()._new_conn()
+
+    return CountingPool
+
+
+class CountingAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools count how many connections (TCP+TLS handshakes) were opened."""
+
+    def __init__(self, on_new_conn: Callable[[], None], **kwargs) -> None:
+        self.on_new_conn = on_new_conn
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        """Create the pool manager with counting pool classes."""
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: _counting_pool(pool_cls, self.on_new_conn)
+            for scheme, pool_cls in self.poolmanager.pool_classes_by_scheme.items()
+        }
+
+
+class HttpClient:
+    """requests.Session with a keep-alive connection pool, timeouts and retries.
+    * Retries 429/5xx and connection errors with exponential backoff and full jitter
+    * Thread safe, a single client can be shared by all fetch workers
+    * Requests wait for a pooled connection when all are in use: the pool grows with the workers
+      reserved by the callers (see reserve)
+    """
+
+    def __init__(
+        self,
+        pool_maxsize: Optional[int] = None,
+        timeout: Optional[tuple[float, float]] = None,
+        max_retries: Optional[int] = None,
+        backoff_factor: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+    ) -> None:
+        self.timeout = timeout or settings.HTTP_TIMEOUT
+        self.max_retries = settings.HTTP_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_factor = settings.HTTP_BACKOFF_FACTOR if backoff_factor is None else backoff_factor
+        self.backoff_max = settings.HTTP_BACKOFF_MAX if backoff_max is None else backoff_max
+
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "new_connections": 0, "retries": 0}
+        self.reserved_workers = 0
+
+        self.session = requests.Session()
+        self.session.headers.update({"Connection": "keep-alive"})
+        self._mount(pool_maxsize or settings.HTTP_POOL_MAXSIZE)
+
+    def _mount(self, pool_maxsize: int) -> None:
+        # Retries are handled by HttpClient.get, the adapter only pools connections
+        adapter = CountingAdapter(
+            on_new_conn=lambda: self._count("new_connections"),
+            pool_connections=settings.HTTP_POOL_CONNECTIONS,
+            pool_maxsize=pool_maxsize,
+            pool_block=True,
+            max_retries=0,
+        )
+        previous_adapter = self.session.adapters.get("https://")
+        self.pool_maxsize = pool_maxsize
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # Idle sockets of the previous pools are closed, requests in flight close theirs when done
+        if isinstance(previous_adapter, CountingAdapter):
+            previous_adapter.close()
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self.counters[counter] += 1
+
+    @contextmanager
+    def reserve(self, workers: int) -> Iterator[None]:
+        """Grow the pool to the workers of every caller in its block, the pool never shrinks.
+        * Without it, workers beyond pool_maxsize would wait for a pooled connection
+        * Requests in flight finish on the previous pool, which is closed
+        """
+
+        with self._lock:
+            self.reserved_workers += workers
+            if self.reserved_workers > self.pool_maxsize:
+                self._mount(self.reserved_workers)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.reserved_workers -= workers
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Return seconds to wait before the next attempt.
+        * Honors a numeric Retry-After header, otherwise exponential backoff with full jitter
+        """
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_factor * 2**attempt))
+
+    def get(self, url: str) -> requests.Response:
+        """Return the response of a GET request, retrying 429/5xx and connection errors."""
+
+        for attempt in range(self.max_retries + 1):
+            self._count("requests")
+            retry_after = None
+            t_start = time.perf_counter()
+            try:
+                resp = self.session.get(url, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                metrics.count("http_requests", labels={"status": type(error).__name__})
+                if attempt == self.max_retries:
+                    raise
+                http_log.warning(f"Attempt {attempt + 1} failed ({type(error).__name__}): {url}")
+            else:
+                metrics.observe("http_request_seconds", time.perf_counter() - t_start)
+                metrics.count("http_requests", labels={"status": resp.status_code})
+                metrics.count("http_response_bytes", len(resp.content))
+                if resp.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    return resp
+                retry_after = resp.headers.get("Retry-After")
+                resp.close()
+                http_log.warning(f"Attempt {attempt + 1} failed (status {resp.status_code}): {url}")
+            self._count("retries")
+            time.sleep(self.backoff(attempt, retry_after))
+
+        raise Exception(f"Request Failed: {url}")  # pragma: no cover
+
+    def stats(self) -> dict:
+        """Return request counters, including how many requests reused a pooled connection."""
+        with self._lock:
+            stats = dict(self.counters)
+        stats["reused_connections"] = max(stats["requests"] - stats["new_connections"], 0)
+        return stats
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self.session.close()
+
+
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> HttpClient:
+    """Return the HttpClient shared by all API calls (created on first use)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+
+def get(url: str) -> requests.Response:
+    """GET url through the shared HttpClient."""
+    return get_client().get(url)
@@ -0,0 +1,161 @@
+"""Narrow (base, quote, exchange_date, rate) storage, an alternative to the wide *_based_currency tables.
+Migrate existing wide tables with: python3 -m src.modules.long_store
+"""
+
+# Standard library
+import logging
+import sqlite3
+from typing import Optional
+
+# Third party
+import numpy as np
+import pandas as pd
+
+# Local
+from . import bulk_write, db
+from .. import settings
+
+long_store_log = logging.getLogger("long_store.py")
+
+TABLE_NAME = "currency_rate"
+
+
+def create_long_table(conn: sqlite3.Connection) -> None:
+    """Create the rate table (if not exists).
+    * Clustered primary key (base, quote, exchange_date): a currency pair over a date range is one range scan
+    * Covering index (base, exchange_date, quote, rate): all quotes of a date without touching the table
+    """
+    conn.execute(f"""CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+        base TEXT NOT NULL,
+        quote TEXT NOT NULL,
+        exchange_date DATE NOT NULL,
+        rate FLOAT NOT NULL,
+        PRIMARY KEY (base, quote, exchange_date)
+    ) WITHOUT ROWID""")
+    conn.execute(f"""CREATE INDEX IF NOT EXISTS ix_{TABLE_NAME}_base_date
+        ON {TABLE_NAME} (base, exchange_date, quote, rate)""")
+
+
+def wide_to_records(df: pd.DataFrame, based_currency: str) -> list[tuple]:
+    """Return (base, quote, exchange_date, rate) records of a wide df, NaN rates are dropped."""
+
+    quotes = np.array([col for col in df.columns if col != "exchange_date"])
+    rates = df[quotes].to_numpy(np.float64)
+    dates = df.exchange_date.to_numpy()
+    rows, cols = np.nonzero(~np.isnan(rates))
+    return list(
+        zip(
+            [based_currency] * len(rows),
+            quotes[cols].tolist(),
+            dates[rows].tolist(),
+            rates[rows, cols].tolist(),
+        )
+    )
+
+
+def write_records(conn: sqlite3.Connection, records: list) -> None:
+    """Upsert (base, quote, exchange_date, rate) records in a single transaction."""
+    create_long_table(conn)
+    bulk_write.write_rows(
+        conn,
+        f"""INSERT INTO {TABLE_NAME} (base, quote, exchange_date, rate) VALUES (?, ?, ?, ?)
+        ON CONFLICT (base, quote, exchange_date) DO UPDATE SET rate = excluded.rate""",
+        records,
+    )
+
+
+def insert_wide_df(df: pd.DataFrame, db_path: str, based_currency: str) -> int:
+    """Insert (or update) the rates of a wide df, return the number of rates written."""
+
+    records = wide_to_records(df, based_currency)
+    with db.connection(db_path) as conn_lite:
+        write_records(conn_lite, records)
+    long_store_log.info(
+        f"{len(records)} rates inserted in db: {db_path} table: {TABLE_NAME} ({based_currency})"
+    )
+
+    return len(records)
+
+
+def last_exchange_date(db_path: str, based_currency: str) -> Optional[str]:
+    """Return the last date (YYYY-MM-DD) stored for based_currency (None if there is none)."""
+
+    with db.connection(db_path) as conn_lite:
+        create_long_table(conn_lite)
+        (last_date,) = conn_lite.execute(
+            f"SELECT max(exchange_date) FROM {TABLE_NAME} WHERE base = ?", (based_currency,)
+        ).fetchone()
+
+    return last_date
+
+
+def read_pair(
+    db_path: str, based_currency: str, quote: str, start: Optional[str] = None, end: Optional[str] = None
+) -> pd.DataFrame:
+    """Return exchange_date and rate of a currency pair, start/end (YYYY-MM-DD) are inclusive."""
+
+    with db.connection(db_path) as conn_lite:
+        query = f"""SELECT exchange_date, rate FROM {TABLE_NAME}
+            WHERE base = ? AND quote = ? AND exchange_date BETWEEN ? AND ?
+            ORDER BY exchange_date"""
+        df = pd.read_sql_query(query, conn_lite, params=(based_currency, quote, start or "", end or "9999"))
+
+    return df
+
+
+def read_wide(
+    db_path: str, based_currency: str, quotes: Optional[list] = None, since: Optional[str] = None
+) -> pd.DataFrame:
+    """Return rates of based_currency pivoted to the wide format (exchange_date + one col per quote).
+    * quotes -- Default(all quotes)
+    * since -- first date (YYYY-MM-DD) included. Default(all dates)
+    """
+
+    params: list = [based_currency, since or ""]
+    query = f"SELECT exchange_date, quote, rate FROM {TABLE_NAME} WHERE base = ? AND exchange_date >= ?"
+    if quotes:
+        query += f" AND quote IN ({', '.join('?' * len(quotes))})"
+        params += list(quotes)
+
+    with db.connection(db_path) as conn_lite:
+        long_df = pd.read_sql_query(query, conn_lite, params=params)
+
+    wide_df = long_df.pivot(index="exchange_date", columns="quote", values="rate")
+    if quotes:
+        wide_df = wide_df.reindex(columns=quotes)
+    wide_df.columns.name = None
+    return wide_df.sort_index().reset_index()
+
+
+def migrate_wide_tables(db_path: str, based_currency_mapping: dict, chunksize: int = 500) -> dict:
+    """Copy the wide tables ({prefix}_based_currency) into the rate table.
+    * Safe to run more than once (rates are upserted)
+    * Return the number of rates copied per based currency
+    """
+
+    copied = {}
+    with db.connection(db_path) as conn_lite:
+        for based_currency, table_prefix in based_currency_mapping.items():
+            table_name = table_prefix + "_based_currency"
+            copied[based_currency] = 0
+            last_rowid = 0
+            while True:
+                # Each chunk is fully read before writing, no statement is left open during commits
+                chunk_df = pd.read_sql_query(
+                    f"SELECT rowid AS _rowid, * FROM {table_name} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    conn_lite,
+                    params=(last_rowid, chunksize),
+                )
+                if chunk_df.empty:
+                    break
+                last_rowid = int(chunk_df._rowid.iloc[-1])
+                records = wide_to_records(chunk_df.drop(columns="_rowid"), based_currency)
+                write_records(conn_lite, records)
+                copied[based_currency] += len(records)
+            long_store_log.info(f"{table_name} migrated: {copied[based_currency]} rates")
+
+    return copied
+
+
+if __name__ == "__main__":
+    migrate_wide_tables(settings.DB_PATH, settings.BASED_CURRENCY_MAPPING)
@@ -0,0 +1,232 @@
+"""Run metrics of the ETL and the report: stage timers, counters and histograms.
+* Modules record into the shared Metrics (timer/count/observe shortcuts), entry points export them
+* Exported as a JSON run summary and/or a Prometheus textfile (node_exporter textfile collector)
+"""
+
+# Standard library
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import ContextManager, Iterator, Optional
+
+# Local
+from .. import settings
+
+metrics_log = logging.getLogger("metrics.py")
+
+# Prefix of every Prometheus metric
+PROMETHEUS_PREFIX = "currency_exchange_"
+# Upper bounds (seconds) of the latency histograms
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _key(name: str, labels: Optional[dict]) -> str:
+    """Return name{label="value",...} (Prometheus series notation, labels sorted)."""
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{label}="{value}"' for label, value in sorted(labels.items())) + "}"
+
+
+def _split(key: str) -> tuple[str, str]:
+    """Return (name, labels) of a series key, labels without braces."""
+    name, _, labels = key.partition("{")
+    return name, labels.rstrip("}")
+
+
+class Metrics:
+    """Thread safe metrics of a run.
+    * Stage timers add up the time spent in each stage (calls from several threads add up as well)
+    * Counters and histograms may have labels, e.g. count("rows_written", 10, {"base": "usd"})
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop every metric, the run starts now."""
+        with self._lock:
+            self.started_at = datetime.now()
+            self._t_start = time.perf_counter()
+            self.stages: dict[str, dict] = {}
+            self.counters: dict[str, float] = {}
+            self.histograms: dict[str, dict] = {}
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        """Add seconds spent in stage."""
+        with self._lock:
+            stage_times = self.stages.setdefault(stage, {"calls": 0, "total_s": 0.0, "max_s": 0.0})
+            stage_times["calls"] += 1
+            stage_times["total_s"] += seconds
+            stage_times["max_s"] = max(stage_times["max_s"], seconds)
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """Time the block as stage (errors included)."""
+        t_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - t_start)
+
+    def count(self, name: str, value: float = 1, labels: Optional[dict] = None) -> None:
+        """Add value to a counter."""
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(
+        self, name: str, value: float, labels: Optional[dict] = None, buckets: tuple = LATENCY_BUCKETS
+    ) -> None:
+        """Record value in a histogram (buckets are upper bounds, +Inf is added)."""
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self.histograms.setdefault(
+                key, {"buckets": buckets, "counts": [0] * (len(buckets) + 1), "count": 0, "sum": 0.0}
+            )
+            histogram["counts"][bisect.bisect_left(histogram["buckets"], value)] += 1
+            histogram["count"] += 1
+            histogram["sum"] += value
+
+    def summary(self) -> dict:
+        """Return the run summary (JSON serializable), histogram buckets are cumulative."""
+
+        with self._lock:
+            histograms = {}
+            for key, histogram in self.histograms.items():
+                cumulative = 0
+                buckets = {}
+                for bound, bucket_count in zip(list(histogram["buckets"]) + ["+Inf"], histogram["counts"]):
+                    cumulative += bucket_count
+                    buckets[str(bound)] = cumulative
+                histograms[key] = {
+                    "count": histogram["count"],
+                    "sum": round(histogram["sum"], 6),
+                    "buckets": buckets,
+                }
+            return {
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+                "duration_s": round(time.perf_counter() - self._t_start, 3),
+                "stages": {
+                    stage: {name: round(value, 4) for name, value in stage_times.items()}
+                    for stage, stage_times in self.stages.items()
+                },
+                "counters": dict(self.counters),
+                "histograms": histograms,
+            }
+
+    def to_prometheus(self, labels: Optional[dict] = None) -> str:
+        """Return the metrics in the Prometheus text exposition format.
+        * labels -- added to every series, e.g. {"task": "write_staged"} (files written by several processes)
+        """
+
+        summary = self.summary()
+        const_labels = _split(_key("", labels))[1]
+
+        def series(name: str, *series_labels: str) -> str:
+            joined = ",".join(filter(None, [*series_labels, const_labels]))
+            return f"{PROMETHEUS_PREFIX}{name}" + (f"{{{joined}}}" if joined else "")
+
+        lines = [
+            f"# TYPE {PROMETHEUS_PREFIX}run_duration_seconds gauge",
+            f"{series('run_duration_seconds')} {summary['duration_s']}",
+            f"# TYPE {PROMETHEUS_PREFIX}run_start_timestamp_seconds gauge",
+            f"{series('run_start_timestamp_seconds')} {self.started_at.timestamp():.0f}",
+            f"# TYPE {PROMETHEUS_PREFIX}stage_seconds_total counter",
+        ]
+        for stage, stage_times in summary["stages"].items():
+            stage_label = f'stage="{stage}"'
+            lines.append(f"{series('stage_seconds_total', stage_label)} {stage_times['total_s']}")
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}stage_calls_total counter")
+        for stage, stage_times in summary["stages"].items():
+            stage_label = f'stage="{stage}"'
+            lines.append(f"{series('stage_calls_total', stage_label)} {stage_times['calls']}")
+
+        typed: set = set()
+        for key, value in sorted(summary["counters"].items()):
+            name, key_labels = _split(key)
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {PROMETHEUS_PREFIX}{name}_total counter")
+            lines.append(f"{series(name + '_total', key_labels)} {value}")
+
+        for key, histogram in sorted(summary["histograms"].items()):
+            name, key_labels = _split(key)
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {PROMETHEUS_PREFIX}{name} histogram")
+            for bound, cumulative in histogram["buckets"].items():
+                bound_label = f'le="{bound}"'
+                lines.append(f"{series(name + '_bucket', key_labels, bound_label)} {cumulative}")
+            lines.append(f"{series(name + '_sum', key_labels)} {histogram['sum']}")
+            lines.append(f"{series(name + '_count', key_labels)} {histogram['count']}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path: str, content: str) -> None:
+    """Write content to path through a temporary file, readers never see a partial file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+_metrics: Optional[Metrics] = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> Metrics:
+    """Return the Metrics shared by all modules (created on first use)."""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics()
+        return _metrics
+
+
+def timer(stage: str) -> ContextManager[None]:
+    """Shortcut of get_metrics().timer(stage)."""
+    return get_metrics().timer(stage)
+
+
+def count(name: str, value: float = 1, labels: Optional[dict] = None) -> None:
+    """Shortcut of get_metrics().count(name, value, labels)."""
+    get_metrics().count(name, value, labels)
+
+
+def observe(name: str, value: float, labels: Optional[dict] = None) -> None:
+    """Shortcut of get_metrics().observe(name, value, labels)."""
+    get_metrics().observe(name, value, labels)
+
+
+def export(
+    json_path: Optional[str] = None, textfile_path: Optional[str] = None, labels: Optional[dict] = None
+) -> dict:
+    """Write the run summary (JSON) and the Prometheus textfile, return the summary.
+    * json_path -- Default(settings.METRICS_JSON_PATH)
+    * textfile_path -- Default(settings.METRICS_TEXTFILE_PATH)
+    * Empty/None paths are not written
+    * labels -- added to every Prometheus series, see Metrics.to_prometheus
+    """
+
+    run_metrics = get_metrics()
+    summary = run_metrics.summary()
+    json_path = json_path or settings.METRICS_JSON_PATH
+    textfile_path = textfile_path or settings.METRICS_TEXTFILE_PATH
+    if json_path:
+        _write_atomic(json_path, json.dumps(summary, indent=2))
+    if textfile_path:
+        _write_atomic(textfile_path, run_metrics.to_prometheus(labels))
+    metrics_log.info(
+        f"Run metrics ({summary['duration_s']}s): "
+        + ", ".join(f"{stage} {times['total_s']}s" for stage, times in summary["stages"].items())
+    )
+
+    return summary
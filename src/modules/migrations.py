@@ -0,0 +1,85 @@
+"""Schema changes of the wide {table_prefix}_based_currency tables.
+Deduplicate existing databases with: python3 -m src.modules.migrations
+"""
+
+# Standard library
+import logging
+import sqlite3
+
+# Local
+from . import db, monthly_agg
+from .. import settings
+
+migrations_log = logging.getLogger("migrations.py")
+
+
+def date_index_name(table_name: str) -> str:
+    """Return the name of the unique exchange_date index of a table."""
+    return f"ux_{table_name}_exchange_date"
+
+
+def create_date_index(conn: sqlite3.Connection, table_name: str) -> None:
+    """Create the unique exchange_date index (if not exists), fails if the table has duplicated dates."""
+    conn.execute(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {date_index_name(table_name)} ON {table_name} (exchange_date)"
+    )
+
+
+def dedupe_dates(conn: sqlite3.Connection, table_name: str) -> list[str]:
+    """Keep only the last inserted row (max rowid) of each exchange_date, return the deduplicated dates."""
+
+    with db.transaction(conn):
+        dates = [
+            exchange_date
+            for (exchange_date,) in conn.execute(
+                f"SELECT exchange_date FROM {table_name} GROUP BY exchange_date HAVING count(*) > 1"
+            )
+        ]
+        conn.execute(f"""DELETE FROM {table_name}
+            WHERE rowid NOT IN (SELECT max(rowid) FROM {table_name} GROUP BY exchange_date)""")
+    if dates:
+        migrations_log.info(f"{table_name}: {len(dates)} duplicated dates removed")
+
+    return dates
+
+
+def ensure_unique_dates(conn: sqlite3.Connection, table_name: str) -> list[str]:
+    """Create the unique exchange_date index, deduplicating the table first if needed.
+    * Return the deduplicated dates (empty if there were none)
+    """
+
+    try:
+        create_date_index(conn, table_name)
+        return []
+    except sqlite3.IntegrityError:
+        dates = dedupe_dates(conn, table_name)
+        create_date_index(conn, table_name)
+        return dates
+
+
+def migrate(db_path: str, based_currency_mapping: dict) -> dict:
+    """Deduplicate and index every existing based currency table.
+    * Monthly aggregates of the deduplicated months are recomputed
+    * Return the deduplicated dates per based currency
+    """
+
+    deduped = {}
+    with db.connection(db_path) as conn_lite:
+        for based_currency, table_prefix in based_currency_mapping.items():
+            table_name = table_prefix + "_based_currency"
+            exists = conn_lite.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+            ).fetchone()
+            if not exists:
+                continue
+            deduped[based_currency] = ensure_unique_dates(conn_lite, table_name)
+            if deduped[based_currency]:
+                monthly_agg.refresh(
+                    db_path, based_currency, monthly_agg.months_of(deduped[based_currency]), table_name
+                )
+
+    return deduped
+
+
+if __name__ == "__main__":
+    migrate(settings.DB_PATH, settings.BASED_CURRENCY_MAPPING)
@@ -0,0 +1,170 @@
+"""Per month mean/min/max/count of every base x quote, kept up to date by the ETL.
+Build it for existing tables with: python3 -m src.modules.monthly_agg
+"""
+
+# Standard library
+import logging
+import sqlite3
+from typing import Iterable, Optional
+
+# Third party
+import pandas as pd
+
+# Local
+from . import db, long_store
+from .. import settings
+
+monthly_agg_log = logging.getLogger("monthly_agg.py")
+
+TABLE_NAME = "monthly_agg"
+
+
+def create_monthly_table(conn: sqlite3.Connection) -> None:
+    """Create the aggregate table (if not exists), month is YYYY-MM."""
+    conn.execute(f"""CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+        base TEXT NOT NULL,
+        quote TEXT NOT NULL,
+        month TEXT NOT NULL,
+        mean FLOAT NOT NULL,
+        min FLOAT NOT NULL,
+        max FLOAT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (base, quote, month)
+    ) WITHOUT ROWID""")
+
+
+def months_of(dates: Iterable) -> list[str]:
+    """Return the sorted months (YYYY-MM) of ISO dates."""
+    return sorted({str(date)[:7] for date in dates})
+
+
+def month_range(months: list) -> tuple[str, str]:
+    """Return the [start, end) date bounds covering every month in months."""
+    return min(months), str(pd.Period(max(months), freq="M") + 1)
+
+
+def month_spans(months: list) -> list[tuple[str, str]]:
+    """Return the [start, end) date bounds of each run of consecutive months in months."""
+
+    spans: list = []
+    for month in months_of(months):
+        end = str(pd.Period(month, freq="M") + 1)
+        if spans and spans[-1][1] == month:
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans.append((month, end))
+    return spans
+
+
+def spans_filter(months: list) -> tuple[str, list]:
+    """Return an exchange_date condition (one range per run of consecutive months) and its params."""
+    spans = month_spans(months)
+    condition = " OR ".join(["(exchange_date >= ? AND exchange_date < ?)"] * len(spans))
+    return f"({condition})", [bound for span in spans for bound in span]
+
+
+def daily_rates(
+    conn: sqlite3.Connection, based_currency: str, months: list, table_name: Optional[str]
+) -> pd.DataFrame:
+    """Return the stored (quote, exchange_date, rate) rows of months (only those, not the months between).
+    * table_name -- wide table holding the rates. Default(long_store rate table)
+    """
+
+    condition, params = spans_filter(months)
+    if table_name is None:
+        return pd.read_sql_query(
+            f"SELECT quote, exchange_date, rate FROM {long_store.TABLE_NAME} WHERE base = ? AND {condition}",
+            conn,
+            params=[based_currency, *params],
+        )
+    wide_df = pd.read_sql_query(f"SELECT * FROM {table_name} WHERE {condition}", conn, params=params)
+    records = long_store.wide_to_records(wide_df, based_currency)
+    return pd.DataFrame(records, columns=["base", "quote", "exchange_date", "rate"]).drop(columns="base")
+
+
+def aggregate(rates_df: pd.DataFrame, based_currency: str) -> pd.DataFrame:
+    """Return the monthly_agg rows of (quote, exchange_date, rate) rows."""
+    return (
+        rates_df.assign(month=rates_df.exchange_date.astype(str).str[:7])
+        .groupby(["quote", "month"])
+        .rate.agg(["mean", "min", "max", "count"])
+        .reset_index()
+        .assign(base=based_currency)
+    )
+
+
+def refresh(db_path: str, based_currency: str, months: list, table_name: Optional[str] = None) -> int:
+    """Recompute the aggregates of the months touched by an insert, return the number of rows written.
+    * Only these months are read again from the stored daily rates (a repaired old gap plus today reads
+      two months, not the months between)
+    * table_name -- wide table holding the rates. Default(long_store rate table)
+    """
+
+    months = months_of(months)
+    if not months:
+        return 0
+    with db.connection(db_path) as conn_lite:
+        agg_df = aggregate(daily_rates(conn_lite, based_currency, months, table_name), based_currency)
+        with db.transaction(conn_lite):
+            create_monthly_table(conn_lite)
+            conn_lite.executemany(
+                f"DELETE FROM {TABLE_NAME} WHERE base = ? AND month = ?",
+                [(based_currency, month) for month in months],
+            )
+            conn_lite.executemany(
+                f"""INSERT INTO {TABLE_NAME} (base, quote, month, mean, min, max, count)
+                VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                agg_df[["base", "quote", "month", "mean", "min", "max", "count"]].itertuples(index=False),
+            )
+    monthly_agg_log.info(
+        f"{len(agg_df)} monthly aggregates refreshed ({based_currency}: {len(months)} months)"
+    )
+
+    return len(agg_df)
+
+
+def read_monthly(
+    db_path: str, based_currency: str, quotes: Optional[list] = None, since_month: Optional[str] = None
+) -> pd.DataFrame:
+    """Return the aggregates (quote, month, mean, min, max, count) of based_currency.
+    * quotes -- Default(all quotes)
+    * since_month -- first month (YYYY-MM) included. Default(all months)
+    """
+
+    params: list = [based_currency, since_month or ""]
+    query = f"SELECT quote, month, mean, min, max, count FROM {TABLE_NAME} WHERE base = ? AND month >= ?"
+    if quotes:
+        query += f" AND quote IN ({', '.join('?' * len(quotes))})"
+        params += list(quotes)
+
+    with db.connection(db_path) as conn_lite:
+        create_monthly_table(conn_lite)
+        df = pd.read_sql_query(query + " ORDER BY quote, month", conn_lite, params=params)
+
+    return df
+
+
+def rebuild(db_path: str, based_currency_mapping: dict) -> dict:
+    """Compute the aggregates of every stored month, return the number of rows per based currency."""
+
+    written = {}
+    with db.connection(db_path) as conn_lite:
+        for based_currency, table_prefix in based_currency_mapping.items():
+            if settings.STORAGE_BACKEND == "long":
+                table_name = None
+                long_store.create_long_table(conn_lite)
+                query = (
+                    f"SELECT DISTINCT substr(exchange_date, 1, 7) FROM {long_store.TABLE_NAME} WHERE base = ?"
+                )
+                params: tuple = (based_currency,)
+            else:
+                table_name = table_prefix + "_based_currency"
+                query, params = f"SELECT DISTINCT substr(exchange_date, 1, 7) FROM {table_name}", ()
+            months = [month for (month,) in conn_lite.execute(query, params)]
+            written[based_currency] = refresh(db_path, based_currency, months, table_name)
+
+    return written
+
+
+if __name__ == "__main__":
+    rebuild(settings.DB_PATH, settings.BASED_CURRENCY_MAPPING)
@@ -0,0 +1,252 @@
+"""Compact in-memory rates of several based currencies: one (base, day, quote) NumPy array.
+* Day axis: every calendar day from first_day (int32 day numbers since 1970-01-01), days without rates are NaN
+* Bases and quotes are located through dicts, a date/currency lookup is an index computation (no column scan)
+* Loaded once (db, columnar files or wide frames), then sliced without copying the rates
+"""
+
+# Standard library
+from typing import Optional
+
+# Third party
+import numpy as np
+import pandas as pd
+
+# Local
+from . import columnar_store, db, long_store, rate_stats
+from .. import settings
+
+
+def day_numbers(dates) -> np.ndarray:
+    """Return the int32 day numbers (days since 1970-01-01) of ISO dates."""
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int32)
+
+
+class RateCube:
+    """Rates of several based currencies in a (base, day, quote) array.
+    * rates -- float array of shape (len(bases), days, len(quotes)), rates[:, i] holds day first_day + i
+    * quotes -- column names, codes of descriptive names (e.g. brl_brazilian_real) are indexed as well
+    """
+
+    def __init__(self, rates: np.ndarray, bases: list, quotes: list, first_day: int) -> None:
+        if rates.ndim != 3 or rates.shape[0] != len(bases) or rates.shape[2] != len(quotes):
+            raise ValueError(
+                f"Rates of shape {rates.shape} do not match {len(bases)} bases x {len(quotes)} quotes"
+            )
+        self.rates = rates
+        self.bases = list(bases)
+        self.quotes = list(quotes)
+        self.first_day = int(first_day)
+        self.days = np.arange(self.first_day, self.first_day + rates.shape[1], dtype=np.int32)
+        self.base_index = {base: position for position, base in enumerate(self.bases)}
+        self.quote_index: dict = {}
+        for position, quote in enumerate(self.quotes):
+            self.quote_index.setdefault(quote, position)
+        # Same column as rate_stats.currency_column for codes that are not a column name
+        for position, quote in enumerate(self.quotes):
+            self.quote_index.setdefault(quote.split("_")[0], position)
+        # Days with at least one rate, per base (rows of the wide tables)
+        self.stored = ~np.isnan(rates).all(axis=2)
+
+    @classmethod
+    def from_frames(cls, frames: dict, dtype: Optional[str] = None) -> "RateCube":
+        """Return the cube of wide frames, {based_currency: exchange_date + one column per quote}.
+        * dtype -- rates dtype. Default(settings.RATE_CUBE_DTYPE)
+        * Quotes are the union of the frame columns, the last row of a duplicated date is kept
+        """
+
+        frames = {base: df.drop_duplicates("exchange_date", keep="last") for base, df in frames.items()}
+        quotes = list(
+            dict.fromkeys(col for df in frames.values() for col in df.columns if col != "exchange_date")
+        )
+        quote_positions = {quote: position for position, quote in enumerate(quotes)}
+        base_days = {base: day_numbers(df.exchange_date.to_numpy()) for base, df in frames.items()}
+        all_days = np.concatenate([np.array([], dtype=np.int32)] + list(base_days.values()))
+        first_day = int(all_days.min()) if len(all_days) else 0
+        n_days = int(all_days.max()) - first_day + 1 if len(all_days) else 0
+
+        rates = np.full((len(frames), n_days, len(quotes)), np.nan, dtype=dtype or settings.RATE_CUBE_DTYPE)
+        for base_position, (base, df) in enumerate(frames.items()):
+            cols = [col for col in df.columns if col != "exchange_date"]
+            rates[base_position][
+                np.ix_(
+                    base_days[base] - first_day,
+                    np.array([quote_positions[col] for col in cols], dtype=np.intp),
+                )
+            ] = df[cols].to_numpy(np.float64)
+
+        return cls(rates, list(frames), quotes, first_day)
+
+    @classmethod
+    def from_db(
+        cls,
+        db_path: str,
+        based_currency_mapping: dict,
+        quotes: Optional[list] = None,
+        since: Optional[str] = None,
+        dtype: Optional[str] = None,
+    ) -> "RateCube":
+        """Return the cube of the rates stored in the db (a single read per based currency).
+        * quotes -- currency codes. Default(all quotes)
+        * since -- first date (YYYY-MM-DD) loaded. Default(all dates)
+        """
+
+        frames = {}
+        for based_currency, table_prefix in based_currency_mapping.items():
+            if settings.STORAGE_BACKEND == "long":
+                frames[based_currency] = long_store.read_wide(db_path, based_currency, quotes, since)
+                continue
+            table_name = table_prefix + "_based_currency"
+            with db.connection(db_path) as conn_lite:
+                table_cols = [
+                    row[1]
+                    for row in conn_lite.execute(f"PRAGMA table_info({table_name})")
+                    if row[1] != "exchange_date"
+                ]
+                if quotes is not None:
+                    table_cols = list(
+                        dict.fromkeys(rate_stats.currency_column(table_cols, code) for code in quotes)
+                    )
+                cols_sql = ", ".join(f'"{col}"' for col in ["exchange_date"] + table_cols)
+                frames[based_currency] = pd.read_sql_query(
+                    f"SELECT {cols_sql} FROM {table_name} WHERE exchange_date >= ?",
+                    conn_lite,
+                    params=(since or "",),
+                )
+
+        return cls.from_frames(frames, dtype)
+
+    @classmethod
+    def from_columnar(
+        cls,
+        based_currencies: list,
+        quotes: Optional[list] = None,
+        since: Optional[str] = None,
+        export_dir: Optional[str] = None,
+        dtype: Optional[str] = None,
+    ) -> "RateCube":
+        """Return the cube of the columnar files (columnar_store), only the quotes needed are read.
+        * quotes -- currency codes. Default(all quotes)
+        * since -- first date (YYYY-MM-DD) loaded. Default(all dates)
+        """
+
+        frames = {}
+        for based_currency in based_currencies:
+            columns = None
+            if quotes is not None:
+                stored_cols = columnar_store.stored_columns(based_currency, export_dir)
+                columns = list(
+                    dict.fromkeys(rate_stats.currency_column(stored_cols, code) for code in quotes)
+                )
+            frames[based_currency] = columnar_store.read_columns(based_currency, columns, since, export_dir)
+
+        return cls.from_frames(frames, dtype)
+
+    def __getitem__(self, based_currency: str) -> "RateCube":
+        """Return the cube of a single based currency (a view, rates are not copied)."""
+        base_position = self.base_position(based_currency)
+        return RateCube(
+            np.expand_dims(self.rates[base_position], 0), [based_currency], self.quotes, self.first_day
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Return the memory used by the rates and the day axis."""
+        return self.rates.nbytes + self.days.nbytes + self.stored.nbytes
+
+    @property
+    def dates(self) -> np.ndarray:
+        """Return the datetime64[D] of the day axis."""
+        return self.days.astype("datetime64[D]")
+
+    def base_position(self, based_currency: str) -> int:
+        """Return the position of a based currency on the base axis."""
+        if based_currency not in self.base_index:
+            raise ValueError(f"Based currency {based_currency} not found")
+        return self.base_index[based_currency]
+
+    def quote_position(self, currency_code: str) -> int:
+        """Return the position of a currency (column name or code) on the quote axis."""
+        if currency_code not in self.quote_index:
+            raise ValueError(f"Currency {currency_code} not found")
+        return self.quote_index[currency_code]
+
+    def column(self, currency_code: str) -> str:
+        """Return the column name of a currency (see rate_stats.currency_column)."""
+        return self.quotes[self.quote_position(currency_code)]
+
+    def day_position(self, date: str) -> int:
+        """Return the position of a date (YYYY-MM-DD) on the day axis."""
+        position = int(day_numbers(date)) - self.first_day
+        if not 0 <= position < len(self.days):
+            raise ValueError(f"Date {date} not in the cube")
+        return position
+
+    def _day_slice(self, start: Optional[str], end: Optional[str]) -> slice:
+        """Return the day axis slice of [start, end] (inclusive, clipped to the cube)."""
+        n_days = len(self.days)
+        first = 0 if start is None else int(np.clip(int(day_numbers(start)) - self.first_day, 0, n_days))
+        last = n_days if end is None else int(np.clip(int(day_numbers(end)) - self.first_day + 1, 0, n_days))
+        return slice(first, last)
+
+    def last_date(self, based_currency: Optional[str] = None) -> Optional[str]:
+        """Return the last date (YYYY-MM-DD) with rates (None if there is none).
+        * based_currency -- Default(first base)
+        """
+        base_position = self.base_position(based_currency) if based_currency else 0
+        stored_days = np.flatnonzero(self.stored[base_position])
+        return str(self.dates[stored_days[-1]]) if len(stored_days) else None
+
+    def pair(
+        self, based_currency: str, currency_code: str, start: Optional[str] = None, end: Optional[str] = None
+    ) -> pd.Series:
+        """Return the rates of a currency pair indexed by date, start/end (YYYY-MM-DD) are inclusive.
+        * Days without rate are dropped
+        """
+
+        days = self._day_slice(start, end)
+        rates = pd.Series(
+            self.rates[self.base_position(based_currency), days, self.quote_position(currency_code)],
+            index=pd.DatetimeIndex(self.dates[days], name="exchange_date"),
+            name=self.column(currency_code),
+        )
+        return rates.dropna()
+
+    def snapshot(self, date: str) -> pd.DataFrame:
+        """Return the rates of a date, one row per based currency and one column per quote."""
+        return pd.DataFrame(self.rates[:, self.day_position(date)], index=self.bases, columns=self.quotes)
+
+    def to_frame(self, based_currency: str, currency_codes: Optional[list] = None) -> pd.DataFrame:
+        """Return the wide frame of a based currency (exchange_date + one column per quote), stored days only.
+        * currency_codes -- Default(all quotes)
+        """
+
+        base_position = self.base_position(based_currency)
+        positions = (
+            list(range(len(self.quotes)))
+            if currency_codes is None
+            else [self.quote_position(code) for code in currency_codes]
+        )
+        stored_days = self.stored[base_position]
+        df = pd.DataFrame(
+            self.rates[base_position][:, positions][stored_days], columns=[self.quotes[p] for p in positions]
+        )
+        df.insert(0, "exchange_date", self.dates[stored_days].astype(str))
+
+        return df
+
+    def window_stats(
+        self,
+        based_currency: str,
+        currency_codes: list,
+        windows: Optional[dict] = None,
+        with_mean: bool = False,
+    ) -> pd.DataFrame:
+        """Return rate_stats.window_stats of a based currency, windows count the stored days."""
+
+        base_position = self.base_position(based_currency)
+        positions = [self.quote_position(code) for code in currency_codes]
+        # (days x currencies) of the stored days, most recent day first
+        matrix = self.rates[base_position][:, positions][self.stored[base_position]].astype(np.float64)[::-1]
+        return rate_stats.matrix_window_stats(
+            matrix, currency_codes, [self.quotes[position] for position in positions], windows, with_mean
+        )
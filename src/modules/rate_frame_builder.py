@@ -0,0 +1,70 @@
+# Standard library
+from datetime import datetime
+from typing import Optional
+
+# Third party
+import numpy as np
+import pandas as pd
+
+
+class RateFrameBuilder:
+    """Collect daily API rates into a preallocated float64 matrix (one row per date, one col per currency).
+    * The DataFrame is materialized only once, by to_frame()
+    * Currencies missing in a payload are kept as NaN
+    * add_new_columns -- currencies not in columns get a new column (NaN in the previous rows).
+      Default(they are dropped)
+    """
+
+    def __init__(
+        self, columns: list, n_rows: int, date_column: str = "exchange_date", add_new_columns: bool = False
+    ) -> None:
+        self.date_column = date_column
+        self.add_new_columns = add_new_columns
+        self.columns = [col for col in columns if col != date_column]
+        self.col_index = {col: i for i, col in enumerate(self.columns)}
+        self.matrix = np.full((n_rows, len(self.columns)), np.nan, dtype=np.float64)
+        self.dates: list[Optional[str]] = [None] * n_rows
+        self.n_rows = 0
+        # Payloads share the same keys order day after day, positions are computed once per key set
+        self._last_keys: tuple = ()
+        self._positions = np.empty(0, dtype=np.intp)
+        self._known = np.empty(0, dtype=bool)
+
+    def _locate(self, keys: tuple) -> None:
+        if keys != self._last_keys:
+            new_columns = [key for key in keys if key not in self.col_index] if self.add_new_columns else []
+            if new_columns:
+                self.col_index.update({key: len(self.columns) + i for i, key in enumerate(new_columns)})
+                self.columns += new_columns
+                self.matrix = np.hstack(
+                    [self.matrix, np.full((len(self.matrix), len(new_columns)), np.nan, dtype=np.float64)]
+                )
+            positions = np.fromiter(
+                (self.col_index.get(key, -1) for key in keys), dtype=np.intp, count=len(keys)
+            )
+            self._known = positions >= 0
+            self._positions = positions[self._known]
+            self._last_keys = keys
+
+    def add(self, day: datetime, rates: dict) -> None:
+        """Add a row with the rates ({currency_code: rate}) of a single day."""
+
+        row = self.n_rows
+        self._locate(tuple(rates))
+        try:
+            values = np.fromiter(rates.values(), dtype=np.float64, count=len(rates))
+        except (TypeError, ValueError):
+            # Rare null/str values in the payload
+            values = np.array([v if isinstance(v, (int, float)) else np.nan for v in rates.values()], float)
+        values = values[self._known]
+        values[values == 0] = np.nan  # A 0 rate means missing data
+        self.matrix[row, self._positions] = values
+        self.dates[row] = day.strftime("%Y-%m-%d")
+        self.n_rows += 1
+
+    def to_frame(self) -> pd.DataFrame:
+        """Return the collected rows as a DataFrame (date column first, then currencies)."""
+
+        currency_df = pd.DataFrame(self.matrix[: self.n_rows], columns=self.columns, copy=False)
+        currency_df.insert(0, self.date_column, self.dates[: self.n_rows])
+        return currency_df
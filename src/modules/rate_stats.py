@@ -0,0 +1,85 @@
+# Standard library
+from typing import Optional
+
+# Third party
+import numpy as np
+import pandas as pd
+
+# Report windows: label -> number of most recent days
+REPORT_WINDOWS = {
+    "Last Week Range": 7,
+    "Last Month Range": 30,
+    "Last 3 Months Range": 90,
+    "Last 6 Months Range": 180,
+    "Last Year Range": 360,
+}
+
+
+def currency_column(columns: list, currency_code: str) -> str:
+    """Return the first column matching currency_code (column name starts with the code)."""
+    for col in columns:
+        if col.startswith(currency_code):
+            return col
+    raise ValueError(f"Currency {currency_code} not found")
+
+
+def window_stats(
+    currency_df: pd.DataFrame,
+    currency_codes: list,
+    windows: Optional[dict] = None,
+    with_mean: bool = False,
+) -> pd.DataFrame:
+    """Return current rate and min/max (optionally mean/std) of every window for every currency.
+    * One vectorized pass over a (days x currencies) matrix: running min/max/sums from the most recent day
+    * windows -- {label: days}. Default(REPORT_WINDOWS)
+    * Tidy result: one row per currency and window, NaN rates are ignored
+    """
+
+    columns = [currency_column(currency_df.columns, code) for code in currency_codes]
+    # Most recent day first
+    return matrix_window_stats(
+        currency_df[columns].to_numpy(np.float64)[::-1], currency_codes, columns, windows, with_mean
+    )
+
+
+def matrix_window_stats(
+    matrix: np.ndarray,
+    currency_codes: list,
+    columns: list,
+    windows: Optional[dict] = None,
+    with_mean: bool = False,
+) -> pd.DataFrame:
+    """Return the window_stats of a (days x currencies) float64 matrix, most recent day first.
+    * columns -- column name of each currency code
+    """
+
+    windows = windows or REPORT_WINDOWS
+    n_days = len(matrix)
+    # Row i holds the stats of the i + 1 most recent days
+    running_max = np.fmax.accumulate(matrix, axis=0)
+    running_min = np.fmin.accumulate(matrix, axis=0)
+    rows = np.array([min(days, n_days) - 1 for days in windows.values()])
+
+    n_windows, n_currencies = len(windows), len(columns)
+    stats = {
+        "currency": np.repeat(currency_codes, n_windows),
+        "column": np.repeat(columns, n_windows),
+        "window": np.tile(list(windows), n_currencies),
+        "days": np.tile(list(windows.values()), n_currencies),
+        "current": np.repeat(matrix[0], n_windows),
+        # (windows x currencies) -> currency major order
+        "min": running_min[rows].T.ravel(),
+        "max": running_max[rows].T.ravel(),
+    }
+    if with_mean:
+        valid = ~np.isnan(matrix)
+        counts = np.cumsum(valid, axis=0)[rows]
+        sums = np.nancumsum(matrix, axis=0)[rows]
+        squares = np.nancumsum(matrix**2, axis=0)[rows]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = sums / counts
+            variance = (squares - counts * mean**2) / (counts - 1)
+        stats["mean"] = mean.T.ravel()
+        stats["std"] = np.sqrt(np.clip(variance, 0, None)).T.ravel()
+
+    return pd.DataFrame(stats)
@@ -0,0 +1,73 @@
+"""On-disk cache of the rendered parts of the report (chart PNGs and tab tables).
+* Entries are keyed by a hash of what they are made of (currency, base, data window fingerprint, style
+  version): a tab whose rates did not change is not recomputed (weekend runs, DAG retries)
+* Size capped by max_bytes, least recently used entries are evicted first (see file_cache.py)
+"""
+
+# Standard library
+import hashlib
+import os
+from typing import Optional
+
+# Third party
+import numpy as np
+
+# Local
+from .file_cache import FileCache
+from .. import settings
+
+
+def fingerprint(*arrays) -> str:
+    """Return the sha256 of arrays (dates as str, rates as float64), NaN included."""
+
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.asarray(array)
+        values = array.astype(str) if array.dtype.kind in "OUSM" else array.astype(np.float64)
+        digest.update(str(values.shape).encode())
+        digest.update(np.ascontiguousarray(values).tobytes())
+    return digest.hexdigest()
+
+
+def cache_key(*parts) -> str:
+    """Return the key of an entry made of parts (str, fingerprints)."""
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode()).hexdigest()
+
+
+class RenderCache(FileCache):
+    """Report parts stored as files named by their key, {key}.{suffix} (png charts, json tables)."""
+
+    suffixes = (".png", ".json")
+
+    def path(self, key: str, suffix: str) -> str:
+        """Return the file path of an entry."""
+        return self.entry_path(key, "." + suffix)
+
+    def contains(self, key: str, suffix: str) -> bool:
+        """Return True if the entry is stored (not counted as a hit)."""
+        return os.path.exists(self.path(key, suffix))
+
+    def get(self, key: str, suffix: str) -> Optional[bytes]:
+        """Return the cached bytes or None."""
+
+        def read(path: str) -> bytes:
+            with open(path, "rb") as f:
+                return f.read()
+
+        return self.read_entry(self.path(key, suffix), read)
+
+    def put(self, key: str, suffix: str, content: bytes) -> None:
+        """Store an entry."""
+
+        def write(tmp_path: str) -> None:
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+
+        self.write_entry(self.path(key, suffix), write)
+
+
+def from_settings() -> Optional[RenderCache]:
+    """Return a RenderCache configured in settings.py (None if disabled)."""
+    if not settings.REPORT_CACHE_DIR:
+        return None
+    return RenderCache(settings.REPORT_CACHE_DIR, settings.REPORT_CACHE_MAX_BYTES)
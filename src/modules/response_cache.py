@@ -0,0 +1,58 @@
+# Standard library
+import gzip
+import hashlib
+import json
+import logging
+from datetime import datetime
+from typing import Optional
+
+# Local
+from .file_cache import FileCache
+from .. import settings
+
+cache_log = logging.getLogger("response_cache.py")
+
+
+class ResponseCache(FileCache):
+    """Gzip compressed on-disk cache of dated API payloads, keyed by (api version, date, base currency).
+    * Dated payloads never change once published, "latest"/today are never cached
+    * Size capped by max_bytes, least recently used entries are evicted first (see FileCache)
+    """
+
+    suffixes = (".json.gz",)
+
+    @staticmethod
+    def cacheable(day: datetime) -> bool:
+        """Only days before today are final."""
+        return day.date() < datetime.today().date()
+
+    def path(self, day: datetime, based_currency: str) -> str:
+        """Return the file path of a payload (sha256 of the request identity)."""
+        request_id = f"{settings.API_VERSION}/{day.strftime('%Y-%m-%d')}/{based_currency}"
+        return self.entry_path(hashlib.sha256(request_id.encode()).hexdigest(), ".json.gz")
+
+    def get(self, day: datetime, based_currency: str) -> Optional[dict]:
+        """Return the cached payload or None (missing or corrupted entry)."""
+
+        def read(path: str) -> dict:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                return json.load(f)
+
+        return self.read_entry(self.path(day, based_currency), read)
+
+    def put(self, day: datetime, based_currency: str, payload: dict) -> None:
+        """Store a payload (skipped for today and later)."""
+
+        def write(tmp_path: str) -> None:
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump(payload, f)
+
+        if self.cacheable(day):
+            self.write_entry(self.path(day, based_currency), write)
+
+
+def from_settings() -> Optional[ResponseCache]:
+    """Return a ResponseCache configured in settings.py (None if disabled)."""
+    if not settings.RESPONSE_CACHE_DIR:
+        return None
+    return ResponseCache(settings.RESPONSE_CACHE_DIR, settings.RESPONSE_CACHE_MAX_BYTES)
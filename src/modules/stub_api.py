@@ -0,0 +1,138 @@
+"""Local stand-in for the currency API, used by the unit tests and the benchmarks (no network needed).
+* Serves {API_BASE_URL}@{date}/v1/currencies.json and {API_BASE_URL}@{date}/v1/currencies/{base}.json
+* Point settings.API_BASE_URL to StubCurrencyAPI.base_url
+"""
+
+# Standard library
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+def synthetic_rates(request_date: str, based_currency: str, codes: list) -> dict:
+    """Return {code: rate} for a date and based currency (same arguments, same rates)."""
+    rng = random.Random(f"{request_date}/{based_currency}")
+    return {code: rng.uniform(0.01, 5000) for code in codes}
+
+
+class StubCurrencyAPI:
+    """Local HTTP server imitating the currency API.
+    * payload -- json served for every date and base. Default(synthetic rates of n_currencies, per date/base)
+    * latency -- seconds slept before answering each request
+    * missing_dates -- dates (request format, e.g. 2024.2.18) answered with missing_status (Default 404)
+    * fail_times -- number of first requests answered with fail_status (e.g. 503, 429)
+    * error_rate -- share of the other requests answered with fail_status (random, seeded)
+    * added_codes -- {code: first date (YYYY-MM-DD)} of currencies added to the synthetic rates from that
+      date on (not listed in currencies.json, like codes added by the API after a table was created)
+    """
+
+    url_pattern = re.compile(r"@([^/]+)/v1/currencies(?:/([^/]+))?\.json$")
+
+    def __init__(
+        self,
+        payload: Optional[dict] = None,
+        latency: float = 0,
+        missing_dates: Optional[set] = None,
+        missing_status: int = 404,
+        fail_times: int = 0,
+        fail_status: int = 503,
+        error_rate: float = 0.0,
+        n_currencies: int = 273,
+        seed: int = 0,
+        added_codes: Optional[dict] = None,
+    ) -> None:
+        self.payload = payload
+        self.latency = latency
+        self.missing_dates = missing_dates or set()
+        self.missing_status = missing_status
+        self.fail_times = fail_times
+        self.fail_status = fail_status
+        self.error_rate = error_rate
+        if payload:
+            rates = next(value for key, value in payload.items() if key != "date")
+            self.codes = list(rates)
+        else:
+            self.codes = [f"c{i:03d}" for i in range(n_currencies)]
+        self.added_codes = added_codes or {}
+        self.rng = random.Random(seed)
+        self.request_count = 0
+        self.error_count = 0
+        self.lock = threading.Lock()
+        self.requested_dates: list = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/npm/@fawazahmed0/currency-api"
+
+    def _failing(self) -> bool:
+        with self.lock:
+            self.request_count += 1
+            failing = self.request_count <= self.fail_times or self.rng.random() < self.error_rate
+            self.error_count += failing
+        return failing
+
+    def body(self, request_date: str, based_currency: Optional[str]) -> bytes:
+        """Return the json served for a date and based currency (None -> currencies.json)."""
+        content: dict
+        if based_currency is None:
+            content = {code: f"Currency {code.upper()}" for code in self.codes}
+        elif self.payload:
+            content = self.payload
+        else:
+            day = datetime.strptime(request_date, "%Y.%m.%d").strftime("%Y-%m-%d")
+            codes = self.codes + [code for code, since in self.added_codes.items() if day >= since]
+            content = {
+                "date": request_date,
+                based_currency: synthetic_rates(request_date, based_currency, codes),
+            }
+        return json.dumps(content).encode()
+
+    def _handler(self) -> type:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, so clients can reuse connections
+            protocol_version = "HTTP/1.1"
+
+            def send_empty(self, status: int) -> None:
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_GET(self) -> None:
+                time.sleep(stub.latency)
+                if stub._failing():
+                    self.send_empty(stub.fail_status)
+                    return
+                match = stub.url_pattern.search(self.path)
+                if not match:
+                    self.send_empty(404)
+                    return
+                if match.group(1) in stub.missing_dates:
+                    self.send_empty(stub.missing_status)
+                    return
+                if match.group(2):
+                    stub.requested_dates.append(match.group(1))
+                body = stub.body(match.group(1), match.group(2))
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        return Handler
+
+    def __enter__(self) -> "StubCurrencyAPI":
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,108 @@
+# Standard library
+import logging
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Optional
+
+# Local
+from . import db, long_store, migrations
+from .. import settings
+
+sync_planner_log = logging.getLogger("sync_planner.py")
+
+# Historical rates are only available for the last year, older dates need an explicit since
+DEFAULT_LOOKBACK_DAYS = 365
+
+# One row per day between two ISO dates (inclusive)
+CALENDAR_CTE = """WITH RECURSIVE calendar(day) AS (
+    SELECT date(?)
+    UNION ALL
+    SELECT date(day, '+1 day') FROM calendar WHERE day < date(?)
+)"""
+
+
+def table_exists(conn: sqlite3.Connection, table_name: str) -> bool:
+    """Return True if table_name exists."""
+    return bool(
+        conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+        ).fetchone()
+    )
+
+
+def missing_dates(
+    conn: sqlite3.Connection,
+    since: str,
+    until: str,
+    table_name: Optional[str] = None,
+    based_currency: Optional[str] = None,
+) -> list[str]:
+    """Return the dates (YYYY-MM-DD) between since and until (inclusive) without rates.
+    * A single query: generated calendar anti-joined on the unique exchange_date index
+    * table_name -- wide table. Default(long_store rate table, rows of based_currency)
+    """
+
+    if table_name is None:
+        long_store.create_long_table(conn)
+        # Covering index (base, exchange_date, ...) of the rate table
+        stored_sql = f"SELECT 1 FROM {long_store.TABLE_NAME} WHERE base = ? AND exchange_date = calendar.day"
+        params: tuple = (since, until, based_currency)
+    elif table_exists(conn, table_name):
+        migrations.ensure_unique_dates(conn, table_name)
+        stored_sql = f"SELECT 1 FROM {table_name} WHERE exchange_date = calendar.day"
+        params = (since, until)
+    else:
+        stored_sql, params = "SELECT 1 WHERE 0", (since, until)
+
+    query = f"{CALENDAR_CTE} SELECT day FROM calendar WHERE NOT EXISTS ({stored_sql}) ORDER BY day"
+    return [day for (day,) in conn.execute(query, params)]
+
+
+def first_date(conn: sqlite3.Connection, table_name: Optional[str], based_currency: str) -> Optional[str]:
+    """Return the first stored date (None if there is none)."""
+
+    if table_name is None:
+        query = f"SELECT min(exchange_date) FROM {long_store.TABLE_NAME} WHERE base = :base"
+    elif table_exists(conn, table_name):
+        query = f"SELECT min(exchange_date) FROM {table_name}"
+    else:
+        return None
+    return conn.execute(query, {"base": based_currency}).fetchone()[0]
+
+
+def plan(
+    db_path: str,
+    based_currency_mapping: dict,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> dict:
+    """Return the days to fetch for each based currency: every day of the range missing in its table.
+    * since -- Default(first stored date, at most DEFAULT_LOOKBACK_DAYS ago), gaps of that window are
+      repaired, older ones need an explicit since (no longer served by the API)
+    * until -- Default(today)
+    """
+
+    until_date = (until or datetime.today()).strftime("%Y-%m-%d")
+    default_since = (datetime.today() - timedelta(days=DEFAULT_LOOKBACK_DAYS)).strftime("%Y-%m-%d")
+    sync_plan = {}
+    with db.connection(db_path) as conn_lite:
+        for based_currency, table_prefix in based_currency_mapping.items():
+            table_name = None if settings.STORAGE_BACKEND == "long" else table_prefix + "_based_currency"
+            if since:
+                since_date = since.strftime("%Y-%m-%d")
+            else:
+                since_date = max(
+                    filter(None, [first_date(conn_lite, table_name, based_currency), default_since])
+                )
+            days = missing_dates(conn_lite, since_date, until_date, table_name, based_currency)
+            sync_plan[based_currency] = [datetime.strptime(day, "%Y-%m-%d") for day in days]
+            sync_planner_log.info(
+                f"{based_currency}: {len(days)} missing days between {since_date} and {until_date}"
+            )
+
+    return sync_plan
+
+
+def union_days(sync_plan: dict) -> list[datetime]:
+    """Return the sorted days missing in at least one table (each day once)."""
+    return sorted(set().union(*sync_plan.values()))
@@ -1,33 +1,43 @@
 # Standard library
 import logging
-import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from itertools import islice
 from time import perf_counter
-from typing import Optional
+from typing import Callable, Iterator, Optional
 
 # Third party
-import numpy as np
 import pandas as pd
-import requests
 
 # Local
+from . import (
+    bulk_write,
+    columnar_store,
+    currency_catalog,
+    db,
+    http_client,
+    long_store,
+    metrics,
+    migrations,
+    monthly_agg,
+    response_cache,
+    sync_planner,
+)
+from .cross_rate import derive_base_frame, measure_drift, sample_days
+from .rate_frame_builder import RateFrameBuilder
+from .response_cache import ResponseCache
 from .. import settings
 
 update_currency = logging.getLogger("update_currency_exchange.py")
 
 
 def create_table_currency_exchange(db_path: str, table_name: str) -> pd.DataFrame:
-    """Create an empty table in a SQLite DB with a column for each currency available in the API.
+    """Create an empty table in a SQLite DB with a column for each currency of the catalog.
     * API: https://github.com/fawazahmed0/currency-api
     """
 
-    # Retrieve a json with all available currencies
-    url_all_currencies = "https://cdn.jsdelivr.net/npm/@fawazahmed0/currency-api@latest/v1/currencies.json"
-    resp = requests.get(url_all_currencies)
-    all_currencies_json = resp.json()
-
     # Column names = currency_code
-    currency_code_list = list(all_currencies_json.keys())
+    currency_code_list = catalog_codes(db_path)
     # Create empty df
     empty_currency_df = pd.DataFrame(columns=["exchange_date"] + currency_code_list)
     # Define the data types for each col
@@ -36,39 +46,197 @@ def create_table_currency_exchange(db_path: str, table_name: str) -> pd.DataFram
         dtypes_dict.update({col: "FLOAT"})
 
     # Create table
-    conn_lite = sqlite3.connect(db_path)
-    empty_currency_df.to_sql(name=table_name, con=conn_lite, if_exists="fail", index=False, dtype=dtypes_dict)
-    conn_lite.close()
+    with db.connection(db_path) as conn_lite:
+        empty_currency_df.to_sql(
+            name=table_name, con=conn_lite, if_exists="fail", index=False, dtype=dtypes_dict
+        )
+        migrations.create_date_index(conn_lite, table_name)  # One row per day
     update_currency.info(f"Table {table_name} created!")
 
     return empty_currency_df
 
 
-def last_exchange_date(db_path: str, table_name: str) -> datetime:
-    """Return the last date added in the db."""
+def currency_names() -> dict:
+    """Return {currency_code: name} of all currencies available in the API."""
+
+    # Retrieve a json with all available currencies
+    url_all_currencies = request_url("latest", "currencies.json")
+    resp = http_client.get(url_all_currencies)
+    return resp.json()
+
+
+def catalog_codes(db_path: str) -> list:
+    """Return the currency codes of the catalog (currency_catalog.py).
+    * The API currencies.json is requested only to fill an empty catalog, codes added later by the API
+      are found in the rate payloads
+    """
+
+    codes = currency_catalog.codes(db_path)
+    if not codes:
+        currency_catalog.record_names(db_path, currency_names())
+        codes = currency_catalog.codes(db_path)
+    return codes
+
 
-    conn_lite = sqlite3.connect(db_path)
-    try:
-        query = f"SELECT max(exchange_date) as last_update_date FROM {table_name}"
-        max_date_df = pd.read_sql_query(query, conn_lite)
-    except Exception:
-        max_date_df = pd.DataFrame()
-        update_currency.debug(Exception)
-    conn_lite.close()
+def last_exchange_date(db_path: str, table_name: str, based_currency: Optional[str] = None) -> datetime:
+    """Return the last date added in the db.
+    * Backed by the unique exchange_date index (a single index seek, see migrations.py)
+    * based_currency -- identifies the rates in the long storage backend (table_name is not used)
+    """
 
-    if max_date_df.empty:
+    if settings.STORAGE_BACKEND == "long":
+        last_update_date_str = long_store.last_exchange_date(db_path, str(based_currency))
+    else:
+        with db.connection(db_path) as conn_lite:
+            try:
+                query = f"SELECT max(exchange_date) as last_update_date FROM {table_name}"
+                max_date_df = pd.read_sql_query(query, conn_lite)
+            except Exception:
+                max_date_df = pd.DataFrame()
+                update_currency.debug(Exception)
+        last_update_date_str = None if max_date_df.empty else max_date_df.last_update_date[0]
+
+    if not last_update_date_str:
         # one year ago - Historical rates are only available for last 1 year
         last_update_date = datetime.today() - timedelta(days=365)  # .strftime('%Y-%m-%d')
     else:
-        last_update_date_str = max_date_df.last_update_date[0]
         last_update_date = datetime.strptime(last_update_date_str, "%Y-%m-%d")
 
     update_currency.info(f"Last date updated in db: {last_update_date}")
     return last_update_date
 
 
+def request_url(request_date: str, endpoint: str) -> str:
+    """Return the API url for a date (request format, e.g. 2024.2.18 or latest) and endpoint."""
+    return f"{settings.API_BASE_URL}@{request_date}/{settings.API_VERSION}/{endpoint}"
+
+
+def date_range(since_date: datetime, until_date: Optional[datetime] = None) -> list[datetime]:
+    """Return a list with each day after since_date up to until_date (inclusive).
+    * until_date -- Default(today)
+    """
+
+    until_date = until_date or datetime.today()
+    days = []
+    day = since_date
+    while day.date() < until_date.date():
+        day = day + timedelta(days=1)  # Sum one day
+        days.append(day)
+
+    return days
+
+
+def fetch_day(day: datetime, based_currency: str, cache: Optional[ResponseCache] = None) -> Optional[dict]:
+    """Return the API json with all exchange rates of based_currency for a single day.
+    * data is missing for a few days, in these cases we will take the value of the previous day
+    * None if the API has neither (404 for both, e.g. older than its history): the day is skipped,
+      any other failure raises
+    * cache -- consulted before going to the network, stores every dated response
+    """
+
+    if cache:
+        cached_payload = cache.get(day, based_currency)
+        if cached_payload:
+            metrics.count("cache_hits")
+            return cached_payload
+
+    endpoint = f"currencies/{based_currency}.json"
+    request_date = day.strftime("%Y.%-m.%-d")  # convert to str (request format)
+    url = request_url(request_date, endpoint)
+    req = http_client.get(url)
+    if req.status_code != 200:
+        metrics.count("fallback_days", labels={"base": based_currency})
+        first_status = req.status_code
+        day = day - timedelta(days=1)
+        if cache:
+            cached_payload = cache.get(day, based_currency)
+            if cached_payload:
+                metrics.count("cache_hits")
+                return cached_payload
+        last_request_date = day.strftime("%Y.%-m.%-d")
+        url = request_url(last_request_date, endpoint)
+        req = http_client.get(url)
+        if (first_status, req.status_code) == (404, 404):
+            update_currency.warning(
+                f"No {based_currency} rates for {request_date} nor the day before, skipped"
+            )
+            metrics.count("unavailable_days", labels={"base": based_currency})
+            return None
+        if req.status_code != 200:
+            raise Exception(f"Request Failed: {url}")
+
+    with metrics.timer("parse"):
+        payload = req.json()
+    if cache:
+        cache.put(day, based_currency, payload)
+    return payload
+
+
+def fetch_rates_frame(
+    days: list,
+    based_currency: str,
+    columns: list,
+    max_workers: Optional[int] = None,
+    cache: Optional[ResponseCache] = None,
+) -> pd.DataFrame:
+    """Return a DataFrame with a row for each day in days and the given columns.
+    * Currencies of the payloads not in columns are added after them (new codes in the API)
+    * Days unavailable in the API (see fetch_day) have no row
+    * Days are requested concurrently (max_workers, Default(settings.FETCH_MAX_WORKERS))
+    * cache -- optional ResponseCache consulted before each request
+    """
+
+    # Requests are I/O bound, a thread pool is enough to overlap them.
+    # executor.map keeps the days order and re-raises any request error.
+    max_workers = max_workers or settings.FETCH_MAX_WORKERS
+    with (
+        metrics.timer("fetch"),
+        http_client.get_client().reserve(max_workers),
+        ThreadPoolExecutor(max_workers=max_workers) as executor,
+    ):
+        payloads = list(executor.map(lambda day: fetch_day(day, based_currency, cache), days))
+
+    # Rates are collected in a preallocated matrix, the df is created once
+    with metrics.timer("transform"):
+        builder = RateFrameBuilder(columns, n_rows=len(days), add_new_columns=True)
+        for day, currencies_dict in zip(days, payloads):
+            if currencies_dict is not None:
+                builder.add(day, currencies_dict[based_currency])
+        return builder.to_frame()
+
+
+def fetch_rate_batches(
+    days: list,
+    based_currency: str,
+    columns: list,
+    batch_days: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    cache: Optional[ResponseCache] = None,
+) -> Iterator[pd.DataFrame]:
+    """Yield a DataFrame (see fetch_rates_frame) for each batch of batch_days days.
+    * Lazy: a batch is requested only when the previous one was consumed, one batch is held in memory
+    * batch_days -- Default(settings.ETL_BATCH_DAYS)
+    * Columns only grow: codes new in a batch are kept in the next ones
+    * Batches without any day available in the API are not yielded
+    """
+
+    days_iter = iter(days)
+    while batch := list(islice(days_iter, batch_days or settings.ETL_BATCH_DAYS)):
+        currency_df = fetch_rates_frame(batch, based_currency, columns, max_workers, cache)
+        if currency_df.empty:
+            continue
+        columns = currency_df.columns.tolist()
+        yield currency_df
+
+
 def get_currency_exchange(
-    db_path: str, table_name: str, based_currency: str, since_date: Optional[datetime] = None
+    db_path: str,
+    table_name: str,
+    based_currency: str,
+    since_date: Optional[datetime] = None,
+    max_workers: Optional[int] = None,
+    cache: Optional[ResponseCache] = None,
+    days: Optional[list] = None,
 ) -> pd.DataFrame:
     """Return a DataFrame with all exchange rates for 273 currencies.
 
@@ -76,113 +244,253 @@ def get_currency_exchange(
     (although the tables are created only for 'usd' and 'eur')
     since_date -- df will have a row for each day from "since date" to the current date.
     Default(identifies last date in db)
+    max_workers -- number of days requested concurrently. Default(settings.FETCH_MAX_WORKERS)
+    cache -- ResponseCache consulted before going to the network. Default(no cache)
+    days -- exact days to fetch (see sync_planner), since_date is not used. Default(days after since_date)
     """
 
     t_start = perf_counter()  # time counter
-    # Retrieves the date of the last update in the table
-    if not since_date:
-        since_date = last_exchange_date(db_path, table_name)  # pragma: no cover
+    if days is None:
+        # Retrieves the date of the last update in the table
+        if not since_date:
+            since_date = last_exchange_date(db_path, table_name, based_currency)  # pragma: no cover
+        days = date_range(since_date)
 
-    if since_date and since_date.strftime("%Y-%m-%d") == datetime.today().strftime("%Y-%m-%d"):
+    if not days:
         update_currency.info("Last Date Updated equal to Today (No new Recoeds)")
         return pd.DataFrame()
 
-    currency_df = check_table(db_path, table_name)  # "Base df" with columns only
-
-    apiVersion = settings.API_VERSION
-    endpoint = f"currencies/{based_currency}.json"
-    row_counter = 0
-    request_date = None
-    currencies_dict = None
-    while request_date != datetime.today().strftime("%Y.%-m.%-d"):
-        since_date = since_date + timedelta(days=1)  # Sum one day
-        request_date = since_date.strftime("%Y.%-m.%-d")  # convert to str (request format)
-
-        url = f"https://cdn.jsdelivr.net/npm/@fawazahmed0/currency-api@{request_date}/{apiVersion}/{endpoint}"
-        req = requests.get(url)
-        # data is missing for a few days, in these cases we will take the value of the previous day
-        if req.status_code != 200:
-            last_request_date = (since_date - timedelta(days=1)).strftime(
-                "%Y.%-m.%-d"
-            )  # convert to str (request format)
-            url = (
-                "https://cdn.jsdelivr.net/npm/@fawazahmed0/"
-                f"currency-api@{last_request_date}/{apiVersion}/{endpoint}"
-            )
-            req = requests.get(url)
-            if req.status_code != 200:
-                raise Exception(f"Request Failed: {url}")
-            else:
-                currencies_dict = req.json()  # pragma: no cover
-        else:
-            currencies_dict = req.json()
+    columns = table_columns(db_path, table_name)
 
-        # Creates a list with the correct values of each currency for each column
-        currency_values_list = [request_date]  # first col refers to request date
-        for col in currency_df.columns[1:]:
-            currency_value = currencies_dict.get(based_currency).get(col)
-            if not currency_value:
-                currency_values_list.append(np.nan)
-            else:
-                currency_values_list.append(currency_value)
-
-        currency_df.loc[row_counter] = currency_values_list
-        row_counter += 1
+    max_workers = max_workers or settings.FETCH_MAX_WORKERS
+    currency_df = fetch_rates_frame(days, based_currency, columns, max_workers, cache)
 
     t_end = perf_counter()
     update_currency.info(
         f"Df generated for {based_currency} based currency "
-        f"with {len(currency_df)} recorded days.\n{t_end - t_start:.2f}s"
+        f"with {len(currency_df)} recorded days ({max_workers} workers).\n{t_end - t_start:.2f}s"
     )
 
     return currency_df
 
 
-def check_table(db_path: str, table_name: str) -> pd.DataFrame:
-    """Return 1 row sample of table.
-    * Create table from scratch if not exist.
+def table_columns(db_path: str, table_name: str) -> list:
+    """Return the columns (exchange_date + currency codes) of a based currency table.
+    * The long storage backend has no table per based currency, all currencies in the catalog are used
     """
-    try:
-        conn_lite = sqlite3.connect(db_path)
-        query = f"SELECT * FROM {table_name} limit 1"
-        df = pd.read_sql_query(query, conn_lite)
-    except Exception:
-        df = create_table_currency_exchange(db_path=db_path, table_name=table_name)
-        update_currency.debug(Exception)
 
-    return df
+    if settings.STORAGE_BACKEND == "long":
+        return ["exchange_date"] + catalog_codes(db_path)
+    return check_table(db_path, table_name).columns.tolist()  # "Base df" with columns only
 
 
-def insert_df_sqlite(df: pd.DataFrame, db_path: str, table_name: str) -> None:
-    """Insert a df into the specified db and table."""
+def check_table(db_path: str, table_name: str) -> pd.DataFrame:
+    """Return an empty df with the columns of table.
+    * Columns are read once per process (currency_catalog.table_schema), later calls run no query
+    * Create table from scratch if not exist.
+    """
 
-    table_sample = check_table(db_path, table_name)
-    # Loc only cols that alredy exists
-    table_sample_cols = table_sample.columns.tolist()
-    df = df.loc[:, table_sample_cols]
+    columns = currency_catalog.table_schema(db_path, table_name)
+    if not columns:
+        return create_table_currency_exchange(db_path=db_path, table_name=table_name)
+    return pd.DataFrame(columns=columns)
 
-    conn_lite = sqlite3.connect(db_path)
-    df.to_sql(name=table_name, con=conn_lite, if_exists="append", index=False, method="multi")
-    conn_lite.close()
-    update_currency.info(f"{len(df)} rows inserted in db: {db_path} table: {table_name}")
 
+def insert_df_sqlite(
+    df: pd.DataFrame, db_path: str, table_name: str, based_currency: Optional[str] = None
+) -> None:
+    """Insert a df into the specified db and table.
+    * Idempotent: rows of dates already stored are updated (upsert on the unique exchange_date index)
+    * Currencies not in the table yet get a new column, first/last seen dates are kept in the catalog
+    * based_currency -- identifies the rates in the long storage backend (table_name is not used),
+      in the monthly aggregates and in the columnar files (months of df refreshed and exported)
+    """
 
-def run(db_path: str, based_currency: str, table_prefix: str) -> None:
+    deduped_dates: list = []
+    with metrics.timer("db_write"):
+        if settings.STORAGE_BACKEND == "long":
+            long_store.insert_wide_df(df, db_path, str(based_currency))
+        else:
+            table_sample_cols = check_table(db_path, table_name).columns.tolist()
+            new_codes = [col for col in df.columns if col not in table_sample_cols]
+            if new_codes:
+                # Currencies added to the API after the table was created
+                currency_catalog.add_columns(db_path, table_name, new_codes)
+                table_sample_cols = currency_catalog.table_schema(db_path, table_name)
+            df = df.reindex(columns=table_sample_cols)
+
+            # Tables created before the unique index are deduplicated and indexed once
+            with db.connection(db_path) as conn_lite:
+                deduped_dates = migrations.ensure_unique_dates(conn_lite, table_name)
+            bulk_write.insert_df(df, db_path, table_name, conflict_key="exchange_date")
+            update_currency.info(f"{len(df)} rows upserted in db: {db_path} table: {table_name}")
+        currency_catalog.record_seen(db_path, df)
+    metrics.count("rows_written", len(df), {"base": based_currency or table_name})
+
+    if based_currency:
+        months = monthly_agg.months_of(df.exchange_date.tolist() + deduped_dates)
+        rates_table = None if settings.STORAGE_BACKEND == "long" else table_name
+        with metrics.timer("aggregate"):
+            monthly_agg.refresh(db_path, based_currency, months, rates_table)
+        if settings.COLUMNAR_EXPORT_FORMAT:
+            # Exported with each committed batch: batches of a failed run are in no later sync plan
+            with metrics.timer("columnar_export"):
+                columnar_store.export_table(
+                    db_path,
+                    based_currency,
+                    rates_table,
+                    settings.COLUMNAR_EXPORT_DIR,
+                    settings.COLUMNAR_EXPORT_FORMAT,
+                    months,
+                )
+
+
+def run(
+    db_path: str,
+    based_currency: str,
+    table_prefix: str,
+    cache: Optional[ResponseCache] = None,
+    days: Optional[list] = None,
+    batch_days: Optional[int] = None,
+    on_commit: Optional[Callable[[str, pd.DataFrame], None]] = None,
+) -> None:
     """Update table for especified based_currency.
     * Create table and update if table not exist.
+    * days -- days missing in the table (see sync_planner). Default(days after the last date)
+    * Days are fetched and committed by batches (batch_days, Default(settings.ETL_BATCH_DAYS)):
+      a failure only loses the current batch, the next run plans the days not committed yet
+    * on_commit -- called with (based_currency, batch df) once each batch is committed
     """
 
+    t_start = perf_counter()  # time counter
     table_name = table_prefix + "_based_currency"
+    if days is None:
+        days = date_range(last_exchange_date(db_path, table_name, based_currency))  # pragma: no cover
+    if not days:
+        update_currency.info("Last Date Updated equal to Today (No new Recoeds)")
+        return
+
+    columns = table_columns(db_path, table_name)
+    committed = 0
+    for currency_df in fetch_rate_batches(days, based_currency, columns, batch_days, cache=cache):
+        insert_df_sqlite(
+            df=currency_df, db_path=db_path, table_name=table_name, based_currency=based_currency
+        )
+        if on_commit:
+            on_commit(based_currency, currency_df)
+        committed += len(currency_df)
+        update_currency.info(
+            f"{based_currency}: {committed}/{len(days)} days committed, "
+            f"last batch up to {currency_df.exchange_date.iloc[-1]}.\n{perf_counter() - t_start:.2f}s"
+        )
+
+
+def cross_rate_drift(
+    derived_df: pd.DataFrame, based_currency: str, cache: Optional[ResponseCache] = None
+) -> dict:
+    """Fetch a sample of days for based_currency and return the drift of derived_df rates."""
+
+    days = sample_days(derived_df.exchange_date.tolist(), settings.CROSS_RATE_DRIFT_SAMPLE)
+    if not days:
+        return {}
+    fetched_df = fetch_rates_frame(
+        [datetime.strptime(day, "%Y-%m-%d") for day in days],
+        based_currency,
+        derived_df.columns.tolist(),
+        cache=cache,
+    )
+    drift_report = measure_drift(derived_df, fetched_df)
+    update_currency.info(f"Cross-rate drift for {based_currency} based currency: {drift_report}")
+
+    return drift_report
+
+
+def run_cross_rate(
+    db_path: str,
+    based_currency_mapping: dict,
+    anchor_currency: str,
+    cache: Optional[ResponseCache] = None,
+    sync_plan: Optional[dict] = None,
+    on_commit: Optional[Callable[[str, pd.DataFrame], None]] = None,
+) -> dict:
+    """Update every table in based_currency_mapping from a single anchor payload per day.
+    * Other based tables are derived by division, see cross_rate.derive_base_frame
+    * sync_plan -- {based_currency: missing days}. Default(sync_planner.plan)
+    * Anchor days are fetched by batches (settings.ETL_BATCH_DAYS), each batch is committed in every table
+    * on_commit -- called with (based_currency, batch df) once each batch is committed in a table
+    * Return the drift report of each derived based currency
+    """
 
-    # Update data
-    currency_df = get_currency_exchange(db_path=db_path, table_name=table_name, based_currency=based_currency)
-    # Update DB
-    if not currency_df.empty:  # Update only if there are new values
-        insert_df_sqlite(df=currency_df, db_path=db_path, table_name=table_name)  # pragma: no cover
-
-
-def etl_pipeline(based_currency_mapping: dict, db_path: str) -> None:
-    """Run ETL pipeline to update db."""
+    if anchor_currency not in based_currency_mapping:
+        raise ValueError(f"Anchor currency {anchor_currency} must be in {based_currency_mapping}")
+
+    table_names = {
+        currency: prefix + "_based_currency" for currency, prefix in based_currency_mapping.items()
+    }
+    sync_plan = sync_plan if sync_plan is not None else sync_planner.plan(db_path, based_currency_mapping)
+    # A single request per day missing in any table
+    days = sync_planner.union_days(sync_plan)
+    if not days:
+        return {}
+    missing = {
+        currency: {day.strftime("%Y-%m-%d") for day in currency_days}
+        for currency, currency_days in sync_plan.items()
+    }
+    columns = {currency: table_columns(db_path, table_name) for currency, table_name in table_names.items()}
+
+    drift_reports: dict = {}
+    # Each anchor batch is split and committed in every table before the next batch is fetched
+    for anchor_df in fetch_rate_batches(days, anchor_currency, columns[anchor_currency], cache=cache):
+        for currency, table_name in table_names.items():
+            new_rows = anchor_df.loc[anchor_df.exchange_date.isin(missing[currency])]
+            if new_rows.empty:
+                continue
+            if currency != anchor_currency:
+                # Codes new in the anchor payloads are derived as well
+                columns[currency] = list(dict.fromkeys(columns[currency] + anchor_df.columns.tolist()))
+                new_rows = derive_base_frame(new_rows, currency, columns[currency])
+                if currency not in drift_reports:  # Sampled once, in the first batch
+                    drift_reports[currency] = cross_rate_drift(new_rows, currency, cache)
+            insert_df_sqlite(df=new_rows, db_path=db_path, table_name=table_name, based_currency=currency)
+            if on_commit:
+                on_commit(currency, new_rows)
+
+    return drift_reports
+
+
+def etl_pipeline(
+    based_currency_mapping: dict,
+    db_path: str,
+    anchor_currency: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    on_commit: Optional[Callable[[str, pd.DataFrame], None]] = None,
+) -> None:
+    """Run ETL pipeline to update db.
+    * Only days missing in each table are fetched (sync_planner), gaps of the last year included
+    * anchor_currency -- enables the cross-rate mode. Default(settings.CROSS_RATE_ANCHOR)
+    * since/until -- backfill range (inclusive). Default(see sync_planner.plan)
+    * on_commit -- called with (based_currency, batch df) once each batch is committed
+    """
 
-    for currency, table_prexix in based_currency_mapping.items():
-        run(db_path=db_path, based_currency=currency, table_prefix=table_prexix)
+    anchor_currency = anchor_currency or settings.CROSS_RATE_ANCHOR
+    # Dated responses are reused across runs, tables and bases
+    cache = response_cache.from_settings()
+    sync_plan = sync_planner.plan(db_path, based_currency_mapping, since, until)
+    if anchor_currency:
+        run_cross_rate(db_path, based_currency_mapping, anchor_currency, cache, sync_plan, on_commit)
+    else:
+        for currency, table_prexix in based_currency_mapping.items():
+            run(
+                db_path=db_path,
+                based_currency=currency,
+                table_prefix=table_prexix,
+                cache=cache,
+                days=sync_plan[currency],
+                on_commit=on_commit,
+            )
+    update_currency.info(f"HTTP stats: {http_client.get_client().stats()}")
+    if cache:
+        update_currency.info(f"Response cache stats: {cache.stats()}")
+    update_currency.info(f"DB connection stats: {db.get_pool().stats()}")
+    db.get_pool().close_all()
@@ -9,11 +9,81 @@ logging.basicConfig(
 )
 
 API_VERSION = "v1"
+# Currency API root, requests are made to {API_BASE_URL}@{date}/{API_VERSION}/{endpoint}
+API_BASE_URL = "https://cdn.jsdelivr.net/npm/@fawazahmed0/currency-api"
+# Max number of days requested concurrently (1 = sequential requests)
+FETCH_MAX_WORKERS = 8
+# Days fetched and committed together, reruns resume after the last committed batch
+# (memory is bounded by one batch whatever the length of the range)
+ETL_BATCH_DAYS = 30
+# HTTP client (src/modules/http_client.py)
+# (connect, read) timeouts in seconds
+HTTP_TIMEOUT = (3.05, 20.0)
+# Retries for 429/5xx and connection errors, waiting up to
+# HTTP_BACKOFF_FACTOR * 2**attempt seconds (full jitter, capped by HTTP_BACKOFF_MAX)
+HTTP_MAX_RETRIES = 4
+HTTP_BACKOFF_FACTOR = 0.5
+HTTP_BACKOFF_MAX = 30.0
+# Number of hosts kept in the pool and keep-alive connections per host
+HTTP_POOL_CONNECTIONS = 4
+HTTP_POOL_MAXSIZE = FETCH_MAX_WORKERS
+# Local cache of dated API responses (src/modules/response_cache.py), None to disable
+RESPONSE_CACHE_DIR = "src/cache/responses"
+# Least recently used responses are evicted above this size (bytes, compressed)
+RESPONSE_CACHE_MAX_BYTES = 512 * 1024**2
 # SqlLite db path
 DB_PATH = "src/database/currency_exchange_db.db"
+# Storage layout:
+# "wide" -> one {table_prefix}_based_currency table per based currency, one column per currency
+# "long" -> single currency_rate (base, quote, exchange_date, rate) table (src/modules/long_store.py)
+STORAGE_BACKEND = "wide"
+# Bulk writes (src/modules/bulk_write.py): rows per executemany call, all batches share one transaction
+SQLITE_BATCH_SIZE = 1000
+# Pragmas applied once to every pooled connection (src/modules/db.py)
+SQLITE_JOURNAL_MODE = "WAL"
+SQLITE_SYNCHRONOUS = "NORMAL"
+# Seconds a writer waits for the db lock held by another connection
+SQLITE_BUSY_TIMEOUT = 30.0
+# Columnar copy of the rate history (src/modules/columnar_store.py), one file per based currency and month
+# written after each ETL run: "parquet", "arrow" (Arrow IPC, memory-mapped by readers) or None to disable
+COLUMNAR_EXPORT_FORMAT = None
+COLUMNAR_EXPORT_DIR = "src/cache/columnar"
+# Read the report rates from the columnar files instead of the db (needs COLUMNAR_EXPORT_FORMAT)
+REPORT_READ_COLUMNAR = False
+# Run metrics (src/modules/metrics.py) written by main.py and the CLI after each run, None to disable
+# JSON run summary: time per stage (fetch, parse, transform, db_write, aggregate, db_read, stats, render,
+# xlsx_write), HTTP requests/bytes/latency histogram, fallback days and rows written
+METRICS_JSON_PATH = "src/reports/run_metrics.json"
+# Prometheus textfile, e.g. "/var/lib/node_exporter/textfile_collector/currency_exchange.prom"
+METRICS_TEXTFILE_PATH = None
+# main.run overlaps the ETL and the report (main.run_pipelined): charts of a base are rendered in a process
+# pool while the next bases are fetched, the report gets the synced rates in memory (no db reread)
+PIPELINED_RUN = True
 # Add new tables with different based currency here
 # Expected format -> {based_currency:table_prefix}
 BASED_CURRENCY_MAPPING = {"usd": "dollar", "eur": "euro"}
+# Cross-rate mode: fetch only the anchor based rates each day and derive every other table
+# in BASED_CURRENCY_MAPPING by division (rate_X/base = rate_X/anchor / rate_base/anchor).
+# None -> fetch each based currency. The anchor must be a key of BASED_CURRENCY_MAPPING
+CROSS_RATE_ANCHOR = None
+# Days fetched for real for each derived table, to report the drift of derived rates
+CROSS_RATE_DRIFT_SAMPLE = 3
 # Add new currency to the Excel report here
 # Each currency generate a tab in the report
 REPORT_CURRENCY_LIST = ["dkk", "brl", "jpy", "gbp", "cny"]
+# Days of history loaded for the report, counted back from the last date in the table
+# (last 13 months in the charts and "Last Year Range" in the tables)
+REPORT_LOOKBACK_DAYS = 400
+# Hold the report rates in a RateCube (src/modules/rate_cube.py) instead of one DataFrame per base
+REPORT_RATE_CUBE = False
+# Rates dtype of RateCube: "float32" (half the memory, 7 significant digits) or "float64"
+RATE_CUBE_DTYPE = "float32"
+# Report render cache (src/modules/render_cache.py), None to disable: charts (PNG) and tables of each tab
+# keyed by (currency, base, data window fingerprint, style version), tabs whose rates did not change
+# are not recomputed. Least recently used entries are evicted above REPORT_CACHE_MAX_BYTES
+REPORT_CACHE_DIR = "src/cache/report"
+REPORT_CACHE_MAX_BYTES = 128 * 1024**2
+# Render report charts in a process pool (matplotlib Agg backend)
+REPORT_PARALLEL_RENDER = False
+# Render processes, None -> one per core
+REPORT_RENDER_WORKERS = None
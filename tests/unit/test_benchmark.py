@@ -0,0 +1,111 @@
+# Standard library
+import unittest
+from unittest.mock import Mock, patch
+
+# Third party
+import pandas as pd
+
+# First party
+from src import settings
+from src.modules import benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_transform_paths_match(self)-> None:
+        """Baseline and builder transforms must produce the same frame.
+        """
+
+        columns, days, rates = benchmark.synthetic_payloads(n_days=5, n_currencies=10)
+        pd.testing.assert_frame_equal(
+            benchmark.loc_append_frame(columns, days, rates).astype({col: float for col in columns[1:]}),
+            benchmark.builder_frame(columns, days, rates)
+            )
+
+    def test_bench_transform(self)-> None:
+        """Benchmark result has both timings.
+        """
+
+        result = benchmark.bench_transform(n_days=5, n_currencies=10, repeat=1)
+        self.assertEqual(result["scenario"], "transform")
+        self.assertGreater(result["loc_append_s"], 0)
+        self.assertGreater(result["builder_s"], 0)
+
+    def test_bench_report_render(self)-> None:
+        """Serial and parallel report generation are both timed.
+        """
+
+        results = benchmark.bench_report_render(tab_counts=(2,), render_workers=2)
+        self.assertEqual(results[0]["tabs"], 2)
+        self.assertGreater(results[0]["serial_s"], 0)
+        self.assertGreater(results[0]["parallel_s"], 0)
+
+    def test_bench_window_stats(self)-> None:
+        """Baseline ranges match the vectorized ones, both are timed.
+        """
+
+        currency_df, _ = benchmark.synthetic_report_tables(n_currencies=3, n_days=50)
+        currency_list = ["c000", "c001", "c002"]
+        stats_df = benchmark.rate_stats.window_stats(currency_df, currency_list)
+        self.assertEqual(
+            benchmark.slice_window_ranges(currency_df, currency_list),
+            list(zip(stats_df["min"], stats_df["max"]))
+            )
+        result = benchmark.bench_window_stats(n_currencies=3, n_days=50, repeat=1)
+        self.assertGreater(result["slices_s"], 0)
+        self.assertGreater(result["vectorized_s"], 0)
+
+    def test_bench_bulk_insert(self)-> None:
+        """Both insert paths are timed for each size.
+        """
+
+        results = benchmark.bench_bulk_insert(years=(1,), n_currencies=5, repeat=1)
+        self.assertEqual(results[0]["rows"], 365)
+        self.assertGreater(results[0]["to_sql_s"], 0)
+        self.assertGreater(results[0]["bulk_s"], 0)
+
+    def test_run_all(self)-> None:
+        """Results of the selected benchmarks are returned in order, with the environment.
+        """
+
+        benchmarks = {
+            "transform": Mock(return_value={"scenario": "transform"}),
+            "sync": Mock(return_value=[{"scenario": "cold_backfill"}, {"scenario": "incremental_sync"}]),
+            }
+        with patch.dict(benchmark.BENCHMARKS, benchmarks, clear=True):
+            results = benchmark.run_all()
+            self.assertEqual(
+                [result["scenario"] for result in results["results"]],
+                ["transform", "cold_backfill", "incremental_sync"]
+                )
+            self.assertEqual(results["environment"]["pandas"], pd.__version__)
+            self.assertEqual(len(benchmark.run_all(["sync"])["results"]), 2)
+        self.assertEqual(benchmarks["transform"].call_count, 1)
+
+    def test_bench_sync(self)-> None:
+        """Cold backfill then a one day sync against the stub API, failed requests are retried.
+        """
+
+        cold_backfill, incremental_sync = benchmark.bench_sync(n_days=20, n_currencies=5, latency=0, error_rate=0.3)
+        self.assertEqual(cold_backfill["days"], 20)
+        # Each day once, the currency list, and the retries
+        self.assertEqual(cold_backfill["requests"], 20 + 1 + cold_backfill["retries"])
+        self.assertGreater(cold_backfill["retries"], 0)
+        self.assertEqual(incremental_sync["requests"] - incremental_sync["retries"], 1)
+        self.assertEqual(settings.API_BASE_URL, "https://cdn.jsdelivr.net/npm/@fawazahmed0/currency-api")
+
+    def test_bench_memory_peak(self)-> None:
+        """Peak memory is measured for both batch sizes.
+        """
+
+        result = benchmark.bench_memory_peak(n_days=10, n_currencies=5, batch_days=2)
+        self.assertGreater(result["batched_peak_mb"], 0)
+        self.assertGreater(result["single_batch_peak_mb"], 0)
+
+    def test_bench_pipelined_run(self)-> None:
+        """Sequential and pipelined full runs are timed.
+        """
+
+        result = benchmark.bench_pipelined_run(n_days=3, n_currencies=5, report_currencies=1, latency=0)
+        self.assertEqual(result["report_currencies"], 1)
+        self.assertGreater(result["sequential_s"], 0)
+        self.assertGreater(result["pipelined_s"], 0)
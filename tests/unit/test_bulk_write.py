@@ -0,0 +1,57 @@
+# Standard library
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Third party
+import numpy as np
+import pandas as pd
+
+# First party
+from src import settings
+from src.modules import bulk_write, db
+
+
+class TestBulkWrite(unittest.TestCase):
+    def setUp(self):
+        """Each test gets a db with an empty wide table.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "test.db")
+        self.table_sample = pd.read_csv("tests/unit/sample_data/usd_based_currency_sample.csv")
+        conn_lite = sqlite3.connect(self.db_path)
+        self.table_sample[:0].to_sql("dollar_based_currency", conn_lite, index=False)
+        conn_lite.close()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_insert_df(self)-> None:
+        """Rows are written in batches, NaN rates are stored as NULL.
+        """
+
+        df = pd.concat([self.table_sample] * 5, ignore_index=True)
+        df.loc[0, "brl"] = np.nan
+        with patch.object(settings, "SQLITE_BATCH_SIZE", 2):
+            self.assertEqual(bulk_write.insert_df(df, self.db_path, "dollar_based_currency"), len(df))
+
+        conn_lite = sqlite3.connect(self.db_path)
+        stored_df = pd.read_sql_query("SELECT * FROM dollar_based_currency", conn_lite)
+        (journal_mode,) = conn_lite.execute("PRAGMA journal_mode").fetchone()
+        conn_lite.close()
+        self.assertEqual(journal_mode, "wal")
+        pd.testing.assert_frame_equal(stored_df, df, check_dtype=False)
+
+    def test_write_rows_rollback(self)-> None:
+        """A failing batch rolls back the whole transaction.
+        """
+
+        conn_lite = db.ConnectionPool().get(self.db_path)
+        sql = bulk_write.insert_sql("dollar_based_currency", ["exchange_date", "brl"])
+        rows = [("2024-01-01", 5.0), ("2024-01-02", 5.1), ("2024-01-03",)]
+        self.assertRaises(sqlite3.ProgrammingError, bulk_write.write_rows, conn_lite, sql, rows, batch_size=2)
+        self.assertEqual(conn_lite.execute("SELECT count(*) FROM dollar_based_currency").fetchone(), (0,))
+        self.assertFalse(conn_lite.in_transaction)
+        conn_lite.close()
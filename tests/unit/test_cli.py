@@ -0,0 +1,108 @@
+# Standard library
+import io
+import json
+import os
+import runpy
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from datetime import datetime
+from unittest.mock import patch
+
+# First party
+from src import cli, settings
+
+
+@patch("src.cli.metrics.export")
+@patch.object(settings, "HTTP_POOL_MAXSIZE", settings.HTTP_POOL_MAXSIZE)
+@patch.object(settings, "FETCH_MAX_WORKERS", settings.FETCH_MAX_WORKERS)
+@patch.object(settings, "ETL_BATCH_DAYS", settings.ETL_BATCH_DAYS)
+@patch.object(settings, "RESPONSE_CACHE_DIR", settings.RESPONSE_CACHE_DIR)
+@patch.object(settings, "REPORT_PARALLEL_RENDER", settings.REPORT_PARALLEL_RENDER)
+@patch.object(settings, "REPORT_RENDER_WORKERS", settings.REPORT_RENDER_WORKERS)
+class TestCli(unittest.TestCase):
+    @patch("src.cli.update_currency_exchange.etl_pipeline")
+    def test_sync(self, mock_etl, mock_export)-> None:
+        """Sync runs only the ETL, with the bases, range and fetch options given.
+        """
+
+        self.assertEqual(cli.main(["sync"]), 0)
+        mock_etl.assert_called_with(settings.BASED_CURRENCY_MAPPING, settings.DB_PATH, None, since=None, until=None)
+
+        cli.main(
+            ["sync", "--base", "usd", "--base", "GBP:pound", "--base", "chf", "--db-path", "db_path",
+             "--workers", "16", "--batch-days", "7", "--cache-dir", "none", "--anchor", "usd", "--until", "2023-11-16"]
+            )
+        mock_etl.assert_called_with(
+            {"usd": "dollar", "gbp": "pound", "chf": "chf"}, "db_path", "usd", since=None, until=datetime(2023, 11, 16)
+            )
+        self.assertEqual(settings.FETCH_MAX_WORKERS, 16)
+        self.assertEqual(settings.HTTP_POOL_MAXSIZE, 16)
+        self.assertEqual(settings.ETL_BATCH_DAYS, 7)
+        self.assertFalse(settings.RESPONSE_CACHE_DIR)
+
+        cli.main(["sync", "--cache-dir", "cache_dir"])
+        self.assertEqual(settings.RESPONSE_CACHE_DIR, "cache_dir")
+        # Run summary written after each run
+        mock_export.assert_called_with(None, None)
+        self.assertEqual(mock_export.call_count, 3)
+
+    @patch("src.cli.update_currency_exchange.etl_pipeline")
+    def test_backfill(self, mock_etl, mock_export)-> None:
+        """Backfill requires a valid since date.
+        """
+
+        cli.main(["backfill", "--since", "2023-01-01", "--until", "2023-06-30", "--base", "eur"])
+        mock_etl.assert_called_with(
+            {"eur": "euro"}, settings.DB_PATH, None, since=datetime(2023, 1, 1), until=datetime(2023, 6, 30)
+            )
+        with redirect_stdout(io.StringIO()), patch("sys.stderr", io.StringIO()):
+            for argv in [["backfill"], ["backfill", "--since", "01/01/2023"], []]:
+                with self.assertRaises(SystemExit):
+                    cli.main(argv)
+        self.assertEqual(mock_etl.call_count, 1)
+
+    @patch("src.cli.create_report.report_pipeline")
+    def test_report(self, mock_report, mock_export)-> None:
+        """Report runs only the report, with the currencies, output and render workers given.
+        """
+
+        cli.main(["report"])
+        mock_report.assert_called_with(settings.REPORT_CURRENCY_LIST, settings.DB_PATH, output_dir="src/reports/")
+        self.assertFalse(settings.REPORT_PARALLEL_RENDER)
+
+        cli.main(["report", "--currency", "BRL", "--currency", "jpy", "--output", "/tmp", "--render-workers", "2"])
+        mock_report.assert_called_with(["brl", "jpy"], settings.DB_PATH, output_dir="/tmp")
+        self.assertTrue(settings.REPORT_PARALLEL_RENDER)
+        self.assertEqual(settings.REPORT_RENDER_WORKERS, 2)
+
+        cli.main(["report", "--metrics-json", "run.json", "--metrics-textfile", "run.prom"])
+        mock_export.assert_called_with("run.json", "run.prom")
+
+    @patch("src.cli.benchmark.run_all", return_value={"results": [{"scenario": "transform"}]})
+    def test_bench(self, mock_run_all, mock_export)-> None:
+        """Bench results are printed or written as JSON.
+        """
+
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            cli.main(["bench"])
+        self.assertEqual(json.loads(stdout.getvalue()), {"results": [{"scenario": "transform"}]})
+        mock_run_all.assert_called_with(None)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output = os.path.join(tmp_dir, "bench.json")
+            cli.main(["bench", "--scenario", "sync", "--scenario", "memory_peak", "--output", output])
+            with open(output) as f:
+                self.assertEqual(json.load(f), {"results": [{"scenario": "transform"}]})
+        mock_run_all.assert_called_with(["sync", "memory_peak"])
+        mock_export.assert_not_called()
+
+    @patch("src.cli.main", return_value=0)
+    def test_module_entry_point(self, mock_main, mock_export)-> None:
+        """python3 -m src exits with the status of cli.main.
+        """
+
+        with self.assertRaises(SystemExit) as exit_info:
+            runpy.run_module("src", run_name="__main__")
+        self.assertEqual(exit_info.exception.code, 0)
@@ -0,0 +1,119 @@
+# Standard library
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Third party
+import pandas as pd
+
+# First party
+from src import settings
+from src.modules import columnar_store, create_report, db, long_store, monthly_agg
+
+
+class TestColumnarStore(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Sample wide table (one duplicated date).
+        """
+        cls.dollar_based_table = pd.read_csv("tests/unit/sample_data/dollar_based_currency_full_table.csv")
+        cls.months = monthly_agg.months_of(cls.dollar_based_table.exchange_date)
+
+    def setUp(self):
+        """Each test gets a db with the sample table and an empty export dir.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "test.db")
+        self.export_dir = os.path.join(self.tmp_dir.name, "columnar")
+        conn_lite = sqlite3.connect(self.db_path)
+        self.dollar_based_table.to_sql("dollar_based_currency", conn_lite, index=False)
+        conn_lite.close()
+
+    def tearDown(self):
+        db.get_pool().close_all()
+        self.tmp_dir.cleanup()
+
+    def expected_df(self, columns: list, since: str) -> pd.DataFrame:
+        """Rates of the sample table from since (last row of each date).
+        """
+        expected_df = self.dollar_based_table.drop_duplicates("exchange_date", keep="last")
+        expected_df = expected_df[expected_df.exchange_date >= since].sort_values("exchange_date")
+        return expected_df[["exchange_date"] + columns].reset_index(drop=True)
+
+    def test_export_and_read(self)-> None:
+        """One file per month, readers get the same rates as the db (only the selected columns).
+        """
+
+        written = columnar_store.export(self.db_path, {"usd": "dollar"}, export_dir=self.export_dir, fmt="parquet")
+        self.assertEqual(written, {"usd": len(self.months)})
+        found = columnar_store.partitions(self.export_dir, "usd")
+        self.assertEqual([month for month, _ in found], self.months)
+        self.assertTrue(found[0][1].endswith(os.path.join("base=usd", "year=2022", "month=11", "part.parquet")))
+
+        read_df = columnar_store.read_columns("usd", ["brl", "jpy"], since="2023-06-15", export_dir=self.export_dir)
+        pd.testing.assert_frame_equal(read_df, self.expected_df(["brl", "jpy"], "2023-06-15"))
+        self.assertEqual(len(columnar_store.read_columns("usd", export_dir=self.export_dir).columns), 538)
+        self.assertEqual(columnar_store.last_exchange_date("usd", self.export_dir), "2023-11-16")
+        self.assertEqual(columnar_store.stored_columns("usd", self.export_dir)[:2], ["exchange_date", "00"])
+
+        # Only the months given are rewritten, in the new format
+        written = columnar_store.export(
+            self.db_path, {"usd": "dollar"}, {"usd": ["2023-11"]}, export_dir=self.export_dir, fmt="arrow"
+            )
+        self.assertEqual(written, {"usd": 1})
+        # Files being written are not read
+        open(found[0][1] + ".123.tmp", "w").close()
+        found = columnar_store.partitions(self.export_dir, "usd")
+        self.assertEqual(len(found), len(self.months))
+        self.assertTrue(found[-1][1].endswith("part.arrow"))
+        # Arrow IPC and Parquet partitions are read together, unknown columns are empty
+        read_df = columnar_store.read_columns("usd", ["brl", "zzz"], since="2023-10-01", export_dir=self.export_dir)
+        pd.testing.assert_frame_equal(read_df[["exchange_date", "brl"]], self.expected_df(["brl"], "2023-10-01"))
+        self.assertTrue(read_df.zzz.isna().all())
+        self.assertEqual(columnar_store.last_exchange_date("usd", self.export_dir), "2023-11-16")
+
+        self.assertRaises(
+            ValueError, columnar_store.export_table, self.db_path, "usd", None, self.export_dir, "csv"
+            )
+
+    def test_nothing_exported(self)-> None:
+        """Readers of a based currency without files get nothing.
+        """
+
+        self.assertIsNone(columnar_store.last_exchange_date("eur", self.export_dir))
+        self.assertEqual(columnar_store.stored_columns("eur", self.export_dir), [])
+        read_df = columnar_store.read_columns("eur", ["brl"], export_dir=self.export_dir)
+        self.assertEqual(read_df.columns.tolist(), ["exchange_date", "brl"])
+        self.assertTrue(read_df.empty)
+
+    def test_first_export_writes_every_month(self)-> None:
+        """Months given on the first export of a based currency are ignored, the history is exported.
+        """
+
+        with (patch.object(settings, "COLUMNAR_EXPORT_DIR", self.export_dir),
+              patch.object(settings, "COLUMNAR_EXPORT_FORMAT", "arrow")):
+            written = columnar_store.export(self.db_path, {"usd": "dollar"}, {"usd": ["2023-11"]})
+            self.assertEqual(written, {"usd": len(self.months)})
+            self.assertEqual(len(columnar_store.read_columns("usd", ["brl"])), len(self.expected_df([], "")))
+
+    def test_long_backend(self)-> None:
+        """Rates of the long table are pivoted to one column per quote.
+        """
+
+        long_store.insert_wide_df(self.dollar_based_table, self.db_path, "usd")
+        with patch.object(settings, "STORAGE_BACKEND", "long"):
+            columnar_store.export(self.db_path, {"usd": "dollar"}, export_dir=self.export_dir, fmt="parquet")
+        read_df = columnar_store.read_columns("usd", ["brl", "jpy"], export_dir=self.export_dir)
+        pd.testing.assert_frame_equal(read_df, self.expected_df(["brl", "jpy"], ""))
+
+    def test_report_reads_columnar_files(self)-> None:
+        """The report reads the same window from the columnar files as from the db.
+        """
+
+        columnar_store.export(self.db_path, {"usd": "dollar"}, export_dir=self.export_dir, fmt="arrow")
+        with patch.object(settings, "COLUMNAR_EXPORT_DIR", self.export_dir):
+            report_df = create_report.report_columnar_df("usd", ["dkk", "brl", "dkk"])
+        db_df = create_report.report_table_df(self.db_path, "dollar_based_currency", ["dkk", "brl"])
+        pd.testing.assert_frame_equal(report_df, db_df.drop_duplicates("exchange_date", keep="last").reset_index(drop=True))
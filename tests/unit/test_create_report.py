@@ -1,16 +1,24 @@
 # Standard library
+import gc
 import os
+import sqlite3
+import tempfile
 import unittest
+import weakref
 from datetime import datetime
 from unittest.mock import Mock, patch
 
 # Third party
+import matplotlib.pyplot as plt
 import pandas as pd
 
 # First party
-from src.modules import create_report
+from src import settings
+from src.modules import create_report, db, monthly_agg
+from src.modules.render_cache import RenderCache
 
 
+@patch.object(settings, "REPORT_CACHE_DIR", None)
 class TestCreateReport(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -23,9 +31,10 @@ class TestCreateReport(unittest.TestCase):
             "tests/unit/sample_data/euro_based_currency_full_table.csv"
             ) 
         
-    @patch("src.modules.create_report.complete_table_df")
+    @patch("src.modules.create_report.monthly_agg.read_monthly")
+    @patch("src.modules.create_report.report_table_df")
     @patch("src.modules.create_report.generate_excel_report")
-    def test_report_pipelinee(self,m1,m2)-> None:
+    def test_report_pipelinee(self,m1,m2,m3)-> None:
         """Mock everything just to ensure that new features will be tested,
         * Mocked funcs will be tested individually later.
         """
@@ -33,6 +42,59 @@ class TestCreateReport(unittest.TestCase):
         result = create_report.report_pipeline('mock_currency_list', 'mock_db_path')
         self.assertTrue(result)
 
+    @patch("src.modules.create_report.monthly_agg.read_monthly", Mock())
+    @patch("src.modules.create_report.long_store.last_exchange_date", Mock(return_value="2024-02-18"))
+    @patch("src.modules.create_report.long_store.read_wide")
+    @patch("src.modules.create_report.generate_excel_report")
+    def test_report_pipeline_long_backend(self, m1, mock_read_wide)-> None:
+        """Long storage backend reads wide frames from currency_rate.
+        """
+
+        with patch.object(settings, "STORAGE_BACKEND", "long"):
+            result = create_report.report_pipeline('mock_currency_list', 'mock_db_path')
+        self.assertTrue(result)
+        self.assertEqual([call.args[1] for call in mock_read_wide.call_args_list], ["usd", "eur"])
+        self.assertEqual(mock_read_wide.call_args.kwargs["since"], "2023-01-14")
+
+    @patch("src.modules.create_report.monthly_agg.read_monthly", Mock())
+    @patch("src.modules.create_report.report_columnar_df")
+    @patch("src.modules.create_report.generate_excel_report")
+    def test_report_pipeline_columnar(self, m1, mock_report_columnar_df)-> None:
+        """With REPORT_READ_COLUMNAR rates are read from the columnar files.
+        """
+
+        with patch.object(settings, "REPORT_READ_COLUMNAR", True):
+            result = create_report.report_pipeline(['brl'], 'mock_db_path')
+        self.assertTrue(result)
+        self.assertEqual([call.args for call in mock_report_columnar_df.call_args_list], [("usd", ["brl"]), ("eur", ["brl"])])
+
+    def test_report_table_df(self)-> None:
+        """Only exchange_date, the report currencies and the report window are loaded.
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = tmp_dir + "/test.db"
+            conn_lite = sqlite3.connect(db_path)
+            self.dollar_based_table.to_sql("dollar_based_currency", conn_lite, index=False)
+            conn_lite.close()
+
+            report_df = create_report.report_table_df(db_path, "dollar_based_currency", ["dkk", "brl", "dkk"])
+            self.assertEqual(report_df.columns.tolist(), ["exchange_date", "dkk", "brl"])
+            self.assertGreaterEqual(report_df.exchange_date.min(), create_report.window_start("2023-11-16"))
+            self.assertEqual(report_df.exchange_date.max(), "2023-11-16")
+
+            report_df = create_report.report_table_df(db_path, "dollar_based_currency", ["brl"], since="2023-06-01")
+            self.assertEqual(report_df.exchange_date.min(), "2023-06-01")
+            self.assertTrue(report_df.exchange_date.is_monotonic_increasing)
+
+            report_df = create_report.report_table_df(db_path, "dollar_based_currency", ["brl"], since="")
+            self.assertEqual(len(report_df), len(self.dollar_based_table))
+
+            self.assertRaises(
+                ValueError, create_report.report_table_df, db_path, "dollar_based_currency", ["not_a_currency"]
+                )
+        self.assertEqual(create_report.window_start(None), "")
+
     def test_generate_excel_report(self)-> None:
         """Test Excel report generation, generate_excel_report().
         """
@@ -41,6 +103,62 @@ class TestCreateReport(unittest.TestCase):
 
         file_path = "Exchange Rate Report " + datetime.today().strftime("%Y-%d-%m") + ".xlsx"
         self.assertIn(file_path,os.listdir())
+        # Charts go through memory, no temporary images
+        self.assertFalse([f for f in os.listdir() if f.endswith(".png")])
+
+    def test_generate_excel_report_parallel(self)-> None:
+        """Charts rendered in a process pool are embedded from memory.
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            create_report.generate_excel_report(
+                self.dollar_based_table,
+                self.euro_based_table,
+                ["dkk", "brl"],
+                file_path=tmp_dir + "/",
+                parallel_render=True,
+                render_workers=2
+                )
+            self.assertEqual(len(os.listdir(tmp_dir)), 1)
+            self.assertFalse([f for f in os.listdir() if f.endswith(".png")])
+
+    def test_monthly_summary_from_monthly_agg(self)-> None:
+        """Stored aggregates give the same summary as grouping the daily rates.
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = tmp_dir + "/test.db"
+            conn_lite = sqlite3.connect(db_path)
+            # A month without rates is kept in the summary
+            self.dollar_based_table[
+                ~self.dollar_based_table.exchange_date.str.startswith("2023-05")
+                ].to_sql("dollar_based_currency", conn_lite, index=False)
+            conn_lite.close()
+            monthly_agg.rebuild(db_path, {"usd": "dollar"})
+            monthly_df = monthly_agg.read_monthly(db_path, "usd", ["brl", "dkk"])
+            daily_df = pd.read_sql_query("SELECT * FROM dollar_based_currency", sqlite3.connect(db_path))
+
+        stored_summary = create_report.monthly_summary(daily_df, "brl", monthly_df)
+        self.assertTrue(stored_summary.loc["2023-05-31"].isna()["mean"])
+        pd.testing.assert_frame_equal(
+            stored_summary, create_report.monthly_summary(daily_df, "brl"), check_freq=False
+            )
+        # Currencies missing from the aggregates fall back to the daily rates
+        self.assertEqual(len(create_report.monthly_summary(daily_df, "eur", monthly_df)), 13)
+        # So do aggregates missing older months (db written before monthly_agg, not rebuilt)
+        partial_summary = create_report.monthly_summary(daily_df, "brl", monthly_df[monthly_df.month >= "2023-10"])
+        pd.testing.assert_frame_equal(partial_summary, create_report.monthly_summary(daily_df, "brl"))
+
+    def test_render_chart_png(self)-> None:
+        """Render worker returns PNG bytes and closes its figure.
+        """
+
+        n_figures = len(plt.get_fignums())
+        grouped_df = create_report.monthly_summary(self.dollar_based_table, "brl")
+        png = create_report.render_chart_png(grouped_df, "brl", "Brl", "Dollar")
+        self.assertTrue(png.startswith(b"\x89PNG"))
+        self.assertEqual(len(grouped_df), 13)
+        self.assertEqual(len(plt.get_fignums()), n_figures)
 
     def test_specific_info_df(self)-> None:
         """
@@ -54,3 +172,123 @@ class TestCreateReport(unittest.TestCase):
 
         self.assertEqual(currency_name,"Dkk")
         self.assertEqual(infos_df["Dollar Based Rate"]["Last Year Range"],"6.62 - 7.25")
+
+    def test_render_chart_png(self)-> None:
+        """Charts are returned as PNG bytes, every figure is closed, the df is not modified.
+        """
+
+        euro_df = self.euro_based_table.copy()
+        n_figures = len(plt.get_fignums())
+        with patch("src.modules.create_report.plot_monthly_summary", wraps=create_report.plot_monthly_summary) as m:
+            png = create_report.render_chart_png(*create_report.chart_args(euro_df, "brl", "Euro"))
+        self.assertTrue(png.startswith(b"\x89PNG"))
+        self.assertEqual(m.call_args.args[2:], ("Brl", "Euro"))
+        self.assertEqual(len(plt.get_fignums()), n_figures)
+        pd.testing.assert_frame_equal(euro_df, self.euro_based_table)
+
+    def test_report_with_rate_cube(self)-> None:
+        """Report functions take single base RateCubes in place of the wide frames.
+        """
+
+        with (tempfile.TemporaryDirectory() as tmp_dir,
+              patch.object(settings, "REPORT_RATE_CUBE", True)):
+            db_path = tmp_dir + "/test.db"
+            conn_lite = sqlite3.connect(db_path)
+            self.dollar_based_table.to_sql("dollar_based_currency", conn_lite, index=False)
+            self.euro_based_table.to_sql("euro_based_currency", conn_lite, index=False)
+            conn_lite.close()
+            dollar_cube, euro_cube, monthly_dfs = create_report.load_report_data(["dkk", "brl"], db_path)
+            db.get_pool().close_all()
+            self.assertEqual((dollar_cube.bases, euro_cube.quotes), (["usd"], ["dkk", "brl"]))
+
+            infos_df, currency_name = create_report.specific_info_df(dollar_cube, euro_cube, "dkk")
+            self.assertEqual(currency_name, "Dkk")
+            self.assertEqual(infos_df["Dollar Based Rate"]["Last Year Range"], "6.62 - 7.25")
+            self.assertEqual(infos_df.index.name, "2023-16-11")
+
+            # Daily rates of the cube give the same monthly summary (the cube keeps one row per date)
+            pd.testing.assert_frame_equal(
+                create_report.monthly_summary(dollar_cube, "brl"),
+                create_report.monthly_summary(self.dollar_based_table.drop_duplicates("exchange_date", keep="last"), "brl"),
+                check_dtype=False, check_freq=False, rtol=1e-6
+                )
+            with patch("src.modules.create_report.plot_monthly_summary", wraps=create_report.plot_monthly_summary) as m:
+                create_report.render_chart_png(*create_report.chart_args(euro_cube, "brl", "Euro"))
+            self.assertEqual(m.call_args.args[2:], ("Brl", "Euro"))
+
+            cache = RenderCache(tmp_dir + "/cache", settings.REPORT_CACHE_MAX_BYTES)
+            create_report.generate_excel_report(
+                dollar_cube, euro_cube, ["dkk", "brl"], file_path=tmp_dir + "/", monthly_dfs=monthly_dfs, cache=cache
+                )
+            self.assertEqual(len([f for f in os.listdir(tmp_dir) if f.endswith(".xlsx")]), 1)
+            self.assertEqual(cache.stats()["writes"], 6)
+
+    def test_report_cache(self)-> None:
+        """Charts and tables of unchanged rates are read from the render cache, the others are computed again.
+        """
+
+        currency_list = ["dkk", "brl", "jpy"]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = RenderCache(tmp_dir + "/cache", settings.REPORT_CACHE_MAX_BYTES)
+            create_report.generate_excel_report(
+                self.dollar_based_table, self.euro_based_table, currency_list, file_path=tmp_dir + "/", cache=cache
+                )
+            # A table and two charts per tab
+            self.assertEqual(cache.stats()["writes"], 9)
+            infos_df, currency_name = create_report.specific_info_df(self.dollar_based_table, self.euro_based_table, "brl")
+            cached_df, cached_name = create_report.table_from_json(
+                cache.get(create_report.table_key(self.dollar_based_table, self.euro_based_table, "brl"), "json")
+                )
+            pd.testing.assert_frame_equal(cached_df, infos_df)
+            self.assertEqual(cached_name, currency_name)
+
+            # Rerun, nothing rendered, the monthly summary of each chart is computed once (cache key)
+            with (patch("src.modules.create_report.render_chart_png") as mock_render,
+                  patch("src.modules.create_report.report_stats") as mock_stats,
+                  patch("src.modules.create_report.monthly_summary", wraps=create_report.monthly_summary) as mock_summary):
+                create_report.generate_excel_report(
+                    self.dollar_based_table, self.euro_based_table, currency_list, file_path=tmp_dir + "/",
+                    parallel_render=True, cache=cache
+                    )
+            mock_render.assert_not_called()
+            mock_stats.assert_not_called()
+            self.assertEqual(mock_summary.call_count, 6)
+
+            # A new brl dollar rate changes its table and its dollar chart only
+            dollar_df = self.dollar_based_table.copy()
+            dollar_df.loc[dollar_df.index[-1], "brl"] *= 1.5
+            with (patch("src.modules.create_report.render_chart_png", wraps=create_report.render_chart_png) as mock_render,
+                  patch("src.modules.create_report.report_stats", wraps=create_report.report_stats) as mock_stats):
+                create_report.generate_excel_report(
+                    dollar_df, self.euro_based_table, currency_list, file_path=tmp_dir + "/", cache=cache
+                    )
+            self.assertEqual([call.args[1:] for call in mock_render.call_args_list], [("brl", "Brl", "Dollar")])
+            self.assertEqual(mock_stats.call_args.args[2], ["brl"])
+            self.assertEqual(cache.stats()["writes"], 11)
+
+        args = create_report.chart_args(self.dollar_based_table, "brl", "Dollar")
+        self.assertEqual(create_report.cached_chart_png(None, args, png=b"chart"), b"chart")
+
+    def test_chart_memory_is_flat(self)-> None:
+        """Rendering many charts should not grow memory: every figure is closed and freed after its chart.
+        """
+
+        figures = []
+
+        def tracked_plot(*args):
+            fig = plot_monthly_summary(*args)
+            figures.append(weakref.ref(fig))
+            return fig
+
+        plot_monthly_summary = create_report.plot_monthly_summary
+        n_figures = len(plt.get_fignums())
+        with patch("src.modules.create_report.plot_monthly_summary", side_effect=tracked_plot):
+            for _ in range(20):
+                create_report.render_chart_png(*create_report.chart_args(self.dollar_based_table, "brl", "Dollar"))
+        while gc.collect():  # Figures are reference cycles, freeing one may take a few passes
+            pass
+
+        # An unclosed figure costs ~4MB and stays referenced by pyplot
+        self.assertEqual(len(plt.get_fignums()), n_figures)
+        self.assertEqual(len(figures), 20)
+        self.assertEqual([ref for ref in figures if ref() is not None], [])
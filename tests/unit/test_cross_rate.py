@@ -0,0 +1,55 @@
+# Standard library
+import unittest
+
+# Third party
+import numpy as np
+import pandas as pd
+
+# First party
+from src.modules import cross_rate
+
+
+class TestCrossRate(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Dollar and Euro based tables with the same days.
+        """
+        cls.dollar_based_table = pd.read_csv("tests/unit/sample_data/dollar_based_currency_full_table.csv")
+        cls.euro_based_table = pd.read_csv("tests/unit/sample_data/euro_based_currency_full_table.csv")
+
+    def test_derive_base_frame(self)-> None:
+        """Euro based rates derived from dollar based rates should match the real euro table.
+        """
+
+        euro_df = cross_rate.derive_base_frame(
+            self.dollar_based_table,
+            "eur",
+            columns=self.euro_based_table.columns.tolist() + ["new_currency"]
+            )
+
+        self.assertEqual(euro_df.exchange_date.tolist(), self.dollar_based_table.exchange_date.tolist())
+        self.assertTrue((euro_df.eur == 1).all())
+        self.assertTrue(euro_df.new_currency.isna().all())
+        np.testing.assert_allclose(euro_df.brl, self.euro_based_table.brl, rtol=1e-3)
+
+        drift_report = cross_rate.measure_drift(euro_df, self.euro_based_table)
+        self.assertEqual(drift_report["days"], self.euro_based_table.exchange_date.nunique())
+        self.assertLess(drift_report["median_rel_drift"], 1e-3)
+        self.assertIn(drift_report["worst_currency"], self.euro_based_table.columns)
+
+    def test_measure_drift_without_overlap(self)-> None:
+        """No comparable values.
+        """
+
+        derived_df = pd.DataFrame({"exchange_date": ["2024-01-01"], "brl": [np.nan]})
+        fetched_df = pd.DataFrame({"exchange_date": ["2024-01-01"], "brl": [5.0]})
+        self.assertEqual(cross_rate.measure_drift(derived_df, fetched_df), {"days": 1, "currencies": 0})
+
+    def test_sample_days(self)-> None:
+        """Sample is spread over the dates and includes the last one.
+        """
+
+        dates = [f"2024-01-{day:02d}" for day in range(1, 11)]
+        self.assertEqual(cross_rate.sample_days(dates, 3), ["2024-01-01", "2024-01-05", "2024-01-10"])
+        self.assertEqual(cross_rate.sample_days(dates[:1], 3), ["2024-01-01"])
+        self.assertEqual(cross_rate.sample_days(dates, 0), [])
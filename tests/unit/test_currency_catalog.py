@@ -0,0 +1,95 @@
+# Standard library
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Third party
+import pandas as pd
+
+# First party
+from src import settings
+from src.modules import currency_catalog, db, long_store
+
+
+class TestCurrencyCatalog(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Sample wide table (some currencies never have a rate).
+        """
+        cls.dollar_based_table = pd.read_csv("tests/unit/sample_data/dollar_based_currency_full_table.csv")
+        rates = cls.dollar_based_table.set_index("exchange_date")
+        cls.seen_codes = rates.columns[rates.notna().any()].tolist()
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "test.db")
+
+    def tearDown(self):
+        db.get_pool().close_all()
+        currency_catalog.forget_schema()
+        self.tmp_dir.cleanup()
+
+    def test_seen_dates(self)-> None:
+        """Names and seen dates of each code, the seen range only grows.
+        """
+
+        currency_catalog.record_names(self.db_path, {"brl": "Brazilian Real", "xxx": "Unknown"})
+        self.assertEqual(currency_catalog.record_seen(self.db_path, self.dollar_based_table), len(self.seen_codes))
+        currency_catalog.record_seen(self.db_path, pd.DataFrame({"exchange_date": ["2023-01-01"], "brl": [5.0]}))
+        currency_catalog.record_names(self.db_path, {"brl": "Real"})
+        self.assertEqual(currency_catalog.record_seen(self.db_path, self.dollar_based_table[:0]), 0)
+
+        catalog_df = currency_catalog.read_catalog(self.db_path).set_index("code")
+        self.assertEqual(currency_catalog.codes(self.db_path)[:3], ["brl", "xxx", self.seen_codes[0]])
+        self.assertEqual(catalog_df.loc["brl"].tolist(), ["Real", "2022-11-07", "2023-11-16"])
+        self.assertEqual(catalog_df.loc["xxx"].tolist(), ["Unknown", None, None])
+        self.assertEqual(len(catalog_df), len(self.seen_codes) + 1)
+
+    def test_rebuild(self)-> None:
+        """Seen dates of the rates already stored, from the wide tables or the rate table.
+        """
+
+        conn_lite = sqlite3.connect(self.db_path)
+        self.dollar_based_table.to_sql("dollar_based_currency", conn_lite, index=False)
+        conn_lite.close()
+        self.assertEqual(currency_catalog.rebuild(self.db_path, settings.BASED_CURRENCY_MAPPING), len(self.seen_codes))
+        wide_df = currency_catalog.read_catalog(self.db_path)
+        self.assertEqual(wide_df.code.tolist(), self.seen_codes)
+
+        long_db_path = os.path.join(self.tmp_dir.name, "long.db")
+        long_store.insert_wide_df(self.dollar_based_table, long_db_path, "usd")
+        with patch.object(settings, "STORAGE_BACKEND", "long"):
+            currency_catalog.rebuild(long_db_path, {"usd": "dollar"})
+        long_df = currency_catalog.read_catalog(long_db_path)
+        pd.testing.assert_frame_equal(
+            long_df.sort_values("code", ignore_index=True), wide_df.sort_values("code", ignore_index=True)
+            )
+
+    def test_schema_cache(self)-> None:
+        """Columns are read once, columns added by another connection are not added twice.
+        """
+
+        self.assertEqual(currency_catalog.table_schema(self.db_path, "dollar_based_currency"), [])
+        conn_lite = sqlite3.connect(self.db_path)
+        conn_lite.execute("CREATE TABLE dollar_based_currency (exchange_date DATE, brl FLOAT)")
+        conn_lite.commit()
+        self.assertEqual(currency_catalog.table_schema(self.db_path, "dollar_based_currency"), ["exchange_date", "brl"])
+
+        # Another process adds a column, the cached schema is stale
+        conn_lite.execute('ALTER TABLE dollar_based_currency ADD COLUMN "jpy" FLOAT')
+        conn_lite.commit()
+        conn_lite.close()
+        self.assertEqual(currency_catalog.table_schema(self.db_path, "dollar_based_currency"), ["exchange_date", "brl"])
+        self.assertEqual(currency_catalog.add_columns(self.db_path, "dollar_based_currency", ["jpy", "gbp", "gbp"]), ["gbp"])
+        self.assertEqual(
+            currency_catalog.table_schema(self.db_path, "dollar_based_currency"), ["exchange_date", "brl", "jpy", "gbp"]
+            )
+
+        currency_catalog.forget_schema(self.db_path, "euro_based_currency")
+        with patch("src.modules.currency_catalog.read_schema", return_value=["exchange_date"]) as mock_read:
+            currency_catalog.table_schema(self.db_path, "dollar_based_currency")
+            mock_read.assert_not_called()
+            currency_catalog.forget_schema(self.db_path)
+            self.assertEqual(currency_catalog.table_schema(self.db_path, "dollar_based_currency"), ["exchange_date"])
@@ -0,0 +1,176 @@
+# Standard library
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+# Third party
+import pandas as pd
+
+# First party
+from src import settings
+from src.modules import columnar_store, dag_tasks, db, monthly_agg, sync_planner
+from src.modules.stub_api import StubCurrencyAPI
+
+
+class TestDagTasks(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Sample tables missing their last days, a stub payload for both bases.
+        """
+        cls.tables = {}
+        for table_name in ["dollar_based_currency", "euro_based_currency"]:
+            table_df = pd.read_csv(f"tests/unit/sample_data/{table_name}_full_table.csv")
+            cls.tables[table_name] = table_df.drop_duplicates("exchange_date")
+        with open("tests/unit/sample_data/currencies_request_sample.json", "r") as f:
+            request_sample = json.load(f)
+        cls.payload = {**request_sample, "eur": request_sample["usd"]}
+
+    def setUp(self):
+        """Each test gets a db with the sample tables (usd until 2023-10-31, eur until 2023-11-10).
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "test.db")
+        self.staging_dir = os.path.join(self.tmp_dir.name, "staging")
+        conn_lite = sqlite3.connect(self.db_path)
+        for table_name, last_date in [("dollar_based_currency", "2023-10-31"), ("euro_based_currency", "2023-11-10")]:
+            table_df = self.tables[table_name]
+            table_df[table_df.exchange_date <= last_date].to_sql(table_name, conn_lite, index=False)
+        conn_lite.close()
+        monthly_agg.rebuild(self.db_path, settings.BASED_CURRENCY_MAPPING)
+
+    def tearDown(self):
+        db.get_pool().close_all()
+        self.tmp_dir.cleanup()
+
+    def test_plan_fetches(self)-> None:
+        """One fetch task per base with missing days, split in chunks for backfills.
+        """
+
+        fetches = dag_tasks.plan_fetches(self.db_path, since="2023-10-01", until="2023-11-16")
+        self.assertEqual([fetch["based_currency"] for fetch in fetches], ["usd", "eur"])
+        self.assertEqual(len(fetches[0]["days"]), 16)
+        self.assertEqual(fetches[1]["days"], [f"2023-11-{day}" for day in range(11, 17)])
+
+        with patch("src.modules.update_currency_exchange.currency_names", return_value={"brl": "", "jpy": ""}):
+            fetches = dag_tasks.plan_fetches(
+                self.db_path, {"usd": "dollar", "gbp": "pound"}, "2023-10-01", "2023-11-16", chunk_days=10
+                )
+        self.assertEqual(
+            [(fetch["table_prefix"], len(fetch["days"])) for fetch in fetches],
+            [("dollar", 10), ("dollar", 6), ("pound", 10), ("pound", 10), ("pound", 10), ("pound", 10), ("pound", 7)]
+            )
+        # Tables are created before the fan-out
+        self.assertTrue(sync_planner.table_exists(db.get_pool().get(self.db_path), "pound_based_currency"))
+
+        # Nothing missing, nothing to map
+        self.assertEqual(dag_tasks.plan_fetches(self.db_path, {"usd": "dollar"}, "2023-10-01", "2023-10-31"), [])
+
+    def test_dag_run(self)-> None:
+        """Local stand-in of a DAG run: mapped tasks run concurrently, a single task writes.
+        """
+
+        with (StubCurrencyAPI(self.payload) as stub,
+              patch.object(settings, "API_BASE_URL", stub.base_url),
+              patch.object(settings, "RESPONSE_CACHE_DIR", None),
+              patch.object(settings, "ETL_BATCH_DAYS", 4),
+              patch.object(settings, "COLUMNAR_EXPORT_FORMAT", "arrow"),
+              patch.object(settings, "COLUMNAR_EXPORT_DIR", os.path.join(self.tmp_dir.name, "columnar")),
+              patch.object(settings, "METRICS_JSON_PATH", os.path.join(self.tmp_dir.name, "metrics", "run.json")),
+              patch.object(settings, "METRICS_TEXTFILE_PATH", None)):
+            fetches = dag_tasks.plan_fetches(self.db_path, None, "2023-10-01", "2023-11-16", chunk_days=10)
+            # Files of each run in their own directory (a backfill may run alongside the scheduled run)
+            run_id = "scheduled__2023-11-16T12:00:00+00:00"
+            with ThreadPoolExecutor(max_workers=len(fetches)) as executor:
+                staged = list(executor.map(
+                    lambda map_index, fetch: dag_tasks.fetch_rates(
+                        self.db_path, staging_dir=self.staging_dir, run_id=run_id, map_index=map_index, **fetch
+                        ),
+                    range(len(fetches)), fetches
+                    ))
+            n_rows = dag_tasks.write_staged(self.db_path, staged)
+            # Written months are exported for columnar readers
+            columnar_df = columnar_store.read_columns("eur", ["brl"], since="2023-11-16")
+
+        # Each missing day requested once per base
+        self.assertEqual(n_rows, 16 + 6)
+        run_dir = os.path.join(self.staging_dir, "scheduled__2023-11-16T12_00_00+00_00")
+        self.assertEqual({os.path.dirname(fetch["path"]) for fetch in staged}, {run_dir})
+        self.assertEqual(stub.request_count, n_rows)
+        since, until = dag_tasks.parse_date("2023-10-01"), dag_tasks.parse_date("2023-11-16")
+        self.assertEqual(
+            sync_planner.plan(self.db_path, settings.BASED_CURRENCY_MAPPING, since, until), {"usd": [], "eur": []}
+            )
+        stored_df = pd.read_sql_query(
+            "SELECT * FROM euro_based_currency WHERE exchange_date = '2023-11-16'", db.get_pool().get(self.db_path)
+            )
+        self.assertEqual(stored_df.brl[0], self.payload["eur"]["brl"])
+        # The writer and each mapped fetch task export their own run summary
+        with open(os.path.join(self.tmp_dir.name, "metrics", "run.write_staged.json")) as f:
+            self.assertEqual(json.load(f)["counters"]['rows_written{base="usd"}'], 16)
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.tmp_dir.name, "metrics"))),
+            sorted([f"run.fetch_rates.{map_index}.json" for map_index in range(len(fetches))] + ["run.write_staged.json"])
+            )
+        self.assertEqual(columnar_df.brl.tolist(), [self.payload["eur"]["brl"]])
+        self.assertEqual(
+            monthly_agg.read_monthly(self.db_path, "usd", ["brl"], "2023-11")["count"].tolist(), [16]
+            )
+
+        report_currency_list = ["brl", "jpy"]
+        cache_dir = os.path.join(self.tmp_dir.name, "report_cache")
+        with (patch.object(settings, "REPORT_CACHE_DIR", cache_dir),
+              ThreadPoolExecutor(max_workers=2) as executor):
+            charts = list(executor.map(
+                lambda code: dag_tasks.render_charts(self.db_path, code, self.staging_dir, run_id), report_currency_list
+                ))
+        self.assertEqual(sorted(charts[0]["paths"]), ["Dollar", "Euro"])
+        self.assertEqual(os.path.dirname(charts[0]["paths"]["Dollar"]), run_dir)
+        # A retried render task reads its charts from the report cache
+        with (patch.object(settings, "REPORT_CACHE_DIR", cache_dir),
+              patch("src.modules.create_report.render_chart_png") as mock_render):
+            self.assertEqual(dag_tasks.render_charts(self.db_path, "brl", self.staging_dir, run_id), charts[0])
+        mock_render.assert_not_called()
+        output_dir = os.path.join(self.tmp_dir.name, "reports")
+        os.makedirs(output_dir)
+        textfile_path = os.path.join(self.tmp_dir.name, "metrics", "currency_exchange.prom")
+        with (patch.object(settings, "REPORT_CACHE_DIR", cache_dir),
+              patch.object(settings, "METRICS_JSON_PATH", None),
+              patch.object(settings, "METRICS_TEXTFILE_PATH", textfile_path),
+              patch("src.modules.create_report.render_chart_png") as mock_render):
+            dag_tasks.assemble_report(self.db_path, report_currency_list, charts, output_dir)
+        with open(os.path.join(self.tmp_dir.name, "metrics", "currency_exchange.assemble_report.prom")) as f:
+            self.assertIn('currency_exchange_stage_calls_total{stage="stats",task="assemble_report"} 1\n', f.read())
+        # Charts are not rendered again, staging files and the run directory are removed
+        mock_render.assert_not_called()
+        self.assertEqual(len(os.listdir(output_dir)), 1)
+        self.assertEqual(os.listdir(self.staging_dir), [])
+
+    def test_new_currency_while_staging(self)-> None:
+        """A currency added by the API in a later batch is staged for every row, then added to the table.
+        """
+
+        with (StubCurrencyAPI(n_currencies=2, added_codes={"c100": "2024-01-03"}) as stub,
+              patch.object(settings, "API_BASE_URL", stub.base_url),
+              patch.object(settings, "RESPONSE_CACHE_DIR", None),
+              patch.object(settings, "METRICS_JSON_PATH", None),
+              patch.object(settings, "METRICS_TEXTFILE_PATH", os.path.join(self.tmp_dir.name, "run.prom")),
+              patch.object(settings, "ETL_BATCH_DAYS", 2)):
+            staged = dag_tasks.fetch_rates(
+                self.db_path, "gbp", "pound", ["2024-01-01", "2024-01-02", "2024-01-03"], self.staging_dir, map_index=1
+                )
+            with open(os.path.join(self.tmp_dir.name, "run.fetch_rates.1.prom")) as f:
+                textfile = f.read()
+            staged_df = pd.read_csv(staged["path"])
+            self.assertEqual(dag_tasks.write_staged(self.db_path, [staged]), 3)
+
+        # HTTP counters (currency list and 3 days) and fetch timers (2 batches) of the mapped task
+        self.assertIn('currency_exchange_http_requests_total{status="200",map_index="1",task="fetch_rates"} 4\n', textfile)
+        self.assertIn('currency_exchange_stage_calls_total{stage="fetch",map_index="1",task="fetch_rates"} 2\n', textfile)
+        self.assertEqual(staged_df.columns.tolist(), ["exchange_date", "c000", "c001", "c100"])
+        self.assertEqual(staged_df.c100.notna().tolist(), [False, False, True])
+        stored_df = pd.read_sql_query("SELECT * FROM pound_based_currency", db.get_pool().get(self.db_path))
+        pd.testing.assert_frame_equal(stored_df, staged_df)
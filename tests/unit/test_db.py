@@ -0,0 +1,107 @@
+# Standard library
+import os
+import tempfile
+import threading
+import unittest
+
+# First party
+from src.modules import db
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        """Each test gets its own pool and db file.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "test.db")
+        self.pool = db.ConnectionPool(busy_timeout=5)
+
+    def tearDown(self):
+        self.pool.close_all()
+        self.tmp_dir.cleanup()
+
+    def test_reuse_per_thread(self)-> None:
+        """A thread reuses its connection, other threads get their own, pragmas are applied.
+        """
+
+        with self.pool.connection(self.db_path) as conn_lite:
+            self.assertEqual(conn_lite.execute("PRAGMA journal_mode").fetchone(), ("wal",))
+            self.assertEqual(conn_lite.execute("PRAGMA synchronous").fetchone(), (1,))  # NORMAL
+        with self.pool.connection(self.db_path) as same_conn:
+            self.assertIs(same_conn, conn_lite)
+
+        other_conns = []
+        thread = threading.Thread(target=lambda: other_conns.append(self.pool.get(self.db_path)))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other_conns[0], conn_lite)
+        self.assertEqual(self.pool.stats()["opens"], 2)
+        self.assertEqual(self.pool.stats()["reuses"], 1)
+
+        # Closed connections are reopened on next use
+        self.pool.close_all()
+        with self.pool.connection(self.db_path) as new_conn:
+            self.assertIsNot(new_conn, conn_lite)
+            new_conn.execute("SELECT 1")
+        self.assertEqual(self.pool.stats()["opens"], 3)
+
+    def test_transaction(self)-> None:
+        """Errors roll the transaction back, a reader is not blocked by a writer.
+        """
+
+        with self.pool.connection(self.db_path) as conn_lite:
+            conn_lite.execute("CREATE TABLE t (x INTEGER)")
+            with self.assertRaises(ValueError):
+                with self.pool.transaction(conn_lite):
+                    conn_lite.execute("INSERT INTO t VALUES (1)")
+                    raise ValueError
+            self.assertEqual(conn_lite.execute("SELECT count(*) FROM t").fetchone(), (0,))
+
+        # Transaction left open by a failing block
+        with self.assertRaises(ValueError):
+            with self.pool.connection(self.db_path) as conn_lite:
+                conn_lite.execute("BEGIN")
+                raise ValueError
+        self.assertFalse(conn_lite.in_transaction)
+
+        with self.pool.transaction(conn_lite):
+            conn_lite.execute("INSERT INTO t VALUES (1)")
+            counts = []
+            reader = threading.Thread(
+                target=lambda: counts.append(self.pool.get(self.db_path).execute("SELECT count(*) FROM t").fetchone())
+                )
+            reader.start()
+            reader.join()
+        self.assertEqual(counts, [(0,)])  # WAL: the reader sees the last commit
+        self.assertEqual(self.pool.stats()["transactions"], 2)
+
+    def test_lock_wait(self)-> None:
+        """Time waiting for another writer is counted.
+        """
+
+        locked, release = threading.Event(), threading.Event()
+
+        def writer():
+            conn_lite = self.pool.get(self.db_path)
+            with self.pool.transaction(conn_lite):
+                locked.set()
+                release.wait()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        locked.wait()
+        threading.Timer(0.2, release.set).start()
+        with self.pool.transaction(self.pool.get(self.db_path)):
+            pass
+        thread.join()
+        self.assertGreaterEqual(self.pool.stats()["lock_wait_s"], 0.1)
+
+    def test_shared_pool(self)-> None:
+        """Module shortcuts use a single pool.
+        """
+
+        self.assertIs(db.get_pool(), db.get_pool())
+        with db.connection(self.db_path) as conn_lite:
+            with db.transaction(conn_lite):
+                conn_lite.execute("CREATE TABLE t (x INTEGER)")
+        db.get_pool().close_all()
@@ -0,0 +1,126 @@
+# Standard library
+import json
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+# Third party
+import requests
+
+# First party
+from src.modules import http_client
+from src.modules.stub_api import StubCurrencyAPI
+
+
+class TestHttpClient(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Load a sample payload served by the stub API.
+        """
+        with open("tests/unit/sample_data/currencies_request_sample.json", "r") as f:
+            cls.request_sample = json.load(f)
+
+    def test_connection_reuse(self)-> None:
+        """Sequential requests to the same host should share one keep-alive connection.
+        """
+
+        client = http_client.HttpClient(max_retries=0)
+        with StubCurrencyAPI(self.request_sample) as stub:
+            for day in range(1, 11):
+                resp = client.get(f"{stub.base_url}@2024.1.{day}/v1/currencies/usd.json")
+                self.assertEqual(resp.status_code, 200)
+        client.close()
+
+        stats = client.stats()
+        self.assertEqual(stats["requests"], 10)
+        self.assertEqual(stats["new_connections"], 1)
+        self.assertEqual(stats["reused_connections"], 9)
+
+    def test_reserve(self)-> None:
+        """Workers beyond pool_maxsize get their own connection instead of waiting for a pooled one.
+        """
+
+        client = http_client.HttpClient(pool_maxsize=2, max_retries=0)
+        with (StubCurrencyAPI(self.request_sample, latency=0.3) as stub,
+              client.reserve(6),
+              ThreadPoolExecutor(max_workers=6) as executor):
+            statuses = list(executor.map(
+                lambda day: client.get(f"{stub.base_url}@2024.1.{day}/v1/currencies/usd.json").status_code, range(1, 7)
+                ))
+        client.close()
+
+        self.assertEqual(statuses, [200] * 6)
+        self.assertEqual((client.pool_maxsize, client.reserved_workers), (6, 0))
+        # A pool of 2 would have opened 2 connections and served the requests 2 by 2
+        self.assertGreater(client.stats()["new_connections"], 2)
+        with client.reserve(4):
+            self.assertEqual(client.pool_maxsize, 6)
+
+    def test_reserve_closes_previous_pool(self)-> None:
+        """Growing the pool closes the replaced adapter, a request in flight still completes.
+        """
+
+        client = http_client.HttpClient(pool_maxsize=1, max_retries=0)
+        previous_adapter = client.session.adapters["https://"]
+        with (StubCurrencyAPI(self.request_sample, latency=0.3) as stub,
+              ThreadPoolExecutor(max_workers=1) as executor):
+            in_flight = executor.submit(client.get, f"{stub.base_url}@2024.1.1/v1/currencies/usd.json")
+            time.sleep(0.1)
+            self.assertEqual(len(previous_adapter.poolmanager.pools), 1)
+            with client.reserve(4):
+                self.assertIsNot(client.session.adapters["https://"], previous_adapter)
+                self.assertEqual(len(previous_adapter.poolmanager.pools), 0)
+            self.assertEqual(in_flight.result().status_code, 200)
+        client.close()
+
+    def test_retries(self)-> None:
+        """429/5xx are retried with backoff, other status codes are returned as is.
+        """
+
+        client = http_client.HttpClient(max_retries=3, backoff_factor=0)
+        with StubCurrencyAPI(self.request_sample, fail_times=2, fail_status=503) as stub:
+            resp = client.get(f"{stub.base_url}@2024.1.1/v1/currencies/usd.json")
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(client.stats()["retries"], 2)
+
+        with StubCurrencyAPI(self.request_sample, fail_times=10, fail_status=429) as stub:
+            resp = client.get(f"{stub.base_url}@2024.1.1/v1/currencies/usd.json")
+            self.assertEqual(resp.status_code, 429)
+            self.assertEqual(stub.request_count, 4)
+
+        with StubCurrencyAPI(self.request_sample, missing_dates={"2024.1.1"}) as stub:
+            resp = client.get(f"{stub.base_url}@2024.1.1/v1/currencies/usd.json")
+            self.assertEqual(resp.status_code, 404)
+            self.assertEqual(stub.request_count, 1)
+
+    def test_timeout(self)-> None:
+        """A slow host should raise after the retries instead of hanging.
+        """
+
+        client = http_client.HttpClient(timeout=(1, 0.05), max_retries=1, backoff_factor=0)
+        with StubCurrencyAPI(self.request_sample, latency=0.3) as stub:
+            self.assertRaises(
+                requests.Timeout,
+                client.get,
+                f"{stub.base_url}@2024.1.1/v1/currencies/usd.json"
+                )
+        self.assertEqual(client.stats()["retries"], 1)
+
+    def test_backoff(self)-> None:
+        """Backoff is capped and honors Retry-After.
+        """
+
+        client = http_client.HttpClient(backoff_factor=1, backoff_max=5)
+        self.assertLessEqual(client.backoff(10), 5)
+        self.assertEqual(client.backoff(0, retry_after="3"), 3)
+
+    def test_shared_client(self)-> None:
+        """get() goes through a single shared client.
+        """
+
+        with patch.object(http_client, "_client", None):
+            self.assertIs(http_client.get_client(), http_client.get_client())
+            with patch.object(http_client.HttpClient, "get") as mock_get:
+                http_client.get("url")
+                mock_get.assert_called_once_with("url")
@@ -0,0 +1,91 @@
+# Standard library
+import os
+import sqlite3
+import tempfile
+import unittest
+
+# Third party
+import numpy as np
+import pandas as pd
+
+# First party
+from src.modules import long_store
+
+
+class TestLongStore(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Sample wide tables.
+        """
+        cls.dollar_based_table = pd.read_csv("tests/unit/sample_data/dollar_based_currency_full_table.csv")
+        cls.euro_based_table = pd.read_csv("tests/unit/sample_data/euro_based_currency_full_table.csv")
+
+    def setUp(self):
+        """Each test gets a db with the wide sample tables.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "test.db")
+        conn_lite = sqlite3.connect(self.db_path)
+        self.dollar_based_table.to_sql("dollar_based_currency", conn_lite, index=False)
+        self.euro_based_table.to_sql("euro_based_currency", conn_lite, index=False)
+        conn_lite.close()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_migrate_wide_tables(self)-> None:
+        """Every non null rate is copied, running it twice changes nothing.
+        """
+
+        mapping = {"usd": "dollar", "eur": "euro"}
+        copied = long_store.migrate_wide_tables(self.db_path, mapping, chunksize=100)
+        self.assertEqual(copied["usd"], int(self.dollar_based_table.iloc[:, 1:].notna().sum().sum()))
+        long_store.migrate_wide_tables(self.db_path, mapping, chunksize=100)
+
+        conn_lite = sqlite3.connect(self.db_path)
+        (n_rates,) = conn_lite.execute("SELECT count(*) FROM currency_rate WHERE base = 'usd'").fetchone()
+        conn_lite.close()
+        # Sample table has a duplicated day
+        unique_days_table = self.dollar_based_table.drop_duplicates("exchange_date", keep="last")
+        self.assertEqual(n_rates, int(unique_days_table.iloc[:, 1:].notna().sum().sum()))
+        self.assertEqual(
+            long_store.last_exchange_date(self.db_path, "usd"),
+            self.dollar_based_table.exchange_date.max()
+            )
+        self.assertIsNone(long_store.last_exchange_date(self.db_path, "gbp"))
+
+    def test_read(self)-> None:
+        """Pair and wide reads match the original wide table.
+        """
+
+        long_store.insert_wide_df(self.dollar_based_table, self.db_path, "usd")
+
+        pair_df = long_store.read_pair(self.db_path, "usd", "brl", "2023-01-01", "2023-12-31")
+        expected = self.dollar_based_table.loc[
+            self.dollar_based_table.exchange_date.between("2023-01-01", "2023-12-31")
+            ].drop_duplicates("exchange_date", keep="last")
+        self.assertEqual(pair_df.exchange_date.tolist(), expected.exchange_date.tolist())
+        np.testing.assert_allclose(pair_df.rate, expected.brl)
+
+        wide_df = long_store.read_wide(
+            self.db_path, "usd", ["brl", "dkk", "not_a_currency"], since="2023-06-01"
+            )
+        self.assertEqual(wide_df.columns.tolist(), ["exchange_date", "brl", "dkk", "not_a_currency"])
+        self.assertEqual(wide_df.exchange_date.min(), "2023-06-01")
+        self.assertTrue(wide_df.not_a_currency.isna().all())
+
+        all_quotes_df = long_store.read_wide(self.db_path, "usd")
+        self.assertIn("brl", all_quotes_df.columns)
+
+    def test_pair_query_uses_primary_key(self)-> None:
+        """A pair read is a range scan on the clustered primary key.
+        """
+
+        conn_lite = sqlite3.connect(self.db_path)
+        long_store.create_long_table(conn_lite)
+        plan = conn_lite.execute(
+            "EXPLAIN QUERY PLAN SELECT exchange_date, rate FROM currency_rate "
+            "WHERE base = 'usd' AND quote = 'brl' AND exchange_date BETWEEN '2023-01-01' AND '2023-12-31'"
+            ).fetchall()
+        conn_lite.close()
+        self.assertIn("PRIMARY KEY", str(plan))
@@ -1,22 +1,162 @@
 # Standard library
+import json
+import os
+import sqlite3
+import tempfile
 import unittest
+from datetime import datetime
 from unittest.mock import Mock, patch
 
+# Third party
+import pandas as pd
+
 # First party
-from src import main
+from src import main, settings
+from src.modules import create_report, db
+from src.modules.rate_cube import RateCube
+from src.modules.stub_api import StubCurrencyAPI
 
 
 class TestMain(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
+        """Sample tables and a stub payload for both bases.
         """
+        cls.tables = {}
+        for table_name in ["dollar_based_currency", "euro_based_currency"]:
+            table_df = pd.read_csv(f"tests/unit/sample_data/{table_name}_full_table.csv")
+            cls.tables[table_name] = table_df.drop_duplicates("exchange_date")
+        with open("tests/unit/sample_data/currencies_request_sample.json", "r") as f:
+            request_sample = json.load(f)
+        cls.payload = {**request_sample, "eur": request_sample["usd"]}
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "test.db")
+
+    def tearDown(self):
+        db.get_pool().close_all()
+        self.tmp_dir.cleanup()
+
+    def create_tables(self, last_dates: dict) -> None:
+        """Sample tables up to last_dates ({table_name: YYYY-MM-DD}).
         """
-        pass    
+        conn_lite = sqlite3.connect(self.db_path)
+        for table_name, last_date in last_dates.items():
+            table_df = self.tables[table_name]
+            table_df[table_df.exchange_date <= last_date].to_sql(table_name, conn_lite, index=False)
+        conn_lite.close()
 
+    @patch.object(settings, "PIPELINED_RUN", False)
+    @patch("src.main.metrics.export")
     @patch("src.main.update_currency_exchange.etl_pipeline")
     @patch("src.main.create_report.report_pipeline")
-    def test_create_table_currency_exchange(self,m1,m2)-> None:
+    def test_create_table_currency_exchange(self,m1,m2,mock_export)-> None:
         """Test main.run.
         """
         is_successful = main.run()
         self.assertTrue(is_successful)
+        mock_export.assert_called_once_with()
+
+    @patch.object(settings, "PIPELINED_RUN", True)
+    @patch("src.main.metrics.export", Mock())
+    @patch("src.main.run_pipelined")
+    def test_run_pipelined_by_default(self, mock_run_pipelined)-> None:
+        """main.run overlaps the ETL and the report with PIPELINED_RUN.
+        """
+        self.assertTrue(main.run())
+        mock_run_pipelined.assert_called_once_with(
+            settings.BASED_CURRENCY_MAPPING, settings.DB_PATH, settings.REPORT_CURRENCY_LIST
+            )
+
+    def run_pipelined(self, based_currency_mapping: dict, **settings_values) -> tuple:
+        """Run main.run_pipelined against the stub API (2023-11-01 to 2023-11-16).
+        * Return the generate_excel_report call and the report_table_df mock
+        """
+
+        output_dir = os.path.join(self.tmp_dir.name, "reports")
+        os.makedirs(output_dir, exist_ok=True)
+        with (StubCurrencyAPI(self.payload) as stub,
+              patch.multiple(
+                  settings, API_BASE_URL=stub.base_url, RESPONSE_CACHE_DIR=None, **{"REPORT_CACHE_DIR": None, **settings_values}
+                  ),
+              patch("src.modules.create_report.report_table_df", wraps=create_report.report_table_df) as mock_read,
+              patch("src.main.create_report.generate_excel_report",
+                    wraps=create_report.generate_excel_report) as mock_report):
+            self.assertTrue(main.run_pipelined(
+                based_currency_mapping,
+                self.db_path,
+                ["brl", "dkk"],
+                output_dir,
+                since=datetime(2023, 11, 1),
+                until=datetime(2023, 11, 16),
+                ))
+        self.assertEqual(len(os.listdir(output_dir)), 1)
+
+        return mock_report.call_args, mock_read
+
+    def test_run_pipelined(self)-> None:
+        """Committed batches extend the report windows in memory, the db is read once per base.
+        """
+
+        self.create_tables({"dollar_based_currency": "2023-10-31", "euro_based_currency": "2023-11-10"})
+        report_call, mock_read = self.run_pipelined(settings.BASED_CURRENCY_MAPPING, ETL_BATCH_DAYS=4)
+
+        self.assertEqual(mock_read.call_count, 2)
+        dollar_df, euro_df = report_call.args[:2]
+        self.assertEqual(dollar_df.columns.tolist(), ["exchange_date", "brl", "dkk"])
+        self.assertEqual(dollar_df.exchange_date.iloc[-1], "2023-11-16")
+        self.assertEqual(euro_df.brl.iloc[-1], self.payload["eur"]["brl"])
+        self.assertGreaterEqual(dollar_df.exchange_date.iloc[0], create_report.window_start("2023-11-16"))
+        self.assertTrue(dollar_df.exchange_date.is_unique)
+        # Charts were rendered while syncing
+        self.assertEqual(sorted(report_call.kwargs["charts"]), [
+            ("Dollar", "brl"), ("Dollar", "dkk"), ("Euro", "brl"), ("Euro", "dkk")
+            ])
+        # From the same monthly aggregates as report_pipeline
+        _, _, monthly_dfs = create_report.load_report_data(["brl", "dkk"], self.db_path)
+        self.assertEqual(sorted(report_call.kwargs["monthly_dfs"]), ["Dollar", "Euro"])
+        for base_name, monthly_df in monthly_dfs.items():
+            pd.testing.assert_frame_equal(report_call.kwargs["monthly_dfs"][base_name], monthly_df)
+        self.assertEqual(monthly_dfs["Dollar"].month.max(), "2023-11")
+
+    def test_run_pipelined_cross_rate(self)-> None:
+        """Cross-rate mode syncs every base together, the report gets RateCubes if enabled.
+        """
+
+        self.create_tables({"dollar_based_currency": "2023-10-31", "euro_based_currency": "2023-11-10"})
+        report_call, _ = self.run_pipelined(
+            settings.BASED_CURRENCY_MAPPING, CROSS_RATE_ANCHOR="usd", REPORT_RATE_CUBE=True
+            )
+
+        dollar_cube, euro_cube = report_call.args[:2]
+        self.assertIsInstance(dollar_cube, RateCube)
+        self.assertEqual((dollar_cube.last_date(), euro_cube.last_date()), ("2023-11-16", "2023-11-16"))
+
+    def test_run_pipelined_report_cache(self)-> None:
+        """A rerun without new days reads every chart and table from the render cache.
+        """
+
+        self.create_tables({"dollar_based_currency": "2023-10-31", "euro_based_currency": "2023-11-10"})
+        cache_dir = os.path.join(self.tmp_dir.name, "report_cache")
+        first_call, _ = self.run_pipelined(settings.BASED_CURRENCY_MAPPING, REPORT_CACHE_DIR=cache_dir)
+        with (patch("src.modules.create_report.render_chart_png") as mock_render,
+              patch("src.modules.create_report.report_stats") as mock_stats):
+            report_call, _ = self.run_pipelined(settings.BASED_CURRENCY_MAPPING, REPORT_CACHE_DIR=cache_dir)
+
+        mock_render.assert_not_called()
+        mock_stats.assert_not_called()
+        self.assertEqual(report_call.kwargs["charts"], first_call.kwargs["charts"])
+
+    @patch("src.modules.update_currency_exchange.currency_names", Mock(return_value={"brl": "", "dkk": "", "usd": ""}))
+    def test_run_pipelined_new_table(self)-> None:
+        """A report base created by the run is read once synced, report bases not synced are read from the db.
+        """
+
+        self.create_tables({"euro_based_currency": "2023-11-16"})
+        report_call, mock_read = self.run_pipelined({"usd": "dollar"})
+
+        self.assertEqual(mock_read.call_count, 2)
+        dollar_df, euro_df = report_call.args[:2]
+        self.assertEqual(len(dollar_df), 16)
+        self.assertEqual(euro_df.exchange_date.iloc[-1], "2023-11-16")
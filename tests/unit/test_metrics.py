@@ -0,0 +1,98 @@
+# Standard library
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+# First party
+from src import settings
+from src.modules import metrics, update_currency_exchange
+from src.modules.stub_api import StubCurrencyAPI
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        """Each test starts a new run.
+        """
+        metrics.get_metrics().reset()
+
+    def test_summary(self)-> None:
+        """Stage timers add up, counters are labeled, histogram buckets are cumulative.
+        """
+
+        run_metrics = metrics.Metrics()
+        for seconds in [0.5, 1.5]:
+            run_metrics.add_time("fetch", seconds)
+        with self.assertRaises(ValueError):
+            with run_metrics.timer("render"):
+                raise ValueError
+        run_metrics.count("rows_written", 10, {"base": "usd"})
+        run_metrics.count("rows_written", 5, {"base": "usd"})
+        run_metrics.count("fallback_days")
+        for seconds in [0.005, 0.2, 0.2, 30]:
+            run_metrics.observe("http_request_seconds", seconds)
+
+        summary = run_metrics.summary()
+        self.assertEqual(summary["stages"]["fetch"], {"calls": 2, "total_s": 2.0, "max_s": 1.5})
+        self.assertEqual(summary["stages"]["render"]["calls"], 1)
+        self.assertEqual(summary["counters"], {'rows_written{base="usd"}': 15, "fallback_days": 1})
+        histogram = summary["histograms"]["http_request_seconds"]
+        self.assertEqual((histogram["count"], histogram["sum"]), (4, 30.405))
+        self.assertEqual(
+            [histogram["buckets"][bound] for bound in ["0.01", "0.1", "0.25", "10.0", "+Inf"]], [1, 1, 3, 3, 4]
+            )
+
+        textfile = run_metrics.to_prometheus()
+        self.assertIn('currency_exchange_stage_seconds_total{stage="fetch"} 2.0\n', textfile)
+        self.assertIn('currency_exchange_rows_written_total{base="usd"} 15\n', textfile)
+        self.assertIn("currency_exchange_fallback_days_total 1\n", textfile)
+        self.assertIn('currency_exchange_http_request_seconds_bucket{le="+Inf"} 4\n', textfile)
+        self.assertIn("currency_exchange_http_request_seconds_count 4\n", textfile)
+        self.assertEqual(textfile.count("# TYPE currency_exchange_rows_written_total counter"), 1)
+
+        run_metrics.observe("render_seconds", 1, {"base": "usd"})
+        self.assertIn('currency_exchange_render_seconds_bucket{base="usd",le="1.0"} 1\n', run_metrics.to_prometheus())
+
+    def test_export(self)-> None:
+        """The shared metrics are written as JSON and Prometheus textfile, empty paths are skipped.
+        """
+
+        metrics.count("rows_written", 3)
+        with metrics.timer("db_write"):
+            pass
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_path = os.path.join(tmp_dir, "metrics", "run.json")
+            textfile_path = os.path.join(tmp_dir, "currency_exchange.prom")
+            summary = metrics.export(json_path, textfile_path)
+            with open(json_path) as f:
+                self.assertEqual(json.load(f), summary)
+            with open(textfile_path) as f:
+                self.assertIn("currency_exchange_rows_written_total 3\n", f.read())
+            self.assertEqual(sorted(os.listdir(tmp_dir)), ["currency_exchange.prom", "metrics"])
+
+            with (patch.object(settings, "METRICS_JSON_PATH", None),
+                  patch.object(settings, "METRICS_TEXTFILE_PATH", None)):
+                self.assertEqual(metrics.export()["stages"]["db_write"]["calls"], 1)
+
+    def test_etl_instrumentation(self)-> None:
+        """Fetching records HTTP metrics, stages and fallback days.
+        """
+
+        with open("tests/unit/sample_data/currencies_request_sample.json", "r") as f:
+            request_sample = json.load(f)
+        days = update_currency_exchange.date_range(datetime.today() - timedelta(days=5))
+        missing_day = days[2].strftime("%Y.%-m.%-d")
+        with (StubCurrencyAPI(request_sample, missing_dates={missing_day}) as stub,
+              patch.object(settings, "API_BASE_URL", stub.base_url)):
+            update_currency_exchange.fetch_rates_frame(days, "usd", ["exchange_date", "brl"])
+
+        summary = metrics.get_metrics().summary()
+        self.assertEqual(summary["counters"]['fallback_days{base="usd"}'], 1)
+        self.assertEqual(summary["counters"]['http_requests{status="200"}'], 5)
+        self.assertEqual(summary["counters"]['http_requests{status="404"}'], 1)
+        self.assertGreater(summary["counters"]["http_response_bytes"], 0)
+        self.assertEqual(summary["histograms"]["http_request_seconds"]["count"], 6)
+        self.assertEqual(summary["stages"]["parse"]["calls"], 5)
+        self.assertEqual(summary["stages"]["transform"]["calls"], 1)
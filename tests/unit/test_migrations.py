@@ -0,0 +1,75 @@
+# Standard library
+import os
+import sqlite3
+import tempfile
+import unittest
+
+# Third party
+import pandas as pd
+
+# First party
+from src.modules import migrations, monthly_agg
+
+
+class TestMigrations(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Sample wide table (with one duplicated day).
+        """
+        cls.dollar_based_table = pd.read_csv("tests/unit/sample_data/dollar_based_currency_full_table.csv")
+        cls.duplicated_dates = cls.dollar_based_table.exchange_date[
+            cls.dollar_based_table.exchange_date.duplicated()
+            ].tolist()
+
+    def setUp(self):
+        """Each test gets a db with the wide sample table, created without the unique index.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "test.db")
+        conn_lite = sqlite3.connect(self.db_path)
+        self.dollar_based_table.to_sql("dollar_based_currency", conn_lite, index=False)
+        conn_lite.close()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_migrate(self)-> None:
+        """Duplicated days are removed (last row kept), the index is created and the run is idempotent.
+        """
+
+        self.assertEqual(len(self.duplicated_dates), 1)
+        monthly_agg.rebuild(self.db_path, {"usd": "dollar"})
+        deduped = migrations.migrate(self.db_path, {"usd": "dollar", "eur": "euro"})
+        self.assertEqual(deduped, {"usd": self.duplicated_dates})
+
+        conn_lite = sqlite3.connect(self.db_path)
+        stored_df = pd.read_sql_query("SELECT * FROM dollar_based_currency", conn_lite)
+        self.assertRaises(
+            sqlite3.IntegrityError,
+            conn_lite.execute,
+            "INSERT INTO dollar_based_currency (exchange_date) VALUES (?)",
+            self.duplicated_dates,
+            )
+        conn_lite.close()
+        expected_df = self.dollar_based_table.drop_duplicates("exchange_date", keep="last")
+        pd.testing.assert_frame_equal(stored_df, expected_df.reset_index(drop=True), check_dtype=False)
+        # Aggregates of the deduplicated month
+        month_df = monthly_agg.read_monthly(self.db_path, "usd", ["brl"], since_month=self.duplicated_dates[0][:7])
+        self.assertEqual(
+            month_df["count"].iloc[0],
+            expected_df.exchange_date.str.startswith(self.duplicated_dates[0][:7]).sum()
+            )
+
+        self.assertEqual(migrations.migrate(self.db_path, {"usd": "dollar"}), {"usd": []})
+
+    def test_last_date_uses_index(self)-> None:
+        """max(exchange_date) is an index seek once the index exists.
+        """
+
+        conn_lite = sqlite3.connect(self.db_path)
+        migrations.ensure_unique_dates(conn_lite, "dollar_based_currency")
+        plan = conn_lite.execute(
+            "EXPLAIN QUERY PLAN SELECT max(exchange_date) FROM dollar_based_currency"
+            ).fetchall()
+        conn_lite.close()
+        self.assertIn(migrations.date_index_name("dollar_based_currency"), plan[0][-1])
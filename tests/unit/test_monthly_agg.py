@@ -0,0 +1,113 @@
+# Standard library
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Third party
+import numpy as np
+import pandas as pd
+
+# First party
+from src import settings
+from src.modules import long_store, monthly_agg
+
+
+class TestMonthlyAgg(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Sample wide table.
+        """
+        cls.dollar_based_table = pd.read_csv("tests/unit/sample_data/dollar_based_currency_full_table.csv")
+
+    def setUp(self):
+        """Each test gets an empty db.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "test.db")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def expected_brl(self, daily_df: pd.DataFrame) -> pd.DataFrame:
+        """Monthly brl aggregates computed by pandas.
+        """
+        return (
+            daily_df.assign(month=daily_df.exchange_date.str[:7])
+            .groupby("month").brl.agg(["mean", "min", "max", "count"])
+            .reset_index()
+            )
+
+    def test_refresh_wide(self)-> None:
+        """Aggregates match the daily rates, a refresh only rewrites the months it is given.
+        """
+
+        conn_lite = sqlite3.connect(self.db_path)
+        self.dollar_based_table.to_sql("dollar_based_currency", conn_lite, index=False)
+        conn_lite.close()
+        months = monthly_agg.months_of(self.dollar_based_table.exchange_date)
+        self.assertEqual(months[0], "2022-11")
+        self.assertEqual(monthly_agg.refresh(self.db_path, "usd", []), 0)
+        monthly_agg.refresh(self.db_path, "usd", months, "dollar_based_currency")
+
+        brl_df = monthly_agg.read_monthly(self.db_path, "usd", ["brl"])
+        pd.testing.assert_frame_equal(
+            brl_df.drop(columns="quote"), self.expected_brl(self.dollar_based_table), check_dtype=False
+            )
+
+        # A new day of the last month
+        new_day = self.dollar_based_table.iloc[[-1]].assign(exchange_date="2023-11-30", brl=100.0)
+        conn_lite = sqlite3.connect(self.db_path)
+        new_day.to_sql("dollar_based_currency", conn_lite, index=False, if_exists="append")
+        conn_lite.close()
+        monthly_agg.refresh(self.db_path, "usd", ["2023-11"], "dollar_based_currency")
+
+        updated_df = monthly_agg.read_monthly(self.db_path, "usd", ["brl"], since_month="2023-10")
+        self.assertEqual(updated_df.month.tolist(), ["2023-10", "2023-11"])
+        self.assertEqual(updated_df["max"].iloc[-1], 100.0)
+        self.assertEqual(updated_df["count"].iloc[-1], brl_df["count"].iloc[-1] + 1)
+        self.assertEqual(updated_df.iloc[0].tolist(), brl_df.iloc[-2].tolist())
+
+        # An old month and the last one: the months between are neither read nor rewritten
+        self.assertEqual(
+            monthly_agg.month_spans(["2023-11", "2022-11", "2022-12"]), [("2022-11", "2023-01"), ("2023-11", "2023-12")]
+            )
+        conn_lite = sqlite3.connect(self.db_path)
+        rates_df = monthly_agg.daily_rates(conn_lite, "usd", ["2022-11", "2023-11"], "dollar_based_currency")
+        conn_lite.close()
+        self.assertEqual(monthly_agg.months_of(rates_df.exchange_date), ["2022-11", "2023-11"])
+        written = monthly_agg.refresh(self.db_path, "usd", ["2022-11", "2023-11"], "dollar_based_currency")
+        self.assertEqual(written, len(rates_df.groupby(["quote", rates_df.exchange_date.str[:7]])))
+        pd.testing.assert_frame_equal(monthly_agg.read_monthly(self.db_path, "usd", ["brl"], "2023-10"), updated_df)
+        self.assertEqual(monthly_agg.read_monthly(self.db_path, "usd", ["brl"]).month.nunique(), 13)
+
+    def test_rebuild_long(self)-> None:
+        """Long backend aggregates are rebuilt from currency_rate.
+        """
+
+        long_store.insert_wide_df(self.dollar_based_table, self.db_path, "usd")
+        with patch.object(settings, "STORAGE_BACKEND", "long"):
+            written = monthly_agg.rebuild(self.db_path, {"usd": "dollar", "eur": "euro"})
+        self.assertEqual(written["eur"], 0)
+
+        all_df = monthly_agg.read_monthly(self.db_path, "usd")
+        self.assertEqual(written["usd"], len(all_df))
+        self.assertTrue(np.all(all_df["min"] <= all_df["mean"]))
+        pd.testing.assert_frame_equal(
+            all_df[all_df.quote == "brl"].drop(columns="quote").reset_index(drop=True),
+            # currency_rate keeps one rate per day
+            self.expected_brl(self.dollar_based_table.drop_duplicates("exchange_date", keep="last")),
+            check_dtype=False
+            )
+
+    def test_rebuild_wide(self)-> None:
+        """Every stored month of the wide tables is aggregated.
+        """
+
+        conn_lite = sqlite3.connect(self.db_path)
+        self.dollar_based_table.to_sql("dollar_based_currency", conn_lite, index=False)
+        conn_lite.close()
+        written = monthly_agg.rebuild(self.db_path, {"usd": "dollar"})
+        self.assertEqual(written["usd"], len(monthly_agg.read_monthly(self.db_path, "usd")))
+        self.assertEqual(monthly_agg.read_monthly(self.db_path, "usd", ["brl"]).month.nunique(), 13)
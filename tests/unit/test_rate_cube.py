@@ -0,0 +1,139 @@
+# Standard library
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Third party
+import numpy as np
+import pandas as pd
+
+# First party
+from src import settings
+from src.modules import columnar_store, db, long_store, rate_stats
+from src.modules.rate_cube import RateCube
+
+
+class TestRateCube(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Sample wide tables (one duplicated date, 2023-05-05 missing) and their cube.
+        """
+        cls.frames = {
+            "usd": pd.read_csv("tests/unit/sample_data/dollar_based_currency_full_table.csv"),
+            "eur": pd.read_csv("tests/unit/sample_data/euro_based_currency_full_table.csv"),
+            }
+        cls.cube = RateCube.from_frames(cls.frames, dtype="float64")
+
+    def test_from_frames(self)-> None:
+        """One calendar day per row, NaN for the days without rates, last row of a duplicated date.
+        """
+
+        cube = self.cube
+        self.assertEqual(cube.rates.shape, (2, 375, 537))
+        self.assertEqual(cube.days.dtype, np.int32)
+        self.assertEqual(str(cube.dates[0]), "2022-11-07")
+        self.assertEqual(cube.last_date("eur"), "2023-11-16")
+        self.assertFalse(cube.stored[0, cube.day_position("2023-05-05")])
+        self.assertEqual(cube.stored[0].sum(), self.frames["usd"].exchange_date.nunique())
+
+        usd_df = self.frames["usd"].drop_duplicates("exchange_date", keep="last").reset_index(drop=True)
+        pd.testing.assert_frame_equal(cube.to_frame("usd"), usd_df, check_dtype=False)
+        pd.testing.assert_frame_equal(cube.to_frame("usd", ["brl", "dkk"]), usd_df[["exchange_date", "brl", "dkk"]])
+
+        # Single base views share the rates
+        usd_cube = cube["usd"]
+        self.assertTrue(np.shares_memory(usd_cube.rates, cube.rates))
+        self.assertEqual(usd_cube.bases, ["usd"])
+        self.assertEqual(usd_cube.last_date(), "2023-11-16")
+
+        empty_cube = RateCube.from_frames({"usd": usd_df[:0]})
+        self.assertEqual(empty_cube.rates.shape, (1, 0, 537))
+        self.assertIsNone(empty_cube.last_date())
+        self.assertRaises(ValueError, RateCube, np.zeros((2, 3)), ["usd"], ["brl"], 0)
+
+    def test_lookups(self)-> None:
+        """Pairs, snapshots and columns are located without scanning the columns.
+        """
+
+        cube = self.cube
+        brl = cube.pair("usd", "brl", "2023-05-01", "2023-05-10")
+        usd_df = self.frames["usd"].drop_duplicates("exchange_date", keep="last")
+        expected = usd_df.set_index("exchange_date").brl.loc["2023-05-01":"2023-05-10"]
+        self.assertEqual(brl.tolist(), expected.tolist())
+        self.assertEqual(str(brl.index[0].date()), "2023-05-01")
+        self.assertEqual(brl.name, "brl")
+        self.assertEqual(len(cube.pair("eur", "brl")), self.frames["eur"].exchange_date.nunique())
+        self.assertTrue(cube.pair("eur", "brl", "2030-01-01").empty)
+
+        snapshot = cube.snapshot("2023-11-16")
+        self.assertEqual(snapshot.loc["eur", "brl"], self.frames["eur"].brl.iloc[-1])
+        self.assertEqual(snapshot.index.tolist(), ["usd", "eur"])
+
+        # Codes of descriptive columns point to their column
+        cube = RateCube(np.ones((1, 2, 2)), ["usd"], ["brl_brazilian_real", "dkk"], 19000)
+        self.assertEqual(cube.column("brl"), "brl_brazilian_real")
+        self.assertEqual(cube.column("brl"), rate_stats.currency_column(cube.quotes, "brl"))
+        self.assertRaises(ValueError, cube.column, "jpy")
+        self.assertRaises(ValueError, cube.pair, "eur", "dkk")
+        self.assertRaises(ValueError, cube.snapshot, "2030-01-01")
+
+    def test_window_stats(self)-> None:
+        """Same stats as the wide frame (windows count stored days).
+        """
+
+        codes = ["brl", "dkk", "jpy"]
+        usd_df = self.frames["usd"].drop_duplicates("exchange_date", keep="last")
+        pd.testing.assert_frame_equal(
+            self.cube.window_stats("usd", codes, with_mean=True),
+            rate_stats.window_stats(usd_df, codes, with_mean=True)
+            )
+
+        float32_cube = RateCube.from_frames(self.frames, dtype="float32")
+        np.testing.assert_allclose(
+            float32_cube.window_stats("eur", codes)["max"], self.cube.window_stats("eur", codes)["max"], rtol=1e-6
+            )
+
+    def test_memory(self)-> None:
+        """A float32 cube is smaller than the wide frames of the report.
+        """
+
+        codes = ["dkk", "brl", "jpy", "gbp", "cny"]
+        frames = {base: df[["exchange_date"] + codes] for base, df in self.frames.items()}
+        frames_bytes = sum(df.memory_usage(deep=True).sum() for df in frames.values())
+        self.assertLess(RateCube.from_frames(frames, dtype="float32").nbytes, frames_bytes / 2)
+        # All 537 quotes
+        frames_bytes = sum(df.memory_usage(deep=True).sum() for df in self.frames.values())
+        self.assertLess(RateCube.from_frames(self.frames).nbytes, frames_bytes * 0.6)
+
+    def test_from_db_and_columnar(self)-> None:
+        """Cubes loaded from the wide tables, the rate table and the columnar files hold the same rates.
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, "test.db")
+            conn_lite = sqlite3.connect(db_path)
+            for base, table_prefix in settings.BASED_CURRENCY_MAPPING.items():
+                self.frames[base].to_sql(table_prefix + "_based_currency", conn_lite, index=False)
+            conn_lite.close()
+            long_store.insert_wide_df(self.frames["usd"], db_path, "usd")
+            columnar_store.export(db_path, {"usd": "dollar"}, export_dir=tmp_dir, fmt="arrow")
+
+            expected = self.cube.pair("usd", "brl", "2023-06-01")
+            wide_cube = RateCube.from_db(
+                db_path, settings.BASED_CURRENCY_MAPPING, ["brl", "dkk"], since="2023-06-01", dtype="float64"
+                )
+            self.assertEqual(wide_cube.quotes, ["brl", "dkk"])
+            self.assertEqual(wide_cube.bases, ["usd", "eur"])
+            pd.testing.assert_series_equal(wide_cube.pair("usd", "brl"), expected)
+            self.assertEqual(len(RateCube.from_db(db_path, {"usd": "dollar"}).quotes), 537)
+
+            with patch.object(settings, "STORAGE_BACKEND", "long"):
+                long_cube = RateCube.from_db(db_path, {"usd": "dollar"}, ["brl"], since="2023-06-01", dtype="float64")
+            pd.testing.assert_series_equal(long_cube.pair("usd", "brl"), expected)
+
+            columnar_cube = RateCube.from_columnar(["usd"], ["brl"], "2023-06-01", tmp_dir, dtype="float64")
+            pd.testing.assert_series_equal(columnar_cube.pair("usd", "brl"), expected)
+            self.assertEqual(len(RateCube.from_columnar(["usd"], export_dir=tmp_dir).quotes), 537)
+            db.get_pool().close_all()
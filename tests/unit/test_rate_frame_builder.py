@@ -0,0 +1,70 @@
+# Standard library
+import json
+import unittest
+from datetime import datetime, timedelta
+
+# Third party
+import numpy as np
+import pandas as pd
+
+# First party
+from src.modules.rate_frame_builder import RateFrameBuilder
+
+
+class TestRateFrameBuilder(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Load a sample payload and table structure.
+        """
+        with open("tests/unit/sample_data/currencies_request_sample.json", "r") as f:
+            cls.request_sample = json.load(f)
+        cls.table_sample = pd.read_csv("tests/unit/sample_data/usd_based_currency_sample.csv")
+
+    def test_to_frame(self)-> None:
+        """Rows keep the insertion order and columns keep the table order.
+        """
+
+        columns = self.table_sample.columns.tolist()
+        builder = RateFrameBuilder(columns, n_rows=3)
+        first_day = datetime(2024, 1, 30)
+        for i in range(3):
+            builder.add(first_day + timedelta(days=i), self.request_sample["usd"])
+        currency_df = builder.to_frame()
+
+        self.assertEqual(currency_df.columns.tolist(), columns)
+        self.assertEqual(currency_df.exchange_date.tolist(), ["2024-01-30", "2024-01-31", "2024-02-01"])
+        self.assertEqual(currency_df.brl.tolist(), [self.request_sample["usd"]["brl"]] * 3)
+        # Currencies not available in the payload are NaN
+        missing_cols = [col for col in columns[1:] if col not in self.request_sample["usd"]]
+        self.assertTrue(currency_df[missing_cols].isna().all().all())
+
+    def test_irregular_payloads(self)-> None:
+        """Different keys order, unknown codes, zero and null values.
+        """
+
+        builder = RateFrameBuilder(["exchange_date", "aaa", "bbb", "ccc"], n_rows=3)
+        builder.add(datetime(2024, 1, 1), {"aaa": 1.0, "bbb": 2.0, "zzz": 9.0})
+        builder.add(datetime(2024, 1, 2), {"ccc": 3.0, "aaa": 0})
+        builder.add(datetime(2024, 1, 3), {"aaa": None, "bbb": "n/a", "ccc": 4})
+        currency_df = builder.to_frame()
+
+        np.testing.assert_array_equal(
+            currency_df[["aaa", "bbb", "ccc"]].to_numpy(),
+            [[1.0, 2.0, np.nan], [np.nan, np.nan, 3.0], [np.nan, np.nan, 4.0]]
+            )
+
+    def test_add_new_columns(self)-> None:
+        """Codes missing in the columns get a new column instead of being dropped.
+        """
+
+        builder = RateFrameBuilder(["exchange_date", "aaa"], n_rows=3, add_new_columns=True)
+        builder.add(datetime(2024, 1, 1), {"aaa": 1.0})
+        builder.add(datetime(2024, 1, 2), {"aaa": 2.0, "zzz": 9.0})
+        builder.add(datetime(2024, 1, 3), {"yyy": 5.0, "aaa": 3.0, "zzz": 8.0})
+        currency_df = builder.to_frame()
+
+        self.assertEqual(currency_df.columns.tolist(), ["exchange_date", "aaa", "zzz", "yyy"])
+        np.testing.assert_array_equal(
+            currency_df[["aaa", "zzz", "yyy"]].to_numpy(),
+            [[1.0, np.nan, np.nan], [2.0, 9.0, np.nan], [3.0, 8.0, 5.0]]
+            )
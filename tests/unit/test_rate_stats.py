@@ -0,0 +1,58 @@
+# Standard library
+import unittest
+
+# Third party
+import numpy as np
+import pandas as pd
+
+# First party
+from src.modules import rate_stats
+
+
+class TestRateStats(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """
+        """
+        cls.dollar_based_table = pd.read_csv(
+            "tests/unit/sample_data/dollar_based_currency_full_table.csv"
+            )
+
+    def test_window_stats(self)-> None:
+        """Every window matches min/max of the reversed slices, one row per currency and window.
+        """
+
+        codes = ["brl", "dkk", "eur"]
+        stats_df = rate_stats.window_stats(self.dollar_based_table, codes, with_mean=True)
+
+        self.assertEqual(len(stats_df), len(codes) * len(rate_stats.REPORT_WINDOWS))
+        self.assertEqual(stats_df.currency.unique().tolist(), codes)
+        for row in stats_df.itertuples():
+            last_days = self.dollar_based_table[row.column].iloc[::-1][:row.days]
+            self.assertEqual(row.current, last_days.iloc[0])
+            self.assertEqual(row.min, last_days.min())
+            self.assertEqual(row.max, last_days.max())
+            self.assertAlmostEqual(row.mean, last_days.mean())
+            self.assertAlmostEqual(row.std, last_days.std(), places=6)
+
+    def test_window_stats_nan(self)-> None:
+        """Missing rates are ignored, windows longer than the data use every day.
+        """
+
+        currency_df = pd.DataFrame(
+            {"exchange_date": ["2024-01-01", "2024-01-02", "2024-01-03"], "abc_name": [1.0, 3.0, np.nan]}
+            )
+        stats_df = rate_stats.window_stats(currency_df, ["abc"], windows={"short": 2, "long": 10})
+
+        self.assertTrue(np.isnan(stats_df.current[0]))
+        self.assertEqual(stats_df["min"].tolist(), [3.0, 1.0])
+        self.assertEqual(stats_df["max"].tolist(), [3.0, 3.0])
+        self.assertNotIn("mean", stats_df.columns)
+
+    def test_currency_column(self)-> None:
+        """
+        """
+
+        self.assertEqual(rate_stats.currency_column(["exchange_date", "brl"], "brl"), "brl")
+        with self.assertRaises(ValueError):
+            rate_stats.currency_column(["exchange_date"], "brl")
@@ -0,0 +1,78 @@
+# Standard library
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Third party
+import numpy as np
+
+# First party
+from src import settings
+from src.modules import render_cache
+
+
+class TestRenderCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp_dir.name, "report")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_fingerprint(self)-> None:
+        """Same values same fingerprint, NaN included, dates and shapes matter.
+        """
+
+        rates = np.array([1.0, np.nan, 3.0], dtype=np.float32)
+        dates = np.array(["2023-11-15", "2023-11-16", "2023-11-17"], dtype=object)
+        self.assertEqual(render_cache.fingerprint(dates, rates), render_cache.fingerprint(dates, rates.astype(float)))
+        self.assertNotEqual(render_cache.fingerprint(dates, rates), render_cache.fingerprint(dates, rates[::-1]))
+        self.assertNotEqual(render_cache.fingerprint(rates), render_cache.fingerprint(rates.reshape(3, 1)))
+        self.assertNotEqual(render_cache.cache_key("brl", "Dollar"), render_cache.cache_key("brlD", "ollar"))
+
+    def test_put_get(self)-> None:
+        """Entries are read back, misses and hits are counted, temporary files are not entries.
+        """
+
+        cache = render_cache.RenderCache(self.cache_dir, 1024)
+        key = render_cache.cache_key("brl")
+        self.assertIsNone(cache.get(key, "png"))
+        self.assertFalse(cache.contains(key, "png"))
+        cache.put(key, "png", b"chart")
+        cache.put(key, "png", b"chart v2")
+        self.assertTrue(cache.contains(key, "png"))
+        self.assertEqual(cache.get(key, "png"), b"chart v2")
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "writes": 2, "evictions": 0, "bytes": 8})
+
+        # Size of the entries already stored is read at start
+        with open(os.path.join(self.cache_dir, "partial.tmp"), "wb") as f:
+            f.write(b"partial")
+        self.assertEqual(render_cache.RenderCache(self.cache_dir, 1024).size, 8)
+
+    def test_evict(self)-> None:
+        """Least recently used entries are removed first once over max_bytes.
+        """
+
+        cache = render_cache.RenderCache(self.cache_dir, 10)
+        keys = [render_cache.cache_key(code) for code in ["brl", "jpy", "dkk"]]
+        cache.put(keys[0], "png", b"1234")
+        cache.put(keys[1], "png", b"1234")
+        os.utime(cache.path(keys[0], "png"), (0, 0))
+        os.utime(cache.path(keys[1], "png"), (1, 1))
+        cache.get(keys[0], "png")  # Used again, now the most recent
+        cache.put(keys[2], "png", b"1234")
+
+        self.assertEqual([cache.contains(key, "png") for key in keys], [True, False, True])
+        self.assertEqual(cache.stats()["bytes"], 8)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_from_settings(self)-> None:
+        """Disabled without REPORT_CACHE_DIR.
+        """
+
+        with patch.object(settings, "REPORT_CACHE_DIR", None):
+            self.assertIsNone(render_cache.from_settings())
+        with patch.object(settings, "REPORT_CACHE_DIR", self.cache_dir):
+            cache = render_cache.from_settings()
+        self.assertEqual((cache.cache_dir, cache.max_bytes), (self.cache_dir, settings.REPORT_CACHE_MAX_BYTES))
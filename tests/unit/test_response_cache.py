@@ -0,0 +1,114 @@
+# Standard library
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+# First party
+from src import settings
+from src.modules import response_cache
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        """Each test gets an empty cache directory.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = response_cache.ResponseCache(self.tmp_dir.name, max_bytes=10 * 1024**2)
+        self.day = datetime(2024, 2, 18)
+        self.payload = {"date": "2024-02-18", "usd": {"brl": 4.96, "eur": 0.92}}
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_put_get(self)-> None:
+        """Payloads are stored compressed and read back.
+        """
+
+        self.assertIsNone(self.cache.get(self.day, "usd"))
+        self.cache.put(self.day, "usd", self.payload)
+        self.assertEqual(self.cache.get(self.day, "usd"), self.payload)
+        self.assertIsNone(self.cache.get(self.day, "eur"))
+        self.assertTrue(self.cache.path(self.day, "usd").endswith(".json.gz"))
+
+        # Size is restored from disk
+        cache = response_cache.ResponseCache(self.tmp_dir.name, max_bytes=10 * 1024**2)
+        self.assertEqual(cache.stats()["bytes"], self.cache.stats()["bytes"])
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 2)
+
+        # Overwriting keeps the size right
+        self.cache.put(self.day, "usd", self.payload)
+        self.assertEqual(cache.stats()["bytes"], self.cache.stats()["bytes"])
+
+    def test_skip_today(self)-> None:
+        """Today (and latest) may still change, they are never cached.
+        """
+
+        self.cache.put(datetime.today(), "usd", self.payload)
+        self.assertIsNone(self.cache.get(datetime.today(), "usd"))
+        self.assertEqual(self.cache.stats()["writes"], 0)
+
+    def test_corrupted_entry(self)-> None:
+        """A corrupted file is a miss.
+        """
+
+        path = self.cache.path(self.day, "usd")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"not gzip")
+        self.assertIsNone(self.cache.get(self.day, "usd"))
+
+    def test_truncated_entry(self)-> None:
+        """A truncated gzip file (EOFError) is a miss.
+        """
+
+        self.cache.put(self.day, "usd", self.payload)
+        path = self.cache.path(self.day, "usd")
+        with open(path, "rb") as f:
+            content = f.read()
+        with open(path, "wb") as f:
+            f.write(content[: len(content) // 2])
+        self.assertIsNone(self.cache.get(self.day, "usd"))
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_entry_evicted_after_read(self)-> None:
+        """An entry removed by a concurrent eviction between the read and the LRU touch is still a hit.
+        """
+
+        self.cache.put(self.day, "usd", self.payload)
+        with patch("src.modules.file_cache.os.utime", side_effect=FileNotFoundError):
+            self.assertEqual(self.cache.get(self.day, "usd"), self.payload)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_lru_eviction(self)-> None:
+        """Least recently used entries are evicted above max_bytes.
+        """
+
+        days = [self.day - timedelta(days=i) for i in range(3)]
+        for day in days:
+            self.cache.put(day, "usd", self.payload)
+        entry_size = os.path.getsize(self.cache.path(days[0], "usd"))
+        # Use the oldest entry, so the second one becomes the least recently used
+        time.sleep(0.01)
+        self.cache.get(days[0], "usd")
+
+        self.cache.max_bytes = entry_size * 3
+        time.sleep(0.01)
+        self.cache.put(self.day - timedelta(days=3), "usd", self.payload)
+
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+        self.assertIsNone(self.cache.get(days[1], "usd"))
+        self.assertIsNotNone(self.cache.get(days[0], "usd"))
+        self.assertLessEqual(self.cache.stats()["bytes"], self.cache.max_bytes)
+
+    def test_from_settings(self)-> None:
+        """Cache can be disabled from settings.
+        """
+
+        with patch.object(settings, "RESPONSE_CACHE_DIR", None):
+            self.assertIsNone(response_cache.from_settings())
+        with patch.object(settings, "RESPONSE_CACHE_DIR", self.tmp_dir.name):
+            self.assertIsInstance(response_cache.from_settings(), response_cache.ResponseCache)
@@ -0,0 +1,54 @@
+# Standard library
+import unittest
+
+# First party
+from src.modules import http_client
+from src.modules.stub_api import StubCurrencyAPI, synthetic_rates
+
+
+class TestStubApi(unittest.TestCase):
+    def test_synthetic_payloads(self)-> None:
+        """Without a payload, rates are generated per date and base, the currency list is served too.
+        """
+
+        client = http_client.HttpClient(max_retries=0)
+        with StubCurrencyAPI(n_currencies=3) as stub:
+            currencies = client.get(f"{stub.base_url}@latest/v1/currencies.json").json()
+            payload = client.get(f"{stub.base_url}@2024.1.1/v1/currencies/eur.json").json()
+            other_day = client.get(f"{stub.base_url}@2024.1.2/v1/currencies/eur.json").json()
+        client.close()
+
+        self.assertEqual(list(currencies), ["c000", "c001", "c002"])
+        self.assertEqual(payload, {"date": "2024.1.1", "eur": synthetic_rates("2024.1.1", "eur", list(currencies))})
+        self.assertNotEqual(payload["eur"], other_day["eur"])
+        # Only dated rates are recorded
+        self.assertEqual(stub.requested_dates, ["2024.1.1", "2024.1.2"])
+
+    def test_error_rate(self)-> None:
+        """A seeded share of the requests fails.
+        """
+
+        client = http_client.HttpClient(max_retries=0)
+        with StubCurrencyAPI(n_currencies=3, error_rate=0.3, seed=1) as stub:
+            statuses = [
+                client.get(f"{stub.base_url}@2024.1.{day}/v1/currencies/usd.json").status_code for day in range(1, 31)
+                ]
+        client.close()
+
+        self.assertEqual(statuses.count(503), stub.error_count)
+        self.assertTrue(0 < stub.error_count < 30)
+
+    def test_missing_dates(self)-> None:
+        """Missing dates are answered with missing_status, unknown paths with 404.
+        """
+
+        client = http_client.HttpClient(max_retries=0)
+        with StubCurrencyAPI(n_currencies=3, missing_dates={"2024.1.1"}, missing_status=503) as stub:
+            statuses = [
+                client.get(f"{stub.base_url}@2024.1.1/v1/currencies/usd.json").status_code,
+                client.get(f"{stub.base_url}@2024.1.2/v1/currencies/usd.json").status_code,
+                client.get(f"{stub.base_url}@2024.1.2/v1/unknown.json").status_code,
+                ]
+        client.close()
+
+        self.assertEqual(statuses, [503, 200, 404])
@@ -0,0 +1,155 @@
+# Standard library
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+# Third party
+import pandas as pd
+
+# First party
+from src import settings
+from src.modules import db, long_store, sync_planner, update_currency_exchange
+from src.modules.stub_api import StubCurrencyAPI
+
+
+class TestSyncPlanner(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Sample wide table with holes (every 10th day removed, the sample also misses a day).
+        """
+        dollar_df = pd.read_csv("tests/unit/sample_data/dollar_based_currency_full_table.csv")
+        dollar_df = dollar_df.drop_duplicates("exchange_date").reset_index(drop=True)
+        cls.dollar_df = dollar_df[~dollar_df.index.isin(range(5, len(dollar_df), 10))]
+        calendar = pd.date_range("2022-11-07", "2023-11-16").strftime("%Y-%m-%d")
+        cls.holes = calendar[~calendar.isin(cls.dollar_df.exchange_date)].tolist()
+
+    def setUp(self):
+        """Each test gets a db with the sample table.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "test.db")
+        conn_lite = sqlite3.connect(self.db_path)
+        self.dollar_df.to_sql("dollar_based_currency", conn_lite, index=False)
+        conn_lite.close()
+
+    def tearDown(self):
+        db.get_pool().close_all()
+        self.tmp_dir.cleanup()
+
+    def test_plan(self)-> None:
+        """Every missing day of the range (and only those) is planned.
+        """
+
+        sync_plan = sync_planner.plan(
+            self.db_path, {"usd": "dollar", "eur": "euro"}, datetime(2022, 11, 7), datetime(2023, 11, 16)
+            )
+        self.assertEqual([day.strftime("%Y-%m-%d") for day in sync_plan["usd"]], self.holes)
+        # No table yet, every day is missing
+        self.assertEqual(len(sync_plan["eur"]), 375)
+        self.assertEqual(sync_planner.union_days(sync_plan), sync_plan["eur"])
+
+        # Default range: holes older than DEFAULT_LOOKBACK_DAYS are no longer served by the API
+        sync_plan = sync_planner.plan(self.db_path, {"usd": "dollar", "eur": "euro"})
+        default_since = datetime.today() - timedelta(days=sync_planner.DEFAULT_LOOKBACK_DAYS)
+        self.assertEqual(sync_plan["usd"][0].date(), default_since.date())
+        self.assertEqual(sync_plan["usd"][-1].date(), datetime.today().date())
+        self.assertEqual(len(sync_plan["usd"]), sync_planner.DEFAULT_LOOKBACK_DAYS + 1)
+        # Without data, at most DEFAULT_LOOKBACK_DAYS are available
+        self.assertEqual(len(sync_plan["eur"]), sync_planner.DEFAULT_LOOKBACK_DAYS + 1)
+
+        # A recent first stored date starts the range
+        recent_days = [datetime.today() - timedelta(days=n) for n in [10, 5]]
+        conn_lite = sqlite3.connect(self.db_path)
+        self.dollar_df[:2].assign(exchange_date=[day.strftime("%Y-%m-%d") for day in recent_days]).to_sql(
+            "euro_based_currency", conn_lite, index=False
+            )
+        conn_lite.close()
+        sync_plan = sync_planner.plan(self.db_path, {"eur": "euro"})
+        self.assertEqual(sync_plan["eur"][0].date(), (recent_days[0] + timedelta(days=1)).date())
+        self.assertEqual(len(sync_plan["eur"]), 9)
+
+    def test_plan_long_backend(self)-> None:
+        """Missing days are computed per base in the rate table.
+        """
+
+        long_store.insert_wide_df(self.dollar_df, self.db_path, "usd")
+        with patch.object(settings, "STORAGE_BACKEND", "long"):
+            sync_plan = sync_planner.plan(
+                self.db_path, {"usd": "dollar", "eur": "euro"}, datetime(2023, 1, 1), datetime(2023, 11, 16)
+                )
+            default_plan = sync_planner.plan(self.db_path, {"eur": "euro"})
+        self.assertEqual(
+            [day.strftime("%Y-%m-%d") for day in sync_plan["usd"]], [day for day in self.holes if day >= "2023"]
+            )
+        self.assertEqual(len(sync_plan["eur"]), 320)
+        self.assertEqual(len(default_plan["eur"]), sync_planner.DEFAULT_LOOKBACK_DAYS + 1)
+
+    def test_calendar_query_uses_index(self)-> None:
+        """The anti-join is an index lookup per calendar day.
+        """
+
+        with db.connection(self.db_path) as conn_lite:
+            sync_planner.missing_dates(conn_lite, "2023-01-01", "2023-01-31", "dollar_based_currency")
+            plan = conn_lite.execute(
+                f"""EXPLAIN QUERY PLAN {sync_planner.CALENDAR_CTE} SELECT day FROM calendar
+                WHERE NOT EXISTS (SELECT 1 FROM dollar_based_currency WHERE exchange_date = calendar.day)""",
+                ("2023-01-01", "2023-01-31"),
+                ).fetchall()
+        self.assertTrue(any("ux_dollar_based_currency_exchange_date" in row[-1] for row in plan))
+
+    def test_sync_fills_gaps(self)-> None:
+        """A sync requests exactly the missing days and leaves the table gap free.
+        """
+
+        with open("tests/unit/sample_data/currencies_request_sample.json", "r") as f:
+            request_sample = json.load(f)
+        with (StubCurrencyAPI(request_sample) as stub,
+              patch.object(settings, "API_BASE_URL", stub.base_url),
+              patch.object(settings, "RESPONSE_CACHE_DIR", None)):
+            update_currency_exchange.etl_pipeline(
+                {"usd": "dollar"}, self.db_path, since=datetime(2022, 11, 7), until=datetime(2023, 11, 16)
+                )
+        self.assertEqual(stub.request_count, len(self.holes))
+        self.assertEqual(
+            sync_planner.plan(self.db_path, {"usd": "dollar"}, datetime(2022, 11, 7), datetime(2023, 11, 16)),
+            {"usd": []}
+            )
+
+    @patch.object(settings, "RESPONSE_CACHE_DIR", None)
+    @patch.object(settings, "ETL_BATCH_DAYS", 2)
+    def test_sync_skips_unavailable_days(self)-> None:
+        """A hole the API no longer serves (404) is skipped, the recent days of the next batches still land.
+        """
+
+        with open("tests/unit/sample_data/currencies_request_sample.json", "r") as f:
+            request_sample = json.load(f)
+        today = datetime.today()
+        # Every day of the last year is stored up to 3 days ago, but for a 2 days hole
+        stored_days = [
+            (today - timedelta(days=n)).strftime("%Y-%m-%d")
+            for n in range(3, sync_planner.DEFAULT_LOOKBACK_DAYS + 1)
+            if n not in (99, 100)
+            ]
+        conn_lite = sqlite3.connect(self.db_path)
+        pd.concat([self.dollar_df[:1]] * len(stored_days)).assign(exchange_date=stored_days).to_sql(
+            "dollar_based_currency", conn_lite, index=False, if_exists="append"
+            )
+        conn_lite.close()
+        # The hole and the day before it are not served
+        unavailable_dates = {(today - timedelta(days=n)).strftime("%Y.%-m.%-d") for n in (99, 100, 101)}
+
+        with (StubCurrencyAPI(request_sample, missing_dates=unavailable_dates) as stub,
+              patch.object(settings, "API_BASE_URL", stub.base_url)):
+            update_currency_exchange.etl_pipeline({"usd": "dollar"}, self.db_path)
+
+        # 2 requests per hole day (day and previous day), then the last 3 days
+        self.assertEqual(stub.request_count, 7)
+        # Only the hole is still missing
+        self.assertEqual(
+            [day.strftime("%Y-%m-%d") for day in sync_planner.plan(self.db_path, {"usd": "dollar"})["usd"]],
+            [(today - timedelta(days=n)).strftime("%Y-%m-%d") for n in (100, 99)]
+            )
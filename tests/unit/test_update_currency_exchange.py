@@ -1,20 +1,25 @@
 # Standard library
 import json
+import sqlite3
+import tempfile
 import unittest
 from datetime import datetime, timedelta
+from time import perf_counter
 from typing import Optional
-from unittest.mock import Mock, patch
+from unittest.mock import MagicMock, Mock, patch
 
 # Third party
 import pandas as pd
 
 # First party
 from src import settings
-from src.modules import update_currency_exchange
+from src.modules import columnar_store, currency_catalog, db, http_client, monthly_agg, sync_planner, update_currency_exchange
+from src.modules.response_cache import ResponseCache
+from src.modules.stub_api import StubCurrencyAPI
 
 
 class MockRequests:
-    """Mock requests.get(url)
+    """Mock http_client.get(url)
     """
     def __init__(self,status_code:int,json_file:Optional[dict]=None) -> None:
         self.status_code = status_code
@@ -27,27 +32,27 @@ class TestUodateCurrencyExchange(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         """Mock libs used several times.
-        * sqlite3 connection.
+        * pooled db connection.
         * pandas (for sql operations)
         * first party func check_table (return sample df)
         """
 
         cls.mock_sqlite3_conn= Mock()
-        cls.mock_sqlite3= Mock()
-        cls.mock_sqlite3.connect.return_value = cls.mock_sqlite3_conn
-        cls.mock_sqlite3_conn.close.return_value = None
+        cls.mock_db= MagicMock()
+        cls.mock_db.connection.return_value.__enter__.return_value = cls.mock_sqlite3_conn
 
         cls.pandas_sql_mock = Mock()
         cls.pandas_sql_mock.read_sql_query.return_value = pd.DataFrame()
         cls.pandas_sql_mock.to_sql.return_value= None
 
+        cls.mock_plan = Mock(return_value={"usd": [datetime(2024, 1, 1)], "eur": [datetime(2024, 1, 2)]})
+
         cls.mock_check_table = Mock()
         cls.table_sample = pd.read_csv("tests/unit/sample_data/usd_based_currency_sample.csv")
         cls.mock_check_table.return_value = cls.table_sample.drop(cls.table_sample.index) # Drop data, keep structure
         
-    @patch("src.modules.update_currency_exchange.sqlite3")
-    @patch("src.modules.update_currency_exchange.requests")
-    def test_create_table_currency_exchange(self, mock_requests, mock_sqlite3)-> None:
+    @patch("src.modules.update_currency_exchange.http_client")
+    def test_create_table_currency_exchange(self, mock_requests)-> None:
         """Test update_currency_exchange.create_table_currency_exchange.
         """
 
@@ -59,17 +64,24 @@ class TestUodateCurrencyExchange(unittest.TestCase):
             } # Small sample of expected result
         mock_requests.get.return_value = MockRequests(status_code = 200,json_file = all_currency_sample)
 
-        empty_currency_df = update_currency_exchange.create_table_currency_exchange("db_path","table_name")
-        self.assertEqual(
-            empty_currency_df.columns.tolist(),
-            ["exchange_date", 'afn', 'agix', 'agld', 'aioz']
-            )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = tmp_dir + "/test.db"
+            empty_currency_df = update_currency_exchange.create_table_currency_exchange(db_path, "table_name")
+            self.assertEqual(
+                empty_currency_df.columns.tolist(),
+                ["exchange_date", 'afn', 'agix', 'agld', 'aioz']
+                )
+            # Names are kept in the catalog, the API is not requested for the next tables
+            update_currency_exchange.create_table_currency_exchange(db_path, "other_table_name")
+            mock_requests.get.assert_called_once()
+            self.assertEqual(currency_catalog.read_catalog(db_path).name.tolist(), list(all_currency_sample.values()))
+            db.get_pool().close_all()
 
     def test_last_exchange_date(self)-> None:
         """Test last_exchange_date func.
         """
 
-        with patch("src.modules.update_currency_exchange.sqlite3", self.mock_sqlite3):
+        with patch("src.modules.update_currency_exchange.db", self.mock_db):
             last_update_date = update_currency_exchange.last_exchange_date("db_path","table_name")
         
         # Without mocking pd.read_sql_query the query will fail and should return last date as 1 year ago.
@@ -84,7 +96,7 @@ class TestUodateCurrencyExchange(unittest.TestCase):
         
         self.pandas_sql_mock.read_sql_query.return_value = pd.DataFrame({"last_update_date":[mock_last_date]})
 
-        with (patch("src.modules.update_currency_exchange.sqlite3", self.mock_sqlite3),
+        with (patch("src.modules.update_currency_exchange.db", self.mock_db),
               patch("src.modules.update_currency_exchange.pd", self.pandas_sql_mock)):
             last_update_date = update_currency_exchange.last_exchange_date("db_path","table_name")
 
@@ -96,14 +108,14 @@ class TestUodateCurrencyExchange(unittest.TestCase):
         """Test update_currency_exchange.get_currency_exchange.
         """
 
-        mock_requests= Mock()
+        mock_requests= MagicMock()
 
         request_sample_json = open("tests/unit/sample_data/currencies_request_sample.json", "r")
         request_sample = json.load(request_sample_json)
         mock_requests.get.return_value = MockRequests(status_code = 200,json_file = request_sample)
 
         # Ususal case
-        with (patch("src.modules.update_currency_exchange.requests", mock_requests),
+        with (patch("src.modules.update_currency_exchange.http_client", mock_requests),
               patch("src.modules.update_currency_exchange.check_table", self.mock_check_table)):
             currency_df = update_currency_exchange.get_currency_exchange(
                 db_path= "db_path",
@@ -111,7 +123,8 @@ class TestUodateCurrencyExchange(unittest.TestCase):
                 based_currency = "usd",
                 since_date = (datetime.today() - timedelta(days=1))
                 )
-            self.assertEqual(currency_df.columns.tolist(), self.table_sample.columns.tolist())
+            # Codes of the payload missing in the table come last
+            self.assertEqual(currency_df.columns.tolist(), self.table_sample.columns.tolist() + ["miota"])
     
         # Requesting with db alredy updated
         currency_df = update_currency_exchange.get_currency_exchange(
@@ -127,7 +140,7 @@ class TestUodateCurrencyExchange(unittest.TestCase):
         # In this case, we will take the data from the previous day.
         # We will raise an error only if we have two missing days.
         mock_requests.get.return_value = MockRequests(status_code = 503,json_file = None)
-        with (patch("src.modules.update_currency_exchange.requests", mock_requests),
+        with (patch("src.modules.update_currency_exchange.http_client", mock_requests),
                 patch("src.modules.update_currency_exchange.check_table", self.mock_check_table)):
             self.assertRaises(
                 Exception,
@@ -138,42 +151,338 @@ class TestUodateCurrencyExchange(unittest.TestCase):
                 (datetime.today() - timedelta(days=1))
                 )
 
+    def test_get_currency_exchange_concurrent(self)->None:
+        """Test update_currency_exchange.get_currency_exchange against a local stub API.
+        * Rows must keep the date order
+        * Missing days fall back to the previous day
+        * Wall time should scale down with the number of workers
+        """
+
+        with open("tests/unit/sample_data/currencies_request_sample.json", "r") as f:
+            request_sample = json.load(f)
+        since_date = datetime.today() - timedelta(days=12)
+        missing_day = (since_date + timedelta(days=5)).strftime("%Y.%-m.%-d")
+
+        elapsed = {}
+        for max_workers in [1, 6]:
+            with (StubCurrencyAPI(request_sample, latency=0.1, missing_dates={missing_day}) as stub,
+                  patch.object(settings, "API_BASE_URL", stub.base_url),
+                  patch("src.modules.update_currency_exchange.check_table", self.mock_check_table)):
+                t_start = perf_counter()
+                currency_df = update_currency_exchange.get_currency_exchange(
+                    db_path= "db_path",
+                    table_name = "table_name",
+                    based_currency = "usd",
+                    since_date = since_date,
+                    max_workers = max_workers
+                    )
+                elapsed[max_workers] = perf_counter() - t_start
+
+            expected_dates = update_currency_exchange.date_range(since_date)
+            self.assertEqual(len(currency_df), 12)
+            self.assertEqual(
+                currency_df.exchange_date.tolist(),
+                [day.strftime("%Y-%m-%d") for day in expected_dates]
+                )
+            self.assertNotIn(missing_day, stub.requested_dates)
+            self.assertEqual(currency_df.iloc[5]["brl"], request_sample["usd"]["brl"])
+
+        self.assertLess(elapsed[6], elapsed[1] / 2)
+
+    def test_fetch_with_response_cache(self)->None:
+        """A second fetch of the same past days should not reach the network.
+        """
+
+        with open("tests/unit/sample_data/currencies_request_sample.json", "r") as f:
+            request_sample = json.load(f)
+        days = update_currency_exchange.date_range(
+            datetime.today() - timedelta(days=6),
+            datetime.today() - timedelta(days=1)
+            )
+        missing_day = days[2].strftime("%Y.%-m.%-d")
+        columns = self.table_sample.columns.tolist()
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = ResponseCache(cache_dir, max_bytes=10 * 1024**2)
+            with (StubCurrencyAPI(request_sample, missing_dates={missing_day}) as stub,
+                  patch.object(settings, "API_BASE_URL", stub.base_url)):
+                first_df = update_currency_exchange.fetch_rates_frame(days, "usd", columns, 1, cache)
+                self.assertEqual(cache.stats()["writes"], 4)
+
+                # Missing day still asks the API, then takes the previous day from the cache
+                second_df = update_currency_exchange.fetch_rates_frame(days, "usd", columns, cache=cache)
+                self.assertEqual(len(stub.requested_dates), 4)
+
+            # Offline
+            with patch("src.modules.update_currency_exchange.http_client") as mock_http_client:
+                offline_days = [day for day in days if day.strftime("%Y.%-m.%-d") != missing_day]
+                offline_df = update_currency_exchange.fetch_rates_frame(offline_days, "usd", columns, cache=cache)
+                mock_http_client.get.assert_not_called()
+
+        pd.testing.assert_frame_equal(first_df, second_df)
+        self.assertEqual(len(offline_df), 4)
+
     def test_check_table(self)->None:
         """Test update_currency_exchange.check_table.
         """
 
-        with (patch("src.modules.update_currency_exchange.sqlite3", self.mock_sqlite3),
-                patch("src.modules.update_currency_exchange.pd", self.pandas_sql_mock)):
-            sample_df = update_currency_exchange.check_table("db_path","table_name")
-            self.assertIsInstance(sample_df,pd.DataFrame)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = tmp_dir + "/test.db"
+            mock_create_table = Mock(return_value=pd.DataFrame())
+            with patch("src.modules.update_currency_exchange.create_table_currency_exchange", mock_create_table):
+                sample_df = update_currency_exchange.check_table(db_path, "table_name")
+            self.assertIsInstance(sample_df, pd.DataFrame)
+            mock_create_table.assert_called_once_with(db_path=db_path, table_name="table_name")
 
-        mock_create_table = Mock()
-        mock_create_table.return_value = pd.DataFrame()
-        with patch("src.modules.update_currency_exchange.create_table_currency_exchange", mock_create_table):
-            sample_df = update_currency_exchange.check_table("db_path","table_name")     
-            self.assertIsInstance(sample_df,pd.DataFrame)
+            self.table_sample.to_sql("table_name", db.get_pool().get(db_path), index=False)
+            # Columns are read once
+            with patch("src.modules.currency_catalog.read_schema", wraps=currency_catalog.read_schema) as mock_read:
+                for _ in range(3):
+                    sample_df = update_currency_exchange.check_table(db_path, "table_name")
+            mock_read.assert_called_once()
+            self.assertTrue(sample_df.empty)
+            self.assertEqual(sample_df.columns.tolist(), self.table_sample.columns.tolist())
+            db.get_pool().close_all()
 
-    @patch("src.modules.update_currency_exchange.sqlite3")
-    @patch("src.modules.update_currency_exchange.pd.DataFrame.to_sql")
+    @patch("src.modules.update_currency_exchange.migrations.ensure_unique_dates", Mock(return_value=[]))
+    @patch("src.modules.update_currency_exchange.currency_catalog.record_seen", Mock())
+    @patch("src.modules.update_currency_exchange.db", MagicMock())
+    @patch("src.modules.update_currency_exchange.bulk_write.insert_df")
     @patch("src.modules.update_currency_exchange.check_table")
-    def test_insert_df_sqlite(self,m1, m2, m3)->None:
+    def test_insert_df_sqlite(self, mock_check_table, mock_insert_df)->None:
         """Test update_currency_exchange.insert_df_sqlite 
         """
+        mock_check_table.return_value = self.table_sample[:0]
         update_currency_exchange.insert_df_sqlite(
             df =self.table_sample,
             db_path= 'db_path',
             table_name = 'table_name'
             )
+        mock_insert_df.assert_called_once()
     
-    @patch("src.modules.update_currency_exchange.get_currency_exchange")
-    @patch("src.modules.update_currency_exchange.insert_df_sqlite")      
-    def test_etl(self, m1, mock_get_currency_exchange)->None:
+    def test_insert_df_sqlite_upsert(self)->None:
+        """Inserting the same days twice keeps one row per day with the latest rates.
+        """
+
+        dollar_df = pd.read_csv("tests/unit/sample_data/dollar_based_currency_full_table.csv")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = tmp_dir + "/test.db"
+            # Table created before the unique index, with its duplicated day
+            conn_lite = sqlite3.connect(db_path)
+            dollar_df.to_sql("dollar_based_currency", conn_lite, index=False)
+            conn_lite.close()
+
+            update_currency_exchange.insert_df_sqlite(dollar_df[-10:], db_path, "dollar_based_currency", "usd")
+            update_currency_exchange.insert_df_sqlite(
+                dollar_df[-10:].assign(brl=1.0), db_path, "dollar_based_currency", "usd"
+                )
+
+            conn_lite = sqlite3.connect(db_path)
+            stored_df = pd.read_sql_query("SELECT exchange_date, brl FROM dollar_based_currency", conn_lite)
+            conn_lite.close()
+            self.assertEqual(len(stored_df), dollar_df.exchange_date.nunique())
+            self.assertTrue((stored_df[stored_df.exchange_date.isin(dollar_df.exchange_date[-10:])].brl == 1.0).all())
+            self.assertEqual(
+                monthly_agg.read_monthly(db_path, "usd", ["brl"])["min"].iloc[-1], 1.0
+                )
+
+    @patch("src.modules.update_currency_exchange.table_columns", Mock(return_value=["exchange_date", "brl"]))
+    @patch("src.modules.update_currency_exchange.fetch_rate_batches")
+    @patch("src.modules.update_currency_exchange.insert_df_sqlite")
+    def test_etl(self, mock_insert, mock_fetch_rate_batches)->None:
         """Testes run and etl_pipeline.
         """
 
-        mock_get_currency_exchange.return_value = self.table_sample
+        batch_df = pd.DataFrame({"exchange_date": ["2024-01-01"], "brl": [5.0]})
+        mock_fetch_rate_batches.side_effect = lambda *args, **kwargs: iter([batch_df])
+
+        with (tempfile.TemporaryDirectory() as cache_dir,
+              patch.object(settings, "RESPONSE_CACHE_DIR", cache_dir),
+              patch("src.modules.update_currency_exchange.sync_planner.plan", self.mock_plan)):
+            update_currency_exchange.etl_pipeline(
+                based_currency_mapping = settings.BASED_CURRENCY_MAPPING,
+                db_path = 'db_path'
+                )
+        self.assertIsInstance(mock_fetch_rate_batches.call_args.kwargs["cache"], ResponseCache)
+        # Each base fetches its own missing days
+        self.assertEqual(mock_fetch_rate_batches.call_args.args[0], self.mock_plan.return_value["eur"])
+        self.assertEqual(mock_insert.call_count, 2)
+
+        # Nothing to fetch
+        update_currency_exchange.run("db_path", "usd", "dollar", days=[])
+        self.assertEqual(mock_fetch_rate_batches.call_count, 2)
+
+    def test_run_resumes_after_failure(self)->None:
+        """Batches committed before a failure are kept (and exported), the next run only fetches the rest.
+        """
+
+        with open("tests/unit/sample_data/currencies_request_sample.json", "r") as f:
+            request_sample = json.load(f)
+        dollar_df = pd.read_csv("tests/unit/sample_data/dollar_based_currency_full_table.csv")
+        days = update_currency_exchange.date_range(datetime(2023, 12, 31), datetime(2024, 1, 20))
+        # Two failing days in a row cannot fall back to the previous day (an outage, retried by the next run)
+        missing_dates = {"2024.1.13", "2024.1.14"}
 
-        update_currency_exchange.etl_pipeline(
-            based_currency_mapping = settings.BASED_CURRENCY_MAPPING,
-            db_path = 'db_path'
+        with (tempfile.TemporaryDirectory() as tmp_dir,
+              patch.object(settings, "RESPONSE_CACHE_DIR", None),
+              patch.object(settings, "COLUMNAR_EXPORT_FORMAT", "parquet"),
+              patch.object(settings, "COLUMNAR_EXPORT_DIR", tmp_dir + "/columnar")):
+            db_path = tmp_dir + "/test.db"
+            conn_lite = sqlite3.connect(db_path)
+            dollar_df[:0].to_sql("dollar_based_currency", conn_lite, index=False)
+            conn_lite.close()
+
+            with (StubCurrencyAPI(request_sample, missing_dates=missing_dates, missing_status=503) as stub,
+                  patch.object(settings, "API_BASE_URL", stub.base_url),
+                  patch.object(http_client.get_client(), "backoff_factor", 0)):
+                with self.assertRaises(Exception):
+                    update_currency_exchange.run(db_path, "usd", "dollar", days=days, batch_days=5)
+            plan = sync_planner.plan(db_path, {"usd": "dollar"}, days[0], days[-1])
+            # Batches of 5 days: the first two were committed, the third failed
+            self.assertEqual(plan["usd"], days[10:])
+            self.assertEqual(len(columnar_store.read_columns("usd", ["brl"])), 10)
+
+            with (StubCurrencyAPI(request_sample) as stub,
+                  patch.object(settings, "API_BASE_URL", stub.base_url)):
+                update_currency_exchange.run(db_path, "usd", "dollar", days=plan["usd"], batch_days=5)
+            self.assertEqual(stub.request_count, 10)
+            self.assertEqual(sync_planner.plan(db_path, {"usd": "dollar"}, days[0], days[-1]), {"usd": []})
+            self.assertEqual(
+                columnar_store.read_columns("usd", ["brl"]).exchange_date.tolist(),
+                [day.strftime("%Y-%m-%d") for day in days]
+                )
+            db.get_pool().close_all()
+
+    @patch.object(settings, "RESPONSE_CACHE_DIR", None)
+    @patch.object(settings, "ETL_BATCH_DAYS", 2)
+    def test_new_currencies_add_columns(self)->None:
+        """Currencies added by the API get a column instead of being dropped, the catalog keeps their seen dates.
+        """
+
+        since, until = datetime(2024, 1, 1), datetime(2024, 1, 8)
+        with (tempfile.TemporaryDirectory() as tmp_dir,
+              StubCurrencyAPI(n_currencies=3, added_codes={"c100": "2024-01-05"}) as stub,
+              patch.object(settings, "API_BASE_URL", stub.base_url)):
+            db_path = tmp_dir + "/test.db"
+            update_currency_exchange.etl_pipeline({"usd": "dollar"}, db_path, since=since, until=until)
+            # Tables created later get every currency of the catalog, derived rates of new codes are kept
+            update_currency_exchange.etl_pipeline(
+                {"usd": "dollar", "c001": "c001"}, db_path, anchor_currency="usd", since=since, until=until
+                )
+
+            conn_lite = sqlite3.connect(db_path)
+            dollar_df = pd.read_sql_query("SELECT * FROM dollar_based_currency ORDER BY exchange_date", conn_lite)
+            derived_df = pd.read_sql_query("SELECT * FROM c001_based_currency ORDER BY exchange_date", conn_lite)
+            conn_lite.close()
+            catalog_df = currency_catalog.read_catalog(db_path).set_index("code")
+
+        self.assertEqual(dollar_df.columns.tolist(), ["exchange_date", "c000", "c001", "c002", "c100"])
+        self.assertEqual(dollar_df.c100.notna().tolist(), [False] * 4 + [True] * 4)
+        self.assertEqual(derived_df.columns.tolist(), dollar_df.columns.tolist())
+        self.assertEqual(derived_df.c100.notna().tolist(), [False] * 4 + [True] * 4)
+        self.assertEqual(catalog_df.index.tolist(), ["c000", "c001", "c002", "c100"])
+        self.assertEqual(catalog_df.loc["c000"].tolist(), ["Currency C000", "2024-01-01", "2024-01-08"])
+        self.assertEqual(catalog_df.loc["c100"].tolist(), [None, "2024-01-05", "2024-01-08"])
+
+    @patch.object(settings, "RESPONSE_CACHE_DIR", None)
+    @patch("src.modules.update_currency_exchange.run_cross_rate")
+    def test_etl_cross_rate_mode(self, mock_run_cross_rate)->None:
+        """etl_pipeline with an anchor currency runs the cross-rate mode.
+        """
+
+        with patch("src.modules.update_currency_exchange.sync_planner.plan", self.mock_plan):
+            update_currency_exchange.etl_pipeline(
+                based_currency_mapping = settings.BASED_CURRENCY_MAPPING,
+                db_path = 'db_path',
+                anchor_currency = "usd"
+                )
+        mock_run_cross_rate.assert_called_once_with(
+            'db_path', settings.BASED_CURRENCY_MAPPING, "usd", None, self.mock_plan.return_value, None
             )
+
+    @patch("src.modules.update_currency_exchange.insert_df_sqlite")
+    @patch("src.modules.update_currency_exchange.fetch_rates_frame")
+    @patch("src.modules.update_currency_exchange.fetch_rate_batches")
+    def test_run_cross_rate(self, mock_fetch_rate_batches, mock_fetch_rates_frame, mock_insert)->None:
+        """A single anchor fetch feeds every table, only the sample days are fetched for other bases.
+        """
+
+        dollar_df = pd.read_csv("tests/unit/sample_data/dollar_based_currency_full_table.csv")
+        euro_df = pd.read_csv("tests/unit/sample_data/euro_based_currency_full_table.csv")
+        sync_plan = {
+            "usd": [datetime(2023, 11, 11) + timedelta(days=i) for i in range(6)],
+            "eur": [datetime(2023, 11, 6) + timedelta(days=i) for i in range(11)]
+            }
+        anchor_df = dollar_df.loc[dollar_df.exchange_date > "2023-11-05"]
+        # Two batches, usd only misses days of the second one
+        mock_fetch_rate_batches.return_value = iter([anchor_df[:5], anchor_df[5:]])
+        mock_fetch_rates_frame.return_value = euro_df
+
+        with (patch("src.modules.update_currency_exchange.check_table", Mock(return_value=euro_df[:0])),
+              patch.object(settings, "CROSS_RATE_DRIFT_SAMPLE", 2)):
+            drift_reports = update_currency_exchange.run_cross_rate(
+                "db_path", settings.BASED_CURRENCY_MAPPING, "usd", sync_plan=sync_plan
+                )
+
+        # Days missing in both tables are fetched once
+        self.assertEqual(mock_fetch_rate_batches.call_args.args[0], sync_plan["eur"])
+        # Drift is sampled once
+        self.assertEqual(mock_fetch_rates_frame.call_count, 1)
+        self.assertEqual(len(mock_fetch_rates_frame.call_args.args[0]), 2)
+        self.assertEqual(list(drift_reports), ["eur"])
+        self.assertLess(drift_reports["eur"]["median_rel_drift"], 1e-3)
+        inserted = [(call.kwargs["table_name"], call.kwargs["df"]) for call in mock_insert.call_args_list]
+        # Each batch is committed before the next one
+        self.assertEqual(
+            [table_name for table_name, _ in inserted],
+            ["euro_based_currency", "dollar_based_currency", "euro_based_currency"]
+            )
+        self.assertEqual(inserted[1][1].exchange_date.min(), "2023-11-11")
+        self.assertEqual(inserted[0][1].exchange_date.min(), "2023-11-06")
+        self.assertTrue((inserted[0][1].eur == 1).all())
+
+        # Nothing new
+        self.assertEqual(
+            update_currency_exchange.run_cross_rate("db_path", {"usd": "dollar"}, "usd", sync_plan={"usd": []}), {}
+            )
+        # Nothing to compare
+        self.assertEqual(update_currency_exchange.cross_rate_drift(euro_df[:0], "eur"), {})
+        # Anchor must have a table
+        self.assertRaises(ValueError, update_currency_exchange.run_cross_rate, "db_path", {"eur": "euro"}, "usd")
+
+    def test_long_storage_backend(self)->None:
+        """With the long backend rates are read/written from currency_rate by based currency.
+        """
+
+        with (tempfile.TemporaryDirectory() as tmp_dir,
+              patch.object(settings, "STORAGE_BACKEND", "long")):
+            db_path = tmp_dir + "/test.db"
+            self.assertEqual(
+                update_currency_exchange.last_exchange_date(db_path, "table_name", "usd").strftime("%Y-%m-%d"),
+                (datetime.today() - timedelta(days=365)).strftime("%Y-%m-%d")
+                )
+            dollar_df = pd.read_csv("tests/unit/sample_data/dollar_based_currency_full_table.csv")
+            update_currency_exchange.insert_df_sqlite(dollar_df, db_path, "table_name", "usd")
+            self.assertEqual(
+                update_currency_exchange.last_exchange_date(db_path, "table_name", "usd").strftime("%Y-%m-%d"),
+                dollar_df.exchange_date.max()
+                )
+            # Monthly aggregates of the inserted months
+            self.assertEqual(
+                monthly_agg.read_monthly(db_path, "usd", ["brl"]).month.tolist(),
+                monthly_agg.months_of(dollar_df.exchange_date)
+                )
+
+            with patch("src.modules.update_currency_exchange.http_client") as mock_http_client:
+                # Currencies with rates are in the catalog
+                self.assertEqual(
+                    update_currency_exchange.table_columns(db_path, "table_name"),
+                    dollar_df.columns[dollar_df.notna().any()].tolist()
+                    )
+                mock_http_client.get.assert_not_called()
+                # Empty catalog, filled from the API
+                mock_http_client.get.return_value = MockRequests(200, {"brl": "Brazilian Real", "usd": "Us Dollar"})
+                self.assertEqual(
+                    update_currency_exchange.table_columns(tmp_dir + "/other.db", "table_name"),
+                    ["exchange_date", "brl", "usd"]
+                    )